@@ -0,0 +1,206 @@
+import argparse
+import json
+import sys
+from pathlib import Path
+
+
+def _cmd_export(args) -> int:
+    """Потоковый экспорт keys_data и таблиц проекта без загрузки всего .dfp."""
+    from models.exporter import ProjectExporter, iter_keys_data_from_file
+    project_path = Path(args.project)
+    if not project_path.is_file(): print(f"Ошибка: Файл проекта не найден - {project_path}"); return 1
+    try:
+        ProjectExporter(args.format).export(iter_keys_data_from_file(project_path, stream_rows=True), Path(args.output_dir))
+    except (OSError, ValueError) as e:
+        print(f"Ошибка экспорта проекта '{project_path}': {e}")
+        return 1
+    return 0
+
+
+def _cmd_watch(args) -> int:
+    """Отслеживание шаблонов проекта с автоматическим слиянием ключей и сохранением проекта."""
+    from models.project import Project
+    from models.docx_handler import DocxHandler
+    from models.template_watcher import TemplateWatcher
+    project = Project()
+    if not project.load(args.project): return 1
+    watcher = TemplateWatcher(project, DocxHandler(), debounce_seconds=args.debounce)
+
+    def on_change(changes, summary):
+        if project.is_modified and not project.save(): print("Ошибка: не удалось сохранить проект после изменения шаблона.")
+
+    print(f"Отслеживание {len(project.template_paths)} шаблонов (Ctrl+C - выход)...")
+    watcher.run(interval=args.interval, on_change=on_change)
+    return 0
+
+
+def _print_generate_event(template_path: Path, event: dict):
+    """Краткий вывод событий хода генерации (generate --progress)."""
+    kind = event['event']
+    if kind == 'table_row': print(f"  [{template_path.name}] таблица '{event['table_id']}': {event['row']}/{event['total']}")
+    elif kind == 'paragraphs': print(f"  [{template_path.name}] {event['part']}: абзацы {event['done']}/{event['total']}")
+    elif kind == 'error': print(f"  [{template_path.name}] ошибка на этапе '{event['stage']}': {event['message']}")
+
+
+def _run_validation(project) -> list[dict]:
+    from models.docx_handler import DocxHandler
+    from models.validator import ProjectValidator, format_issue, summarize_issues
+    issues, elapsed_ms = ProjectValidator(DocxHandler()).timed_validate(project.template_paths, project.keys_data)
+    for issue in issues: print(format_issue(issue))
+    print(f"Проверка проекта: {summarize_issues(issues)} ({elapsed_ms:.0f} мс)")
+    return issues
+
+
+def _cmd_validate(args) -> int:
+    """Проверка проекта без генерации документов."""
+    from models.project import Project
+    from models.validator import has_errors
+    project = Project()
+    if not project.load(args.project): return 1
+    return 1 if has_errors(_run_validation(project)) else 0
+
+
+def _cmd_generate(args) -> int:
+    """Генерация документов по всем шаблонам проекта."""
+    from models.project import Project
+    from models.batch_renderer import render_templates
+    from models.validator import has_errors
+    project = Project()
+    if not project.load(args.project): return 1
+    if not args.no_validate and has_errors(_run_validation(project)) and args.strict:
+        print("Генерация прервана: проект содержит ошибки (--strict)."); return 1
+    if args.zip:
+        from models.output_sink import ZipOutputSink
+        try: sink = ZipOutputSink(Path(args.zip))
+        except OSError as e: print(f"Ошибка: не удалось создать архив '{args.zip}': {e}"); return 1
+        output_dir = None
+    else:
+        from models.output_sink import DirectoryOutputSink
+        output_dir = Path(args.output_dir) if args.output_dir else project.output_path
+        if not output_dir: print("Ошибка: папка вывода не задана ни в проекте, ни параметром --output-dir."); return 1
+        output_dir.mkdir(parents=True, exist_ok=True)
+        sink = DirectoryOutputSink(output_dir)
+    with sink:
+        summary = render_templates(project.template_paths, output_dir, project.keys_data,
+                                   workers=args.workers, cache_max_bytes=args.cache_mb * 1024 * 1024,
+                                   compress_level=args.compress_level, on_event=_print_generate_event if args.progress else None,
+                                   sink=sink)
+    cache = summary['cache']
+    print(f"Генерация завершена. Успешно: {summary['success']}, ошибки: {summary['errors']}. Вывод: {summary['output']}")
+    print(f"Кэш шаблонов: попаданий {cache.get('hits', 0)}, промахов {cache.get('misses', 0)}, вытеснений {cache.get('evictions', 0)}")
+    return 0 if summary['errors'] == 0 else 2
+
+
+def _cmd_workspace(args) -> int:
+    """Сборка нескольких проектов с общими шаблонами в одном пуле процессов."""
+    from models.workspace import build_workspace
+    summary = build_workspace([Path(p) for p in args.paths], output_root=Path(args.output_root) if args.output_root else None,
+                              workers=args.workers, cache_max_bytes=args.cache_mb * 1024 * 1024,
+                              compress_level=args.compress_level, validate=not args.no_validate, strict=args.strict)
+    for project, counts in summary['projects'].items():
+        print(f"  {project}: успешно {counts['success']}, ошибки {counts['errors']}")
+    for skipped in summary['skipped_projects']: print(f"  Пропущен проект {skipped['project']}: {skipped['reason']}")
+    for template in summary['broken_templates']: print(f"  Шаблон не прочитан: {template}")
+    cache = summary['cache']
+    print(f"Сборка рабочей области: проектов {len(summary['projects'])}, уникальных шаблонов {summary['templates']} "
+          f"(ссылок {summary['template_uses']}), документов {summary['renders']}, {summary['seconds']} с")
+    print(f"Успешно: {summary['success']}, ошибки: {summary['errors']}, пропущено проектов: {len(summary['skipped_projects'])}")
+    print(f"Кэш шаблонов: попаданий {cache.get('hits', 0)}, промахов {cache.get('misses', 0)}, вытеснений {cache.get('evictions', 0)}")
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f: json.dump(summary, f, ensure_ascii=False, indent=4)
+    if not summary['projects']: return 1
+    return 0 if summary['errors'] == 0 and not summary['skipped_projects'] and not summary['broken_templates'] else 2
+
+
+def _cmd_memcheck(args) -> int:
+    """Проверка бюджетов памяти генерации, поиска ключей и загрузки проекта на синтетических данных."""
+    from models.memory_budget import load_budgets, run_memcheck
+    try:
+        budgets = load_budgets(Path(args.budgets) if args.budgets else None)
+    except (OSError, ValueError) as e:
+        print(f"Ошибка чтения бюджетов памяти: {e}"); return 1
+    measurements, violations = run_memcheck(args.scenario, args.scale, budgets,
+                                            isolated=not args.in_process)
+    for m in measurements:
+        rss = f"{m['rss_mb']} МБ" if m['rss_mb'] is not None else "н/д"
+        print(f"{m['scenario']:<10} пик {m['peak_mb']} МБ, удержано {m['retained_mb']} МБ, прирост RSS {rss}, {m['seconds']} с")
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump({'measurements': measurements, 'violations': violations}, f, ensure_ascii=False, indent=4)
+    for violation in violations: print(f"Превышение бюджета памяти: {violation}")
+    return 1 if violations else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Генератор документов DOCX (командная строка)")
+    parser.add_argument('--profile', metavar='DIR',
+                        help="Профилировать загрузку/сохранение проекта, сканирование и генерацию; отчеты - в папку DIR")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help="Экспорт ключей и таблиц проекта в CSV/JSON Lines")
+    export_parser.add_argument('project', help="Путь к файлу проекта .dfp")
+    export_parser.add_argument('output_dir', help="Папка для файлов экспорта")
+    export_parser.add_argument('--format', choices=('csv', 'jsonl'), default='csv', help="Формат экспорта (по умолчанию csv)")
+    export_parser.set_defaults(handler=_cmd_export)
+
+    watch_parser = subparsers.add_parser('watch', help="Отслеживать изменения шаблонов и обновлять ключи проекта")
+    watch_parser.add_argument('project', help="Путь к файлу проекта .dfp")
+    watch_parser.add_argument('--interval', type=float, default=1.0, help="Интервал опроса файлов, с (по умолчанию 1.0)")
+    watch_parser.add_argument('--debounce', type=float, default=0.5, help="Задержка объединения событий, с (по умолчанию 0.5)")
+    watch_parser.set_defaults(handler=_cmd_watch)
+
+    generate_parser = subparsers.add_parser('generate', help="Сгенерировать документы по шаблонам проекта")
+    generate_parser.add_argument('project', help="Путь к файлу проекта .dfp")
+    generate_parser.add_argument('--output-dir', help="Папка вывода (по умолчанию - из проекта)")
+    generate_parser.add_argument('--zip', metavar='ARCHIVE', help="Записать все документы в один ZIP-архив вместо отдельных файлов")
+    generate_parser.add_argument('--workers', type=int, default=1, help="Число процессов генерации (по умолчанию 1)")
+    generate_parser.add_argument('--cache-mb', type=int, default=256, help="Лимит кэша шаблонов на процесс, МБ (по умолчанию 256)")
+    generate_parser.add_argument('--compress-level', type=int, choices=range(10), default=6, metavar='0-9',
+                                 help="Уровень сжатия DOCX: 0 - без сжатия, 1-9 - deflate (по умолчанию 6)")
+    generate_parser.add_argument('--progress', action='store_true', help="Показывать ход генерации каждого документа (при --workers 1)")
+    generate_parser.add_argument('--strict', action='store_true', help="Не генерировать, если проверка проекта нашла ошибки")
+    generate_parser.add_argument('--no-validate', action='store_true', help="Пропустить проверку проекта перед генерацией")
+    generate_parser.set_defaults(handler=_cmd_generate)
+
+    validate_parser = subparsers.add_parser('validate', help="Проверить проект перед генерацией (ключи, таблицы, шаблоны)")
+    validate_parser.add_argument('project', help="Путь к файлу проекта .dfp")
+    validate_parser.set_defaults(handler=_cmd_validate)
+
+    workspace_parser = subparsers.add_parser('workspace', help="Собрать несколько проектов с общим кэшем шаблонов")
+    workspace_parser.add_argument('paths', nargs='+', help="Файлы проектов .dfp и/или папки с ними (просматриваются рекурсивно)")
+    workspace_parser.add_argument('--output-root', help="Общая папка вывода (документы проекта - в подпапке с его именем)")
+    workspace_parser.add_argument('--workers', type=int, default=1, help="Число процессов генерации (по умолчанию 1)")
+    workspace_parser.add_argument('--cache-mb', type=int, default=256, help="Лимит кэша шаблонов на процесс, МБ (по умолчанию 256)")
+    workspace_parser.add_argument('--compress-level', type=int, choices=range(10), default=6, metavar='0-9',
+                                  help="Уровень сжатия DOCX (по умолчанию 6)")
+    workspace_parser.add_argument('--strict', action='store_true', help="Пропускать проекты, в которых проверка нашла ошибки")
+    workspace_parser.add_argument('--no-validate', action='store_true', help="Не проверять проекты перед генерацией")
+    workspace_parser.add_argument('--report', help="Записать сводку в JSON-файл")
+    workspace_parser.set_defaults(handler=_cmd_workspace)
+
+    memcheck_parser = subparsers.add_parser('memcheck', help="Проверить бюджеты памяти на синтетических данных")
+    memcheck_parser.add_argument('--scenario', action='append', choices=('find_keys', 'generate', 'load'),
+                                 help="Сценарий (можно несколько раз; по умолчанию - все)")
+    memcheck_parser.add_argument('--scale', type=int, default=1, help="Масштаб синтетических данных (по умолчанию 1)")
+    memcheck_parser.add_argument('--budgets', help="JSON с бюджетами {сценарий: {peak_mb, retained_mb, rss_mb}} для масштаба 1")
+    memcheck_parser.add_argument('--report', help="Записать результаты измерений в JSON-файл")
+    memcheck_parser.add_argument('--in-process', action='store_true', help="Измерять в текущем процессе (RSS менее точен)")
+    memcheck_parser.set_defaults(handler=_cmd_memcheck)
+
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    if not args.profile: return args.handler(args)
+    from models import profiling
+    session = profiling.enable(Path(args.profile))
+    try:
+        return args.handler(args)
+    finally:
+        profiling.disable()
+        print(f"Профилирование: отчетов {len(session.report_files())} в {session.output_dir}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,14 +1,42 @@
+import time
+_START_TIME = time.perf_counter() # Отсчет до импорта Qt - проба запуска учитывает и импорты
+
 import sys
 from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import QObject, QEvent, QTimer
 from views.main_window import MainWindow # Импортируем класс нашего окна
 
+STARTUP_PROBE_FLAG = "--startup-probe" # Вывести время до первой отрисовки и сразу завершиться
+
+
+class FirstPaintProbe(QObject):
+    """Фиксирует первую отрисовку окна и выводит время от запуска процесса (time-to-first-paint)."""
+
+    def __init__(self, window, imports_done: float, quit_after: bool = False):
+        super().__init__(window)
+        self._imports_done = imports_done; self._quit_after = quit_after
+        window.installEventFilter(self)
+
+    def eventFilter(self, watched, event) -> bool:
+        if event.type() == QEvent.Type.Paint:
+            watched.removeEventFilter(self)
+            painted = time.perf_counter()
+            print(f"Запуск: первая отрисовка окна через {(painted - _START_TIME) * 1000:.0f} мс "
+                  f"(импорт {(self._imports_done - _START_TIME) * 1000:.0f} мс)")
+            if self._quit_after: QTimer.singleShot(0, QApplication.quit)
+        return False
+
+
 if __name__ == '__main__':
+    imports_done = time.perf_counter()
+    probe_only = STARTUP_PROBE_FLAG in sys.argv
     # Создаем экземпляр приложения
-    app = QApplication(sys.argv)
+    app = QApplication([arg for arg in sys.argv if arg != STARTUP_PROBE_FLAG])
 
     # Создаем и показываем главное окно
     main_window = MainWindow()
+    FirstPaintProbe(main_window, imports_done, quit_after=probe_only)
     main_window.show()
 
     # Запускаем главный цикл обработки событий
-    sys.exit(app.exec())
\ No newline at end of file
+    sys.exit(app.exec())
@@ -0,0 +1,62 @@
+import os
+import tempfile
+from pathlib import Path
+
+
+class AtomicFile:
+    """
+    Атомарная замена файла: запись идет во временный файл в той же папке (rename в пределах
+    файловой системы атомарен), commit() сбрасывает данные на диск и переименовывает его в целевой,
+    discard() удаляет временный файл. До commit() прежний файл по целевому пути не меняется.
+
+    Как контекстный менеджер возвращает открытый файл; при выходе без исключения выполняется commit(),
+    с исключением - discard():
+        with AtomicFile(path, 'w', encoding='utf-8') as f: json.dump(data, f)
+    """
+
+    def __init__(self, target_path: Path, mode: str = 'wb', encoding: str | None = None, fsync: bool = True):
+        """
+        Args:
+            target_path: Файл, который будет заменен.
+            mode: Режим открытия временного файла ('wb' или 'w').
+            fsync: Сбрасывать данные на диск перед переименованием (не нужно для временных хранилищ).
+        """
+        self.target_path = Path(target_path)
+        self.fsync = fsync
+        fd, self.tmp_name = tempfile.mkstemp(prefix=f".{self.target_path.name}.", suffix=".tmp", dir=self.target_path.parent)
+        try:
+            self.file = os.fdopen(fd, mode, encoding=encoding)
+        except BaseException:
+            os.close(fd); self._unlink()
+            raise
+        self._done = False
+
+    def _unlink(self):
+        try: os.unlink(self.tmp_name)
+        except OSError: pass
+
+    def commit(self):
+        """Завершает запись и заменяет целевой файл. При ошибке временный файл удаляется."""
+        if self._done: return
+        self._done = True
+        try:
+            with self.file:
+                self.file.flush()
+                if self.fsync: os.fsync(self.file.fileno())
+            os.replace(self.tmp_name, self.target_path)
+        except BaseException:
+            self._unlink()
+            raise
+
+    def discard(self):
+        """Отменяет запись: временный файл удаляется, целевой не трогается."""
+        if self._done: return
+        self._done = True
+        try: self.file.close()
+        finally: self._unlink()
+
+    def __enter__(self): return self.file
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None: self.commit()
+        else: self.discard()
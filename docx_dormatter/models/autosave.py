@@ -0,0 +1,107 @@
+import threading
+from pathlib import Path
+
+from models.project import Project
+
+
+class AutosaveWorker:
+    """
+    Фоновая запись снимков проекта.
+    Сериализация JSON и запись на диск выполняются в отдельном потоке, поэтому
+    поток интерфейса тратит время только на Project.snapshot(). Если новый снимок
+    пришел, пока предыдущий еще пишется, в очереди остается только последний.
+    Снимок с ревизией старше уже записанной в тот же файл не пишется, а ручное
+    сохранение (save_project) идет через ту же очередь - старый снимок не может
+    перезаписать более новые данные.
+    """
+
+    def __init__(self, on_finished=None):
+        """
+        Args:
+            on_finished: Вызывается из фонового потока после каждой записи:
+                         on_finished(save_path, revision, success, error_message).
+        """
+        self.on_finished = on_finished
+        self._condition = threading.Condition()
+        self._pending: tuple[Path, dict, int] | None = None
+        self._busy = False
+        self._stopping = False
+        self._written: dict[Path, int] = {} # { путь: последняя записанная ревизия }
+        self._last_result: tuple[Path, int, bool, str] | None = None
+        self._thread = threading.Thread(target=self._run, name="AutosaveWorker", daemon=True)
+        self._thread.start()
+
+    def submit(self, save_path: Path, project_data: dict, revision: int):
+        """Ставит снимок в очередь на запись (заменяя еще не начатый предыдущий)."""
+        with self._condition:
+            self._pending = (Path(save_path), project_data, revision)
+            self._condition.notify()
+
+    def submit_project(self, project: Project) -> bool:
+        """Снимок и постановка в очередь для проекта, у которого уже есть файл."""
+        save_path = project.resolve_save_path()
+        if save_path is None: return False
+        self.submit(save_path, project.snapshot(), project.revision)
+        return True
+
+    def save_project(self, project: Project, path_str: str | None = None) -> bool:
+        """
+        Ручное сохранение: снимок ставится в очередь вместо ожидающего автосохранения
+        и записывается после текущей фоновой записи; вызов ждет завершения записи.
+        """
+        save_path = project.resolve_save_path(path_str)
+        if save_path is None: print("Ошибка сохранения: Путь не указан."); return False
+        revision = project.revision
+        self.submit(save_path, project.snapshot(), revision)
+        self.wait_idle()
+        with self._condition:
+            result = self._last_result
+        if result is None or result[:2] != (save_path, revision):
+            print(f"Ошибка сохранения файла проекта '{save_path}': снимок не записан (в файле более новая ревизия)"); return False
+        if not result[2]: return False # Ошибка уже выведена потоком записи
+        project.mark_saved(save_path, revision)
+        print(f"Проект успешно сохранен в: {save_path}")
+        return True
+
+    def is_busy(self) -> bool:
+        with self._condition:
+            return self._busy or self._pending is not None
+
+    def wait_idle(self, timeout: float | None = None) -> bool:
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._busy and self._pending is None, timeout)
+
+    def stop(self, timeout: float | None = None):
+        """Дожидается записи последнего снимка и останавливает поток."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending is not None or self._stopping)
+                if self._pending is None: return # Остановка без незаписанных снимков
+                save_path, project_data, revision = self._pending
+                self._pending = None
+                written = self._written.get(save_path)
+                if written is not None and revision < written: # Устаревший снимок: в файле уже более новые данные
+                    print(f"Автосохранение пропущено: ревизия {revision} старше записанной {written}")
+                    self._condition.notify_all()
+                    continue
+                self._busy = True
+            success = True; error_message = ''
+            try:
+                Project.write_project_file(save_path, project_data)
+                print(f"Автосохранение проекта: {save_path}")
+            except Exception as e:
+                success = False; error_message = str(e)
+                print(f"Ошибка автосохранения проекта '{save_path}': {e}")
+            with self._condition:
+                if success: self._written[save_path] = revision
+                self._last_result = (save_path, revision, success, error_message)
+                self._busy = False
+                self._condition.notify_all()
+            if self.on_finished:
+                self.on_finished(save_path, revision, success, error_message)
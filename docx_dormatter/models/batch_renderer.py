@@ -0,0 +1,100 @@
+import io
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from models import profiling
+from models.docx_handler import DocxHandler
+from models.output_sink import DirectoryOutputSink, output_name_for
+from models.template_cache import TemplateCache
+
+# Состояние процесса-исполнителя (заполняется в _init_worker)
+_worker_handler: DocxHandler | None = None
+_worker_keys_data: dict = {}
+
+
+def _init_worker(store_dir: str, max_bytes: int, keys_data: dict, compress_level: int, profile_dir: str | None = None):
+    """Инициализация исполнителя: общий store_dir, свой LRU поверх тех же mmap-файлов."""
+    global _worker_handler, _worker_keys_data
+    if profile_dir is not None: profiling.enable(Path(profile_dir)) # Профили generate_document пишет каждый процесс
+    _worker_handler = DocxHandler(template_cache=TemplateCache(max_bytes=max_bytes, store_dir=Path(store_dir)),
+                                  compress_level=compress_level)
+    _worker_keys_data = keys_data
+
+
+def _render_job(template_path: str, output_path: str | None) -> tuple[str, bool, int, dict, bytes | None]:
+    """output_path=None - документ рендерится в память и возвращается байтами (для вывода в архив)."""
+    target = io.BytesIO() if output_path is None else Path(output_path)
+    success = _worker_handler.generate_document(Path(template_path), target, _worker_keys_data)
+    blob = target.getvalue() if output_path is None and success else None
+    return template_path, success, os.getpid(), _worker_handler.template_cache.stats(), blob
+
+
+def output_path_for(template_path: Path, output_dir: Path) -> Path:
+    return output_dir / output_name_for(template_path)
+
+
+def render_templates(template_paths: list[Path], output_dir: Path, keys_data: dict,
+                     workers: int = 1, cache_max_bytes: int = TemplateCache.DEFAULT_MAX_BYTES,
+                     compress_level: int = DocxHandler.DEFAULT_COMPRESS_LEVEL, on_event=None, sink=None) -> dict:
+    """
+    Генерирует документы по списку шаблонов, при workers > 1 - в нескольких процессах.
+    Шаблоны заранее публикуются в общем mmap-хранилище, поэтому процессы
+    не держат собственных копий пакетов.
+    on_event(template_path, event) получает события DocxHandler.iter_generate_document
+    (только при workers <= 1; из процессов-исполнителей события не передаются).
+    sink - приемник документов из models.output_sink (по умолчанию - файлы в output_dir);
+    закрывает его вызывающий код. При выводе в архив процессы возвращают документы байтами,
+    а в работе одновременно не больше 2 * workers заданий, поэтому память ограничена.
+
+    Returns:
+        {'success': N, 'errors': N, 'failed': [путь, ...], 'cache': {агрегированная статистика кэша}, 'output': куда записано}
+    """
+    sink = sink if sink is not None else DirectoryOutputSink(output_dir)
+    summary = {'success': 0, 'errors': 0, 'failed': [], 'cache': {}, 'output': sink.describe()}
+    cache = TemplateCache(max_bytes=cache_max_bytes)
+    try:
+        if workers <= 1:
+            handler = DocxHandler(template_cache=cache, compress_level=compress_level)
+            for template_path in template_paths:
+                last_event = None; target = sink.open_target(template_path)
+                with profiling.capture(f"generate_{Path(template_path).stem}"):
+                    for last_event in handler.iter_generate_document(template_path, target, keys_data):
+                        if on_event: on_event(template_path, last_event)
+                if last_event is not None and last_event['event'] == 'saved': sink.commit(target); summary['success'] += 1
+                else: sink.discard(target); summary['errors'] += 1; summary['failed'].append(str(template_path))
+            summary['cache'] = cache.stats()
+            return summary
+        for template_path in template_paths:
+            try: cache.publish(template_path)
+            except OSError as e: print(f"Ошибка: шаблон недоступен {template_path}: {e}")
+        worker_stats: dict[int, dict] = {} # Последняя статистика кэша каждого процесса
+        session = profiling.active_session()
+
+        def collect(future):
+            template_path = '?'
+            try:
+                template_path, success, pid, stats, blob = future.result()
+                worker_stats[pid] = stats
+                if success and blob is not None: sink.add(output_name_for(Path(template_path)), blob)
+            except Exception as e:
+                print(f"Ошибка в процессе генерации: {e}")
+                success = False
+            if success: summary['success'] += 1
+            else: summary['errors'] += 1; summary['failed'].append(template_path)
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(str(cache.store_dir), cache_max_bytes, keys_data, compress_level,
+                                           str(session.output_dir) if session else None)) as pool:
+            pending = deque() # Результаты забираются по порядку шаблонов - порядок записей архива детерминирован
+            for p in template_paths:
+                pending.append(pool.submit(_render_job, str(p), None if sink.in_memory else str(sink.open_target(p))))
+                if len(pending) >= 2 * workers: collect(pending.popleft())
+            while pending: collect(pending.popleft())
+        for key in ('hits', 'misses', 'evictions', 'bytes'):
+            summary['cache'][key] = sum(stats[key] for stats in worker_stats.values())
+        summary['cache']['workers'] = len(worker_stats)
+        return summary
+    finally:
+        cache.close()
@@ -1,16 +1,37 @@
+import io
 import re
-import shutil
+import zipfile
 from pathlib import Path
 import docx # type: ignore
+from docx.opc.part import XmlPart
+from docx.opc.oxml import serialize_part_xml
+from docx.opc.constants import CONTENT_TYPE as CT
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsmap, qn
+from docx.shared import Emu
 from docx.table import Table, _Row
 from docx.text.paragraph import Paragraph
 from docx.text.run import Run
 from docx.oxml.ns import nsdecls
 from docx.oxml import OxmlElement
 import copy
+from lxml import etree
 # --- ДОБАВЛЕН ИМПОРТ ---
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 # -----------------------
+from models.atomic_file import AtomicFile
+from models.filters import FILTER_SEPARATOR, FilterError, FilterMemo, base_key, compile_placeholder
+from models.image_cache import ImageCache, is_image_key
+from models.profiling import profiled
+from models.template_cache import TemplateCache
+from models.zip_entries import write_zip_entry
+
+
+class _StoryParent:
+    """Родитель для оберток python-docx над элементами произвольной части пакета (нужен только .part)."""
+    def __init__(self, part):
+        self.part = part
+
 
 class DocxHandler:
     """
@@ -19,54 +40,184 @@ class DocxHandler:
     """
     KEY_PATTERN = re.compile(r"\{\{.*?\}\}")
     DYNAMIC_TABLE_PATTERN = re.compile(r"\{\{DYNAMIC_TABLE::(\w+)\}\}")
+    _IMAGE_ANCHOR = "\ue000" # Временная метка позиции изображения внутри run
+    # Блочные директивы - отдельные абзацы, начало и конец блока у одного родителя:
+    # {{REPEAT::id}} ... {{END_REPEAT::id}} - блок повторяется для каждой строки списка id (как у динамической таблицы);
+    # {{IF::KEY}} ... {{END_IF::KEY}} - блок удаляется, если ключ {{KEY}} (или список KEY) пуст.
+    DIRECTIVE_PATTERN = re.compile(r"\{\{(REPEAT|END_REPEAT|IF|END_IF)::(\w+)\}\}")
+
+    DEFAULT_COMPRESS_LEVEL = 6
+    PROGRESS_STEP = 50 # Частота событий хода генерации (строк таблицы / абзацев)
+
+    def __init__(self, image_cache: ImageCache | None = None, template_cache: TemplateCache | None = None,
+                 compress_level: int = DEFAULT_COMPRESS_LEVEL):
+        """
+        Args:
+            image_cache: Кэш подготовленных изображений (по умолчанию - собственный).
+            template_cache: Кэш шаблонов; без него шаблон читается с диска при каждой генерации.
+            compress_level: Уровень сжатия DOCX: 0 - без сжатия (быстро, для промежуточных файлов), 1-9 - deflate.
+        """
+        self.image_cache = image_cache if image_cache is not None else ImageCache()
+        self.template_cache = template_cache
+        if not 0 <= compress_level <= 9: raise ValueError(f"Уровень сжатия должен быть от 0 до 9: {compress_level}")
+        self.compress_level = compress_level
+        self._filter_memo = FilterMemo() # Результаты фильтров ключей; новый на каждую генерацию
 
-    # --- Метод find_keys_in_template остается как в v2 ---
-    def _get_paragraph_keys(self, paragraph) -> set[str]:
+    def _open_template(self, template_path: Path):
+        if self.template_cache is not None: return docx.Document(self.template_cache.open(template_path))
+        return docx.Document(template_path)
+
+    # --- Сканирование шаблона по частям пакета ---
+    # Части пакета с текстом: основной документ, колонтитулы, сноски.
+    # Надписи (w:txbxContent) лежат внутри этих частей и попадают в тот же обход.
+    STORY_PART_PATTERN = re.compile(r"^word/(document|header\d*|footer\d*|footnotes|endnotes)\.xml$")
+    _P_TAG = qn('w:p')
+    _TBL_TAG = qn('w:tbl')
+    _T_TAG = qn('w:t')
+    _T_TEXTS = etree.XPath('.//w:t/text()', namespaces={'w': nsmap['w']}) # Тексты всех w:t части в порядке документа
+
+    def _base_keys(self, placeholders, invalid_filters: dict | None = None) -> list[str]:
+        """
+        Ключи проекта для ключей шаблона (без фильтров, порядок и уникальность сохраняются).
+        Фильтры компилируются здесь - при генерации берутся уже готовые функции;
+        ошибки фильтров записываются в invalid_filters {ключ шаблона: сообщение}.
+        """
+        keys = []
+        for placeholder in placeholders:
+            if FILTER_SEPARATOR in placeholder:
+                try: placeholder = compile_placeholder(placeholder).base_key
+                except FilterError as e:
+                    if invalid_filters is not None: invalid_filters[placeholder] = str(e)
+                    placeholder = base_key(placeholder)
+            if placeholder not in keys: keys.append(placeholder)
+        return keys
+
+    def _get_paragraph_keys(self, paragraph, invalid_filters: dict | None = None) -> set[str]:
         full_para_text = "".join(run.text for run in paragraph.runs)
-        return set(self.KEY_PATTERN.findall(full_para_text))
+        return set(self._base_keys(self.KEY_PATTERN.findall(full_para_text), invalid_filters))
+
+    def _iter_story_elements(self, root):
+        """Единственный обход части: все абзацы (в т.ч. в ячейках, надписях и сносках) и все таблицы."""
+        return root.iter(self._P_TAG, self._TBL_TAG)
+
+    def _scan_table_template_rows(self, table: Table, found_tables_info: dict, invalid_filters: dict | None = None):
+        """Ищет строки-шаблоны {{DYNAMIC_TABLE::id}} и собирает их template_keys."""
+        for row in table.rows:
+            # Ищем маркер только в первой ячейке для определения строки-шаблона
+            if not row.cells: continue # Проверка, что ячейки существуют
+            first_cell_text = "".join(p.text for p in row.cells[0].paragraphs)
+            match = self.DYNAMIC_TABLE_PATTERN.search(first_cell_text)
+            if not match: continue
+            table_id_found_in_row = match.group(1)
+            # Собираем ключи из остальных ячеек этой строки
+            if table_id_found_in_row not in found_tables_info:
+                ordered_template_keys = []
+                for cell_idx in range(1, len(row.cells)): # Начиная со второй ячейки
+                    cell = row.cells[cell_idx]
+                    for para in cell.paragraphs:
+                        keys_in_para = self._get_paragraph_keys(para, invalid_filters)
+                        for key in keys_in_para:
+                            # Не добавляем сам маркер и избегаем дубликатов
+                            if not self.DYNAMIC_TABLE_PATTERN.match(key) and key not in ordered_template_keys:
+                                ordered_template_keys.append(key)
+                # Число ячеек первой строки и сетки таблицы: при расхождении генерация пропускает строки данных
+                found_tables_info[table_id_found_in_row] = {
+                    'template_keys': ordered_template_keys,
+                    'columns': len(table.rows[0].cells), 'grid_columns': len(table._tbl.tblGrid.gridCol_lst),
+                }
+                print(f"Найдена таблица '{table_id_found_in_row}' с template_keys: {ordered_template_keys}")
 
+    def _match_directive(self, p_element):
+        """Директива, если абзац целиком состоит из нее, иначе None."""
+        text = "".join(t.text or '' for t in p_element.iter(self._T_TAG)).strip()
+        if not text.startswith('{{') or '::' not in text: return None
+        return self.DIRECTIVE_PATTERN.fullmatch(text)
+
+    def _has_directives(self, root) -> bool:
+        """
+        Быстрая проверка части перед раскрытием блоков: тексты w:t собираются одним вызовом XPath.
+        Текст абзаца - непрерывный отрезок этой строки, поэтому директива абзаца в ней всегда найдется.
+        """
+        return self.DIRECTIVE_PATTERN.search("".join(self._T_TEXTS(root))) is not None
+
+    def _scan_part_xml(self, part_xml: bytes) -> dict:
+        """
+        Ключи, таблицы и условия части. Блоки REPEAT попадают в 'tables' (kind='repeat')
+        с ключами блока в template_keys; имена из IF - в 'conditions' (ключом они
+        становятся в merge_part_scans, если не являются списком). Ключи с фильтрами
+        учитываются по ключу проекта ({{DATE|upper}} -> {{DATE}}), ошибки фильтров - в 'invalid_filters'.
+        """
+        root = parse_xml(part_xml); parent = _StoryParent(None)
+        found_keys: set[str] = set(); found_tables_info: dict[str, dict] = {}; conditions: set[str] = set()
+        invalid_filters: dict[str, str] = {}
+        open_repeats: list[tuple[str, list[str]]] = []
+        for element in self._iter_story_elements(root):
+            if element.tag == self._P_TAG:
+                directive = self._match_directive(element)
+                if directive is None:
+                    keys = self._get_paragraph_keys(Paragraph(element, parent), invalid_filters); found_keys.update(keys)
+                    if open_repeats and keys:
+                        block_keys = open_repeats[-1][1]
+                        text = "".join(run.text for run in Paragraph(element, parent).runs)
+                        block_keys.extend(key for key in self._base_keys(self.KEY_PATTERN.findall(text)) if key not in block_keys)
+                    continue
+                kind, name = directive.groups()
+                if kind == 'REPEAT': open_repeats.append((name, []))
+                elif kind == 'END_REPEAT' and open_repeats and open_repeats[-1][0] == name:
+                    _, block_keys = open_repeats.pop()
+                    found_tables_info.setdefault(name, {'template_keys': block_keys, 'kind': 'repeat'})
+                    print(f"Найден повторяемый блок '{name}' с template_keys: {block_keys}")
+                elif kind == 'IF': conditions.add(name)
+            else:
+                self._scan_table_template_rows(Table(element, parent), found_tables_info, invalid_filters)
+        for name, _ in open_repeats: print(f"Предупреждение: блок {{{{REPEAT::{name}}}}} не закрыт")
+        for message in invalid_filters.values(): print(f"Предупреждение: {message}")
+        return {'keys': found_keys, 'tables': found_tables_info, 'conditions': conditions, 'invalid_filters': invalid_filters}
+
+    def scan_template_parts(self, docx_path: Path, previous_parts: dict | None = None) -> dict:
+        """
+        Сканирует части пакета DOCX по отдельности.
+        Хэш части - CRC32 и размер из каталога ZIP, поэтому неизмененные части
+        не распаковываются и не разбираются повторно: их результат берется из previous_parts.
+
+        Returns:
+            { part_name: {'hash': (crc, size), 'keys': set, 'tables': {table_id: {...}}} }
+        """
+        previous_parts = previous_parts or {}
+        parts = {}
+        with zipfile.ZipFile(docx_path) as package:
+            for info in package.infolist():
+                part_name = info.filename
+                if not self.STORY_PART_PATTERN.match(part_name): continue
+                part_hash = (info.CRC, info.file_size)
+                cached = previous_parts.get(part_name)
+                if cached is not None and cached['hash'] == part_hash:
+                    parts[part_name] = cached
+                    continue
+                parts[part_name] = {'hash': part_hash, **self._scan_part_xml(package.read(info))}
+        return parts
+
+    def merge_part_scans(self, parts: dict) -> dict:
+        """Объединяет результаты частей в формат find_keys_in_template."""
+        found_keys: set[str] = set(); found_tables_info: dict[str, dict] = {}
+        conditions: set[str] = set(); invalid_filters: dict[str, str] = {}
+        for part in parts.values():
+            found_keys.update(part['keys'])
+            conditions.update(part.get('conditions', ()))
+            invalid_filters.update(part.get('invalid_filters', {}))
+            for table_id, table_info in part['tables'].items():
+                found_tables_info.setdefault(table_id, table_info)
+        found_keys.update(f"{{{{{name}}}}}" for name in conditions if name not in found_tables_info)
+        table_markers_full = {f"{{{{DYNAMIC_TABLE::{tid}}}}}" for tid in found_tables_info}
+        return {'keys': found_keys - table_markers_full, 'tables': found_tables_info, 'invalid_filters': invalid_filters}
+
+    @profiled('find_keys', lambda self, docx_path: Path(docx_path).stem)
     def find_keys_in_template(self, docx_path: Path) -> dict:
-        found_keys = set()
-        found_tables_info: dict[str, dict] = {}
         try:
-            document = docx.Document(docx_path)
-            for para in document.paragraphs:
-                found_keys.update(self._get_paragraph_keys(para))
-            for table in document.tables:
-                for row_idx, row in enumerate(table.rows):
-                    table_id_found_in_row: str | None = None
-                    # Ищем маркер только в первой ячейке для определения строки-шаблона
-                    if row.cells: # Проверка, что ячейки существуют
-                        first_cell_text = "".join(p.text for p in row.cells[0].paragraphs)
-                        match = self.DYNAMIC_TABLE_PATTERN.search(first_cell_text)
-                        if match:
-                            table_id_found_in_row = match.group(1)
-                            # Собираем ключи из остальных ячеек этой строки
-                            if table_id_found_in_row not in found_tables_info:
-                                ordered_template_keys = []
-                                for cell_idx in range(1, len(row.cells)): # Начиная со второй ячейки
-                                    cell = row.cells[cell_idx]
-                                    for para in cell.paragraphs:
-                                        keys_in_para = self._get_paragraph_keys(para)
-                                        for key in keys_in_para:
-                                            # Не добавляем сам маркер и избегаем дубликатов
-                                            if not self.DYNAMIC_TABLE_PATTERN.match(key) and key not in ordered_template_keys:
-                                                ordered_template_keys.append(key)
-                                found_tables_info[table_id_found_in_row] = {'template_keys': ordered_template_keys}
-                                print(f"Найдена таблица '{table_id_found_in_row}' с template_keys: {ordered_template_keys}")
-
-                    # Собираем ВСЕ ключи из таблицы в общий список
-                    for cell in row.cells:
-                        for para in cell.paragraphs:
-                            found_keys.update(self._get_paragraph_keys(para))
-
-
-            table_markers_full = {f"{{{{DYNAMIC_TABLE::{tid}}}}}" for tid in found_tables_info}
-            keys_only = found_keys - table_markers_full
+            return self.merge_part_scans(self.scan_template_parts(docx_path))
         except Exception as e:
             print(f"Ошибка при чтении или обработке файла {docx_path}: {e}")
-            return {'keys': set(), 'tables': {}}
-        return {'keys': keys_only, 'tables': found_tables_info}
+            return {'keys': set(), 'tables': {}, 'invalid_filters': {}}
     # --- Конец метода find_keys_in_template ---
 
     # --- Метод _replace_text_in_paragraph остается как в v3 ---
@@ -116,82 +267,320 @@ class DocxHandler:
                 target_r.font.size = source_r.font.size; target_r.font.color.rgb = source_r.font.color.rgb
     # --- Конец метода _copy_cell_formatting ---
 
-    # --- Метод generate_document остается как в v4 (но теперь импорт есть) ---
-    def generate_document(self, template_path: Path, output_path: Path, project_keys_data: dict) -> bool:
-        print(f"Генерация документа из '{template_path.name}' в '{output_path}'...")
+    # --- Части документа для подстановки ---
+    def _get_story_parts(self, doc) -> list[tuple]:
+        """
+        Возвращает [(root_element, part, commit, part_name), ...] для всех частей с текстом.
+        Колонтитулы python-docx загружает как XmlPart; сноски - как обычные Part,
+        их XML разбирается здесь, а commit() записывает результат обратно в пакет.
+        """
+        stories = []
+        for part in doc.part.package.iter_parts():
+            if not self.STORY_PART_PATTERN.match(part.partname.membername): continue
+            if isinstance(part, XmlPart):
+                stories.append((part.element, part, None, part.partname.membername))
+            else:
+                root = parse_xml(part.blob)
+                def commit(part=part, root=root): part._blob = serialize_part_xml(root)
+                # Стили и изображения для таких частей берутся из основного документа
+                stories.append((root, doc.part, commit, part.partname.membername))
+        return stories
+
+    def _replace_keys_in_paragraph(self, paragraph: Paragraph, key_value_map: dict, image_map: dict | None = None):
+        text = paragraph.text
+        if '{{' not in text: return
+        # findall возвращает каждое вхождение, а _replace_text_in_paragraph заменяет первое - так заменяются все
+        for key in self.KEY_PATTERN.findall(text):
+            if image_map is not None and key in image_map: self._replace_key_with_image(paragraph, key, image_map[key])
+            elif key in key_value_map: self._replace_text_in_paragraph(paragraph, key, key_value_map[key])
+            elif FILTER_SEPARATOR in key:
+                value = self._filtered_value(key, key_value_map)
+                if value is not None: self._replace_text_in_paragraph(paragraph, key, value)
+
+    def _filtered_value(self, placeholder: str, key_value_map: dict) -> str | None:
+        """Значение ключа с фильтрами или None (нет такого ключа в проекте, ошибка фильтра - ключ остается в тексте)."""
         try:
-            shutil.copy2(template_path, output_path)
-            print(f"Шаблон скопирован в {output_path}")
-            doc = docx.Document(output_path)
+            value = key_value_map.get(compile_placeholder(placeholder).base_key)
+            return None if value is None else self._filter_memo.apply(placeholder, str(value))
+        except FilterError as e:
+            print(f"Ошибка фильтра: {e}"); return None
+
+    def _column_filters(self, template_row, template_keys: list[str]) -> dict[int, str]:
+        """Ключи с фильтрами в ячейках строки-шаблона: {индекс ключа: ключ шаблона}. Разбирается один раз на таблицу."""
+        column_filters = {}
+        for key_idx, template_key in enumerate(template_keys):
+            if key_idx + 1 >= len(template_row.cells): break
+            cell_text = "".join(p.text for p in template_row.cells[key_idx + 1].paragraphs)
+            for placeholder in self.KEY_PATTERN.findall(cell_text):
+                if FILTER_SEPARATOR not in placeholder or base_key(placeholder) != template_key: continue
+                try: compile_placeholder(placeholder)
+                except FilterError as e: print(f"Ошибка фильтра: {e}"); continue
+                column_filters[key_idx] = placeholder; break
+        return column_filters
+
+    def _replace_key_with_image(self, paragraph: Paragraph, key: str, image_spec: dict):
+        """Заменяет ключ изображением: ключ сводится к метке в одном run, run делится на части вокруг рисунка."""
+        try:
+            prepared = self.image_cache.get(image_spec['path'], image_spec.get('width_mm'), image_spec.get('height_mm'))
+            width = Emu(prepared['width_emu']) if prepared['width_emu'] else None
+            height = Emu(prepared['height_emu']) if prepared['height_emu'] else None
+            # Рисунок разбирается до изменения абзаца: нечитаемый файл не оставляет в нем метку
+            inline = paragraph.part.new_pic_inline(io.BytesIO(prepared['blob']), width, height)
+        except Exception as e:
+            print(f"Ошибка подготовки изображения '{image_spec['path']}' для ключа {key}: {e}")
+            self._replace_text_in_paragraph(paragraph, key, ''); return
+        self._replace_text_in_paragraph(paragraph, key, self._IMAGE_ANCHOR)
+        for run in paragraph.runs:
+            if self._IMAGE_ANCHOR not in run.text: continue
+            before, after = run.text.split(self._IMAGE_ANCHOR, 1)
+            run.text = before
+            pic_run = paragraph.add_run(); run._r.addnext(pic_run._r)
+            pic_run._r.add_drawing(inline)
+            if after:
+                tail_r = copy.deepcopy(run._r); pic_run._r.addnext(tail_r); Run(tail_r, paragraph).text = after
+            if not before: run._r.getparent().remove(run._r)
+            return
+
+    def _find_template_row(self, table: Table, table_definitions: dict) -> tuple[str, int] | None:
+        for r_idx, row in enumerate(table.rows):
+            if row.cells:
+                first_cell_text = "".join(p.text for p in row.cells[0].paragraphs)
+                match = self.DYNAMIC_TABLE_PATTERN.search(first_cell_text)
+                if match and match.group(1) in table_definitions:
+                    return match.group(1), r_idx
+        return None
+
+    def _fill_dynamic_table(self, table: Table, table_id_to_process: str, template_row_index: int, table_definition: dict):
+        """Генератор: заполняет таблицу и выдает события 'table_row' каждые PROGRESS_STEP строк и на последней строке."""
+        table_template_keys = table_definition.get('template_keys', [])
+        table_data_rows = table_definition.get('data', [])
+        template_row = table.rows[template_row_index]
+        column_filters = self._column_filters(template_row, table_template_keys)
+        print(f"Очистка строк данных в таблице '{table_id_to_process}'...")
+        for r_idx in range(len(table.rows) - 1, 0, -1):
+            row_to_remove = table.rows[r_idx]; table._tbl.remove(row_to_remove._tr)
+        print(f"Добавление {len(table_data_rows)} строк в таблицу '{table_id_to_process}'...")
+        num_columns = len(table.rows[0].cells) if table.rows else 0
+        for data_idx, row_data_dict in enumerate(table_data_rows):
+            new_row_obj = table.add_row(); new_row_cells = new_row_obj.cells
+            if len(new_row_cells) != num_columns: print(f"Предупреждение: Несовпадение кол-ва ячеек..."); continue
+            cell_num = new_row_cells[0]; cell_num.text = str(data_idx + 1)
+            if len(template_row.cells) > 0:
+                 self._copy_cell_formatting(template_row.cells[0], cell_num)
+                 # Используем импортированный WD_ALIGN_PARAGRAPH
+                 if cell_num.paragraphs: cell_num.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
+            for key_idx, template_key in enumerate(table_template_keys):
+                cell_idx_in_doc = key_idx + 1
+                if cell_idx_in_doc < len(new_row_cells):
+                    cell_data = new_row_cells[cell_idx_in_doc]
+                    value = str(row_data_dict.get(template_key, ''))
+                    if key_idx in column_filters: value = self._filter_memo.apply(column_filters[key_idx], value)
+                    cell_data.text = value
+                    if cell_idx_in_doc < len(template_row.cells):
+                        self._copy_cell_formatting(template_row.cells[cell_idx_in_doc], cell_data)
+            if (data_idx + 1) % self.PROGRESS_STEP == 0 or data_idx + 1 == len(table_data_rows):
+                yield {'event': 'table_row', 'table_id': table_id_to_process, 'row': data_idx + 1, 'total': len(table_data_rows)}
+
+    def _expand_blocks(self, elements: list, parent, lookup, table_definitions: dict):
+        """
+        Раскрывает блочные директивы внутри elements (с вложенностью).
+        Повтор - глубокое копирование элементов блока для каждой строки списка с подстановкой
+        ее значений в копии; стоимость линейна по размеру результата.
+
+        Args:
+            lookup: Функция name -> значение условия (строка ключа {{name}} или строки списка name).
+        """
+        directives = [(p, match) for element in elements for p in element.iter(self._P_TAG)
+                      if (match := self._match_directive(p)) is not None]
+        if not directives: return
+        stack = []; top_level = []
+        for p, match in directives: # Сопоставление начала и конца блока; внутренние блоки раскроются рекурсивно
+            kind, name = match.groups()
+            if kind in ('REPEAT', 'IF'): stack.append((kind, name, p)); continue
+            if not stack or stack[-1][:2] != (kind[4:], name):
+                print(f"Предупреждение: директива {match.group(0)} без начала блока - пропущена"); continue
+            start_kind, _, start = stack.pop()
+            if not stack: top_level.append((start_kind, name, start, p))
+        for start_kind, name, _ in stack: print(f"Предупреждение: блок {{{{{start_kind}::{name}}}}} не закрыт - пропущен")
+        for kind, name, start, end in top_level:
+            if start.getparent() is not end.getparent():
+                print(f"Предупреждение: начало и конец блока {kind}::{name} в разных элементах - блок пропущен"); continue
+            block = []
+            sibling = start.getnext()
+            while sibling is not None and sibling is not end: block.append(sibling); sibling = sibling.getnext()
+            container = start.getparent()
+            if kind == 'IF':
+                if not lookup(name):
+                    for element in block: container.remove(element)
+                else: self._expand_blocks(block, parent, lookup, table_definitions)
+            else:
+                definition = table_definitions.get(name, {})
+                template_keys = definition.get('template_keys', [])
+                for row in definition.get('data', []):
+                    row_map = {key: str(row.get(key, '')) for key in template_keys} if template_keys else {k: str(v) for k, v in row.items()}
+                    clones = [copy.deepcopy(element) for element in block]
+                    for clone in clones:
+                        end.addprevious(clone)
+                        for p in clone.iter(self._P_TAG): self._replace_keys_in_paragraph(Paragraph(p, parent), row_map)
+                    def row_lookup(cond_name, row_map=row_map):
+                        cond_key = f"{{{{{cond_name}}}}}"
+                        return row_map[cond_key] if cond_key in row_map else lookup(cond_name)
+                    self._expand_blocks(clones, parent, row_lookup, table_definitions)
+                for element in block: container.remove(element)
+            container.remove(start); container.remove(end)
+
+    def _render_story(self, root, part, part_name: str, key_value_map: dict, table_definitions: dict, processed_table_elements: set,
+                      image_map: dict | None = None, condition_lookup=None):
+        """
+        Один обход части: собираются абзацы и таблицы-шаблоны, затем заполняются
+        динамические таблицы и выполняется подстановка ключей. Блочные директивы
+        раскрываются заранее, чтобы копии блоков прошли те же шаги.
+        Генератор: выдает события 'table_row' и 'paragraphs' (см. iter_generate_document).
+        """
+        parent = _StoryParent(part)
+        # Части без директив (обычный случай) не обходятся по абзацам ради поиска блоков
+        if condition_lookup is not None and self._has_directives(root): self._expand_blocks([root], parent, condition_lookup, table_definitions)
+        paragraphs = []; dynamic_tables = []
+        for element in self._iter_story_elements(root):
+            if element.tag == self._P_TAG:
+                paragraphs.append(element)
+            elif table_definitions and element not in processed_table_elements:
+                table = Table(element, parent)
+                found = self._find_template_row(table, table_definitions)
+                if found:
+                    processed_table_elements.add(element); dynamic_tables.append((table, *found))
+                    print(f"Найдена таблица '{found[0]}' в документе (строка-шаблон {found[1]}).")
+        for table, table_id, template_row_index in dynamic_tables:
+            yield from self._fill_dynamic_table(table, table_id, template_row_index, table_definitions[table_id])
+            # Новые строки тоже проходят подстановку ключей, как и остальной текст
+            for tr in table._tbl.tr_lst[1:]: paragraphs.extend(tr.iter(self._P_TAG))
+        for p_idx, p_element in enumerate(paragraphs, 1):
+            self._replace_keys_in_paragraph(Paragraph(p_element, parent), key_value_map, image_map)
+            if p_idx % self.PROGRESS_STEP == 0 or p_idx == len(paragraphs):
+                yield {'event': 'paragraphs', 'part': part_name, 'done': p_idx, 'total': len(paragraphs)}
+
+
+    _CONTENT_TYPES_NS = "http://schemas.openxmlformats.org/package/2006/content-types"
+
+    def _content_types_xml(self, parts) -> bytes:
+        """
+        [Content_Types].xml для частей parts: Default для .rels, .xml и изображений (по расширению),
+        Override для остальных частей. Строится здесь, чтобы не зависеть от внутренних классов python-docx.
+        """
+        defaults = {'rels': CT.OPC_RELATIONSHIPS, 'xml': CT.XML}; overrides = []
+        for part in parts:
+            ext = part.partname.ext.lower()
+            if defaults.get(ext) == part.content_type: continue
+            if ext not in defaults and part.content_type.startswith('image/'): defaults[ext] = part.content_type
+            else: overrides.append((part.partname, part.content_type))
+        ns = self._CONTENT_TYPES_NS
+        types = etree.Element(f"{{{ns}}}Types", nsmap={None: ns})
+        for ext, content_type in sorted(defaults.items()): etree.SubElement(types, f"{{{ns}}}Default", Extension=ext, ContentType=content_type)
+        for partname, content_type in sorted(overrides): etree.SubElement(types, f"{{{ns}}}Override", PartName=partname, ContentType=content_type)
+        return serialize_part_xml(types)
+
+    def save_document(self, doc, target):
+        """
+        Сохраняет документ с детерминированным ZIP: фиксированные дата/атрибуты записей (write_zip_entry),
+        заданный уровень сжатия. Порядок записей: [Content_Types].xml, _rels/.rels, затем части
+        в порядке имен (partname), каждая со своими связями - не зависит от порядка обхода пакета.
+
+        Args:
+            target: Путь или файловый объект для записи.
+        """
+        package = doc.part.package
+        for part in package.parts: part.before_marshal()
+        parts = sorted(package.parts, key=lambda part: part.partname)
+        compression = zipfile.ZIP_STORED if self.compress_level == 0 else zipfile.ZIP_DEFLATED
+        with zipfile.ZipFile(target, 'w', compression=compression,
+                             compresslevel=self.compress_level if self.compress_level else None) as package_zip:
+            write_zip_entry(package_zip, '[Content_Types].xml', self._content_types_xml(parts))
+            write_zip_entry(package_zip, '_rels/.rels', package.rels.xml)
+            for part in parts:
+                write_zip_entry(package_zip, part.partname.membername, part.blob)
+                if len(part.rels):
+                    write_zip_entry(package_zip, part.partname.rels_uri.membername, part.rels.xml)
+
+    def save_document_atomic(self, doc, output_path: Path):
+        """
+        Атомарная запись документа (AtomicFile, как Project.write_project_file).
+        При сбое прежний документ по пути output_path остается нетронутым.
+        """
+        with AtomicFile(output_path) as f: self.save_document(doc, f)
+
+    def iter_generate_document(self, template_path: Path, output_path: Path, project_keys_data: dict):
+        """
+        Генерация документа с выдачей событий хода работы (словари с ключом 'event'):
+            {'event': 'opened', 'template': путь, 'parts': N, 'tables': N}
+            {'event': 'part', 'part': имя, 'index': i, 'total': N} - начало обработки части
+            {'event': 'table_row', 'table_id': id, 'row': k, 'total': n}
+            {'event': 'paragraphs', 'part': имя, 'done': k, 'total': n}
+            {'event': 'saved', 'output': путь}
+            {'event': 'error', 'stage': этап, 'message': текст, 'exception': исключение}
+        События строк и абзацев выдаются каждые PROGRESS_STEP элементов.
+        Отмена - закрытие генератора (close()): запись прекращается.
+        output_path - путь или двоичный файловый объект (например, буфер записи архива, см. output_sink).
+        Путь заменяется атомарно только после успешного сохранения: при ошибке или отмене прежний
+        документ остается как был. Файловый объект при ошибке не очищается - это делает его владелец.
+        """
+        output_label = output_path if isinstance(output_path, (str, Path)) else getattr(output_path, 'name', 'поток')
+        print(f"Генерация документа из '{template_path.name}' в '{output_label}'...")
+        stage = 'open'
+        self._filter_memo = FilterMemo()
+        try:
+            doc = self._open_template(template_path)
+            stage = 'prepare'
             key_value_map = {}; table_definitions = {}
+            image_map = {}
             for key_id, data in project_keys_data.items():
                 if data.get('type') == 'dynamic_table': table_definitions[key_id] = data
+                elif is_image_key(key_id, data):
+                    if data.get('value') and Path(data['value']).is_file():
+                        image_map[key_id] = {'path': Path(data['value']), 'width_mm': data.get('image_width_mm'), 'height_mm': data.get('image_height_mm')}
+                    elif data.get('value'): print(f"Предупреждение: файл изображения для {key_id} не найден: {data['value']}")
+                    key_value_map[key_id] = '' # В частях без поддержки рисунков (и без файла) ключ просто убирается
                 else: key_value_map[key_id] = data.get('value', '')
-            print("Предварительная замена простых ключей в параграфах...")
-            for para in doc.paragraphs:
-                inline_keys = self.KEY_PATTERN.findall(para.text)
-                for key in inline_keys:
-                    if key in key_value_map: self._replace_text_in_paragraph(para, key, key_value_map[key])
-            print(f"Обработка {len(table_definitions)} динамических таблиц...")
+            def condition_lookup(name: str):
+                data = project_keys_data.get(name) or project_keys_data.get(f"{{{{{name}}}}}") or {}
+                return data.get('data') if data.get('type') == 'dynamic_table' else str(data.get('value', '')).strip()
+            stories = self._get_story_parts(doc)
+            print(f"Обработка {len(stories)} частей документа и {len(table_definitions)} динамических таблиц...")
+            yield {'event': 'opened', 'template': template_path, 'parts': len(stories), 'tables': len(table_definitions)}
+            stage = 'render'
             processed_table_elements = set()
-            for table_idx, table in enumerate(doc.tables):
-                if table._tbl in processed_table_elements: continue
-                template_row_index = -1; table_id_to_process = None; table_template_keys = None
-                for r_idx, row in enumerate(table.rows):
-                    if row.cells:
-                        first_cell_text = "".join(p.text for p in row.cells[0].paragraphs)
-                        match = self.DYNAMIC_TABLE_PATTERN.search(first_cell_text)
-                        if match:
-                            potential_table_id = match.group(1)
-                            if potential_table_id in table_definitions:
-                                table_id_to_process = potential_table_id; template_row_index = r_idx
-                                table_template_keys = table_definitions[table_id_to_process].get('template_keys', [])
-                                print(f"Найдена таблица '{table_id_to_process}' в документе (индекс {table_idx}, строка-шаблон {template_row_index}).")
-                                break
-                if table_id_to_process and template_row_index != -1 and table_template_keys is not None:
-                    processed_table_elements.add(table._tbl)
-                    table_data_rows = table_definitions[table_id_to_process].get('data', [])
-                    template_row = table.rows[template_row_index]
-                    print(f"Очистка строк данных в таблице '{table_id_to_process}'...")
-                    for r_idx in range(len(table.rows) - 1, 0, -1):
-                        row_to_remove = table.rows[r_idx]; table._tbl.remove(row_to_remove._tr)
-                    print(f"Добавление {len(table_data_rows)} строк в таблицу '{table_id_to_process}'...")
-                    num_columns = len(table.rows[0].cells) if table.rows else 0
-                    for data_idx, row_data_dict in enumerate(table_data_rows):
-                        new_row_obj = table.add_row(); new_row_cells = new_row_obj.cells
-                        if len(new_row_cells) != num_columns: print(f"Предупреждение: Несовпадение кол-ва ячеек..."); continue
-                        cell_num = new_row_cells[0]; cell_num.text = str(data_idx + 1)
-                        if len(template_row.cells) > 0:
-                             self._copy_cell_formatting(template_row.cells[0], cell_num)
-                             # Используем импортированный WD_ALIGN_PARAGRAPH
-                             if cell_num.paragraphs: cell_num.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
-                        for key_idx, template_key in enumerate(table_template_keys):
-                            cell_idx_in_doc = key_idx + 1
-                            if cell_idx_in_doc < len(new_row_cells):
-                                cell_data = new_row_cells[cell_idx_in_doc]
-                                value = str(row_data_dict.get(template_key, ''))
-                                cell_data.text = value
-                                if cell_idx_in_doc < len(template_row.cells):
-                                    self._copy_cell_formatting(template_row.cells[cell_idx_in_doc], cell_data)
-            print("Финальная замена простых ключей...")
-            all_paragraphs = list(doc.paragraphs)
-            for table in doc.tables:
-                for row in table.rows:
-                    for cell in row.cells: all_paragraphs.extend(cell.paragraphs)
-            for para in all_paragraphs:
-                keys_to_replace = list(key_value_map.keys())
-                for key in keys_to_replace:
-                     if key in para.text: self._replace_text_in_paragraph(para, key, key_value_map[key])
-            doc.save(output_path)
-            print(f"Документ успешно сгенерирован и сохранен: {output_path}")
-            return True
-        except FileNotFoundError: print(f"Ошибка: Шаблон не найден {template_path}"); return False
+            for story_idx, (root, part, commit, part_name) in enumerate(stories, 1):
+                yield {'event': 'part', 'part': part_name, 'index': story_idx, 'total': len(stories)}
+                # Рисунку нужна связь в той же части, поэтому изображения вставляются только в XmlPart (текст, колонтитулы)
+                yield from self._render_story(root, part, part_name, key_value_map, table_definitions, processed_table_elements, image_map if commit is None else None, condition_lookup)
+                if commit: commit()
+            stage = 'save'
+            if isinstance(output_path, (str, Path)): self.save_document_atomic(doc, output_path)
+            else: self.save_document(doc, output_path)
+        except GeneratorExit:
+            print(f"Генерация документа {output_label} отменена.")
+            raise
+        except FileNotFoundError as e:
+            missing = e.filename or template_path
+            if stage == 'open': message = f"Шаблон не найден: {missing}"
+            elif stage == 'save' and isinstance(output_path, (str, Path)): message = f"Папка вывода не найдена: {Path(output_path).parent}"
+            else: message = f"Файл не найден (этап {stage}): {missing}"
+            print(f"Ошибка: {message}")
+            yield {'event': 'error', 'stage': stage, 'message': message, 'exception': e}
+            return
         except Exception as e:
-            print(f"Ошибка при генерации документа {output_path}: {e}")
-            if output_path.exists():
-                try: output_path.unlink()
-                except OSError: pass
-            return False
+            print(f"Ошибка при генерации документа {output_label}: {e}")
+            yield {'event': 'error', 'stage': stage, 'message': str(e), 'exception': e}
+            return
+        # Вне try: закрытие генератора после сохранения не удаляет готовый документ
+        print(f"Документ успешно сгенерирован и сохранен: {output_label}")
+        yield {'event': 'saved', 'output': output_path}
+
+
+    @profiled('generate', lambda self, template_path, *args: Path(template_path).stem)
+    def generate_document(self, template_path: Path, output_path: Path, project_keys_data: dict) -> bool:
+        last_event = None
+        for last_event in self.iter_generate_document(template_path, output_path, project_keys_data): pass
+        return last_event is not None and last_event['event'] == 'saved'
 
 # --- Блок if __name__ == '__main__' остается для тестов ---
 if __name__ == '__main__':
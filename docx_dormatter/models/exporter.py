@@ -0,0 +1,228 @@
+import csv
+import json
+import re
+from pathlib import Path
+from typing import Iterable, Iterator
+
+
+class _JsonStreamReader:
+    """
+    Минимальный потоковый разбор JSON: читает файл порциями и декодирует
+    значения по одному, не загружая весь документ в память.
+    Если значение не уместилось в буфер, следующая порция не меньше уже прочитанного
+    (рост вдвое), поэтому повторные разборы одного большого значения стоят O(n), а не O(n^2).
+    """
+    _NON_WHITESPACE = re.compile(r"[^ \t\n\r]")
+
+    def __init__(self, file_obj, chunk_size: int = 65536):
+        self._file = file_obj
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self, size: int | None = None) -> bool:
+        """Дочитывает следующую порцию; отброшенное начало буфера не храним."""
+        if self._eof: return False
+        chunk = self._file.read(size or self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _skip_ws(self):
+        while True:
+            match = self._NON_WHITESPACE.search(self._buf, self._pos)
+            self._pos = match.start() if match else len(self._buf)
+            if match or not self._fill(): return
+
+    def peek(self) -> str:
+        self._skip_ws()
+        if self._pos >= len(self._buf): raise ValueError("Неожиданный конец файла проекта.")
+        return self._buf[self._pos]
+
+    def expect(self, char: str):
+        if self.peek() != char: raise ValueError(f"Неверный формат файла проекта: ожидался '{char}'.")
+        self._pos += 1
+
+    def decode_value(self):
+        self._skip_ws()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+                # Число или литерал на границе порции могут быть обрезаны - дочитываем
+                if end < len(self._buf) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof: raise
+            self._fill(max(self._chunk_size, len(self._buf) - self._pos))
+
+    def iter_array(self) -> Iterator:
+        """Элементы массива по одному (без разбора массива целиком)."""
+        self.expect('[')
+        while self.peek() != ']':
+            yield self.decode_value()
+            if self.peek() == ',': self.expect(',')
+        self.expect(']')
+
+    def read_fields(self, target: dict):
+        """Дочитывает поля объекта до '}' включительно в target."""
+        while self.peek() != '}':
+            field = self.decode_value()
+            self.expect(':')
+            target[field] = self.decode_value()
+            if self.peek() == ',': self.expect(',')
+        self.expect('}')
+
+
+def _read_keys_item(reader: _JsonStreamReader, stream_rows: bool):
+    """
+    Значение элемента keys_data и функция, дочитывающая элемент после его обработки (или None).
+    При stream_rows строки таблицы ('data' после 'type' и 'template_keys', как пишет Project)
+    выдаются ленивым итератором: в памяти одна строка, а не вся таблица.
+    """
+    if not stream_rows or reader.peek() != '{': return reader.decode_value(), None
+    reader.expect('{'); data = {}
+    while reader.peek() != '}':
+        field = reader.decode_value()
+        reader.expect(':')
+        if field == 'data' and data.get('type') == 'dynamic_table' and 'template_keys' in data and reader.peek() == '[':
+            rows = reader.iter_array()
+            data['data'] = rows
+
+            def finish():
+                for _ in rows: pass # Необработанные строки пропускаются
+                if reader.peek() == ',': reader.expect(',')
+                reader.read_fields(data)
+            return data, finish
+        data[field] = reader.decode_value()
+        if reader.peek() == ',': reader.expect(',')
+    reader.expect('}')
+    return data, None
+
+
+def iter_keys_data_from_file(path: Path, chunk_size: int = 65536, stream_rows: bool = False) -> Iterator[tuple[str, dict]]:
+    """
+    Генератор пар (key_id, data) из раздела keys_data файла .dfp.
+    Одновременно в памяти находится только один элемент (ключ или таблица).
+
+    Args:
+        stream_rows: Строки таблиц (data) - ленивый итератор вместо списка; он действителен
+                     только до запроса следующего элемента.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        reader = _JsonStreamReader(f, chunk_size)
+        reader.expect('{')
+        found_keys_data = False
+        while reader.peek() != '}':
+            section = reader.decode_value()
+            reader.expect(':')
+            if section == 'keys_data':
+                found_keys_data = True
+                reader.expect('{')
+                while reader.peek() != '}':
+                    key_id = reader.decode_value()
+                    reader.expect(':')
+                    value, finish = _read_keys_item(reader, stream_rows)
+                    yield key_id, value
+                    if finish is not None: finish()
+                    if reader.peek() == ',': reader.expect(',')
+                reader.expect('}')
+            else:
+                reader.decode_value() # Остальные разделы (template_paths и т.п.) пропускаем
+            if reader.peek() == ',': reader.expect(',')
+        if not found_keys_data: raise ValueError("Неверный формат файла проекта.")
+
+
+class ProjectExporter:
+    """
+    Потоковый экспорт keys_data и динамических таблиц проекта в CSV или JSON Lines.
+    Простые ключи пишутся в keys.<ext>, каждая таблица - в table_<id>.<ext>.
+    Записи формируются генераторами и сразу уходят в файл.
+    """
+    FORMATS = ('csv', 'jsonl')
+    KEY_COLUMNS = ['key', 'value', 'status', 'is_frozen']
+    ROW_NUMBER_COLUMN = '№ п/п'
+
+    def __init__(self, fmt: str = 'csv'):
+        if fmt not in self.FORMATS: raise ValueError(f"Неподдерживаемый формат экспорта: {fmt}")
+        self.fmt = fmt
+
+    @staticmethod
+    def table_columns(table_data: dict) -> list[tuple[str, str]]:
+        """Пары (заголовок, template_key) в порядке столбцов таблицы."""
+        template_keys = table_data.get('template_keys', [])
+        provided_columns = table_data.get('columns', [])
+        if len(provided_columns) == len(template_keys):
+            headers = provided_columns
+        else:
+            headers = [key.strip('{} ') or f"Столбец {i+1}" for i, key in enumerate(template_keys)]
+        return list(zip(headers, template_keys))
+
+    def key_record(self, key_id: str, data: dict) -> dict:
+        return {
+            'key': key_id,
+            'value': data.get('value', ''),
+            'status': data.get('status', 'unknown'),
+            'is_frozen': data.get('is_frozen', False),
+        }
+
+    def iter_table_records(self, table_data: dict) -> Iterator[dict]:
+        columns = self.table_columns(table_data)
+        for row_idx, row_data_dict in enumerate(table_data.get('data', [])):
+            record = {self.ROW_NUMBER_COLUMN: row_idx + 1}
+            for header, template_key in columns:
+                record[header] = str(row_data_dict.get(template_key, ''))
+            yield record
+
+    def _open_writer(self, path: Path, fieldnames: list[str]):
+        f = open(path, 'w', encoding='utf-8', newline='')
+        if self.fmt == 'csv':
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            return f, writer.writerow
+        return f, lambda record: f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def export(self, keys_items: Iterable[tuple[str, dict]], output_dir: Path) -> dict:
+        """
+        Экспортирует элементы keys_data в папку output_dir.
+
+        Args:
+            keys_items: Итерируемые пары (key_id, data), например project.keys_data.items()
+                        или iter_keys_data_from_file(path).
+            output_dir: Папка для файлов экспорта (создается при необходимости).
+
+        Returns:
+            Словарь статистики: {'keys': N, 'tables': {table_id: rows}, 'files': [...]}
+        """
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        stats = {'keys': 0, 'tables': {}, 'files': []}
+        keys_file = None; write_key = None
+        try:
+            for key_id, data in keys_items:
+                if data.get('type') == 'dynamic_table':
+                    table_path = output_dir / f"table_{key_id}.{self.fmt}"
+                    fieldnames = [self.ROW_NUMBER_COLUMN] + [h for h, _ in self.table_columns(data)]
+                    table_file, write_row = self._open_writer(table_path, fieldnames)
+                    rows = 0
+                    with table_file:
+                        for record in self.iter_table_records(data):
+                            write_row(record); rows += 1
+                    stats['tables'][key_id] = rows
+                    stats['files'].append(table_path)
+                else:
+                    if keys_file is None:
+                        keys_path = output_dir / f"keys.{self.fmt}"
+                        keys_file, write_key = self._open_writer(keys_path, self.KEY_COLUMNS)
+                        stats['files'].append(keys_path)
+                    write_key(self.key_record(key_id, data))
+                    stats['keys'] += 1
+        finally:
+            if keys_file is not None: keys_file.close()
+        print(f"Экспорт завершен: ключей {stats['keys']}, таблиц {len(stats['tables'])} -> {output_dir}")
+        return stats
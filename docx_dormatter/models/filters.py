@@ -0,0 +1,131 @@
+import functools
+import re
+from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+# Фильтры в ключах шаблона: {{ИМЯ|фильтр|фильтр:аргумент}}, например {{DATE|date:%d.%m.%Y}} или {{ORG_NAME|upper}}.
+# Значение берется из ключа {{ИМЯ}} проекта, фильтры применяются слева направо.
+# Аргумент - все после первого двоеточия (в формате даты допустимы ':'), символ '|' в аргументе недопустим.
+FILTER_SEPARATOR = '|'
+# Форматы, в которых пользователи вводят даты (первый подходящий)
+INPUT_DATE_FORMATS = ('%Y-%m-%d', '%d.%m.%Y', '%d.%m.%y', '%d/%m/%Y', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M')
+_NUMBER_SPACES = re.compile(r"\s")
+
+
+class FilterError(ValueError):
+    """Неизвестный фильтр или неверный аргумент (обнаруживается при сканировании шаблона)."""
+
+
+def _parse_date(value: str) -> datetime | None:
+    value = value.strip()
+    for date_format in INPUT_DATE_FORMATS:
+        try: return datetime.strptime(value, date_format)
+        except ValueError: continue
+    return None
+
+
+def _date_filter(argument: str | None):
+    if not argument: raise FilterError("фильтру date нужен формат, например date:%d.%m.%Y")
+    def apply(value: str) -> str:
+        parsed = _parse_date(value)
+        return parsed.strftime(argument) if parsed is not None else value # Не дата - значение без изменений
+    return apply
+
+
+def _number_filter(argument: str | None):
+    """Число в русской записи: группы разрядов через неразрывный пробел, запятая перед дробной частью."""
+    try: decimals = int(argument) if argument else None
+    except ValueError: raise FilterError(f"аргумент фильтра number должен быть числом знаков: {argument}") from None
+    def apply(value: str) -> str:
+        try: number = Decimal(_NUMBER_SPACES.sub('', value).replace(',', '.'))
+        except InvalidOperation: return value
+        if not number.is_finite(): return value
+        if decimals is not None: number = number.quantize(Decimal(1).scaleb(-decimals), rounding=ROUND_HALF_UP)
+        places = decimals if decimals is not None else max(0, -number.as_tuple().exponent)
+        return f"{number:,.{places}f}".replace(',', '\u00a0').replace('.', ',')
+    return apply
+
+
+def _default_filter(argument: str | None):
+    fallback = argument or ''
+    return lambda value: value if value.strip() else fallback
+
+
+def _simple(function):
+    def factory(argument: str | None):
+        if argument is not None: raise FilterError("фильтр не принимает аргументов")
+        return function
+    return factory
+
+
+# Имя фильтра -> фабрика(аргумент) -> функция(строка) -> строка
+FILTERS = {
+    'upper': _simple(str.upper),
+    'lower': _simple(str.lower),
+    'capitalize': _simple(lambda value: value[:1].upper() + value[1:]),
+    'title': _simple(str.title),
+    'strip': _simple(str.strip),
+    'date': _date_filter,
+    'number': _number_filter,
+    'default': _default_filter,
+}
+
+
+def base_key(placeholder: str) -> str:
+    """Ключ проекта для ключа шаблона: {{DATE|date:%d.%m.%Y}} -> {{DATE}}."""
+    if FILTER_SEPARATOR not in placeholder: return placeholder
+    return "{{" + placeholder[2:-2].split(FILTER_SEPARATOR, 1)[0].strip() + "}}"
+
+
+class CompiledPlaceholder:
+    """Ключ шаблона с фильтрами, разобранный один раз в цепочку функций."""
+    __slots__ = ('placeholder', 'base_key', 'filters')
+
+    def __init__(self, placeholder: str, base: str, filters: tuple):
+        self.placeholder = placeholder; self.base_key = base; self.filters = filters
+
+    def apply(self, value: str) -> str:
+        for function in self.filters: value = function(value)
+        return value
+
+
+@functools.lru_cache(maxsize=4096)
+def compile_placeholder(placeholder: str) -> CompiledPlaceholder:
+    """
+    Разбирает ключ с фильтрами. Результат кэшируется в процессе: сканирование шаблона
+    компилирует фильтры заранее, генерация получает готовые функции.
+
+    Raises:
+        FilterError: Неизвестный фильтр или неверный аргумент.
+    """
+    name, *specs = placeholder[2:-2].split(FILTER_SEPARATOR)
+    filters = []
+    for spec in specs:
+        filter_name, separator, argument = spec.partition(':')
+        filter_name = filter_name.strip()
+        factory = FILTERS.get(filter_name)
+        if factory is None: raise FilterError(f"неизвестный фильтр '{filter_name}' в {placeholder}")
+        try: filters.append(factory(argument if separator else None))
+        except FilterError as e: raise FilterError(f"{filter_name}: {e} в {placeholder}") from None
+    return CompiledPlaceholder(placeholder, "{{" + name.strip() + "}}", tuple(filters))
+
+
+class FilterMemo:
+    """
+    Результаты фильтров на время одной генерации: (ключ шаблона, значение) -> текст.
+    Одинаковые значения (например, дата в каждом колонтитуле или столбец таблицы
+    с повторами) форматируются один раз.
+    """
+
+    def __init__(self):
+        self._results: dict[tuple[str, str], str] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def apply(self, placeholder: str, value: str) -> str:
+        memo_key = (placeholder, value)
+        result = self._results.get(memo_key)
+        if result is not None: self.hits += 1; return result
+        result = compile_placeholder(placeholder).apply(value)
+        self._results[memo_key] = result; self.misses += 1
+        return result
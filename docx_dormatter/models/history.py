@@ -0,0 +1,199 @@
+import sys
+import time
+from collections import deque
+
+
+def _value_size(value) -> int:
+    """Приблизительный объем значения в памяти (строки и словари строк таблиц)."""
+    if isinstance(value, dict): return sys.getsizeof(value) + sum(_value_size(k) + _value_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)): return sys.getsizeof(value) + sum(_value_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class EditOperation:
+    """
+    Обратимое изменение проекта. Хранит только затронутые значения (до и после),
+    поэтому объем истории зависит от размера правок, а не от размера проекта.
+    """
+    description = "изменение"
+
+    def __init__(self, key_id: str):
+        self.key_id = key_id
+
+    def apply(self, project) -> bool: raise NotImplementedError
+    def revert(self, project) -> bool: raise NotImplementedError
+
+    def size(self) -> int:
+        return sys.getsizeof(self) + _value_size(self.__dict__)
+
+    def merge(self, other: 'EditOperation') -> bool:
+        """Поглощает следующую операцию (например, очередной символ того же поля). True - объединено."""
+        return False
+
+
+class SetKeyFields(EditOperation):
+    """Изменение полей простого ключа (value, status, is_frozen, размеры изображения)."""
+    description = "изменение ключа"
+    MERGEABLE_FIELDS = {'value', 'status'} # Набор текста объединяется; заморозка и размеры - отдельные шаги
+
+    def __init__(self, key_id: str, before: dict, after: dict):
+        super().__init__(key_id)
+        self.before = before; self.after = after
+
+    def apply(self, project) -> bool: return project.set_key_fields(self.key_id, self.after)
+    def revert(self, project) -> bool: return project.set_key_fields(self.key_id, self.before)
+
+    def merge(self, other) -> bool:
+        if not isinstance(other, SetKeyFields) or other.key_id != self.key_id: return False
+        if not set(self.after) | set(other.after) <= self.MERGEABLE_FIELDS: return False
+        for field, value in other.before.items(): self.before.setdefault(field, value)
+        self.after.update(other.after)
+        return True
+
+
+class SetCells(EditOperation):
+    """Изменение ячеек таблицы: [(row, column_key, before, after), ...]."""
+    description = "изменение ячеек"
+
+    def __init__(self, key_id: str, cells: list[tuple[int, str, str, str]]):
+        super().__init__(key_id)
+        self.cells = cells
+
+    def apply(self, project) -> bool:
+        return project.set_table_cells(self.key_id, [(row, column, after) for row, column, _, after in self.cells])
+
+    def revert(self, project) -> bool:
+        return project.set_table_cells(self.key_id, [(row, column, before) for row, column, before, _ in reversed(self.cells)])
+
+    def merge(self, other) -> bool:
+        # Повторная правка той же единственной ячейки - один шаг отмены
+        if not isinstance(other, SetCells) or other.key_id != self.key_id: return False
+        if len(self.cells) != 1 or len(other.cells) != 1 or self.cells[0][:2] != other.cells[0][:2]: return False
+        row, column, before, _ = self.cells[0]
+        self.cells = [(row, column, before, other.cells[0][3])]
+        return True
+
+
+class InsertRows(EditOperation):
+    """Вставка строк таблицы в позицию index."""
+    description = "добавление строк"
+
+    def __init__(self, key_id: str, index: int, rows: list[dict]):
+        super().__init__(key_id)
+        self.index = index; self.rows = rows
+
+    def apply(self, project) -> bool: return project.insert_table_rows(self.key_id, self.index, self.rows)
+    def revert(self, project) -> bool:
+        return project.delete_table_rows(self.key_id, list(range(self.index, self.index + len(self.rows)))) is not None
+
+
+class DeleteRows(EditOperation):
+    """Удаление строк таблицы: [(index, row), ...] по возрастанию индексов."""
+    description = "удаление строк"
+
+    def __init__(self, key_id: str, removed: list[tuple[int, dict]]):
+        super().__init__(key_id)
+        self.removed = removed
+
+    def apply(self, project) -> bool:
+        return project.delete_table_rows(self.key_id, [index for index, _ in self.removed]) is not None
+
+    def revert(self, project) -> bool:
+        ok = True
+        for index, row in self.removed: ok = project.insert_table_rows(self.key_id, index, [row]) and ok # По возрастанию - индексы точные
+        return ok
+
+
+class PermuteRows(EditOperation):
+    """Перестановка строк в диапазоне start..start+len(order)-1: новая строка i = старая строка start+order[i]."""
+    description = "перемещение строк"
+
+    def __init__(self, key_id: str, start: int, order: list[int]):
+        super().__init__(key_id)
+        self.start = start; self.order = order
+
+    def apply(self, project) -> bool: return project.permute_table_rows(self.key_id, self.start, self.order)
+
+    def revert(self, project) -> bool:
+        inverse = [0] * len(self.order)
+        for new_pos, old_pos in enumerate(self.order): inverse[old_pos] = new_pos
+        return project.permute_table_rows(self.key_id, self.start, inverse)
+
+
+class BatchOperation(EditOperation):
+    """Несколько операций одного элемента как один шаг (например, вставка блока из буфера обмена)."""
+
+    def __init__(self, key_id: str, operations: list[EditOperation], description: str = "пакетное изменение"):
+        super().__init__(key_id)
+        self.operations = operations; self.description = description
+
+    def apply(self, project) -> bool:
+        return all([operation.apply(project) for operation in self.operations])
+
+    def revert(self, project) -> bool:
+        return all([operation.revert(project) for operation in reversed(self.operations)])
+
+    def size(self) -> int:
+        return sys.getsizeof(self) + sum(operation.size() for operation in self.operations)
+
+
+class EditHistory:
+    """
+    Стек отмены/повтора операций редактирования с ограничением по памяти.
+    Последовательные однотипные правки (набор текста в одном поле, одна ячейка)
+    в пределах merge_seconds объединяются в один шаг. При превышении max_bytes
+    самые старые шаги отмены отбрасываются.
+    """
+    DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+    MERGE_SECONDS = 1.5
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, merge_seconds: float = MERGE_SECONDS):
+        self.max_bytes = max_bytes
+        self.merge_seconds = merge_seconds
+        self._undo: deque[tuple[EditOperation, int]] = deque() # (операция, ее объем)
+        self._redo: list[tuple[EditOperation, int]] = []
+        self._bytes = 0
+        self._last_record_time: float | None = None
+
+    def clear(self):
+        self._undo.clear(); self._redo.clear(); self._bytes = 0; self._last_record_time = None
+
+    def record(self, operation: EditOperation, now: float | None = None):
+        """Добавляет уже примененную операцию; стек повтора очищается."""
+        now = time.monotonic() if now is None else now
+        self._bytes -= sum(size for _, size in self._redo); self._redo.clear()
+        recent = self._last_record_time is not None and now - self._last_record_time <= self.merge_seconds
+        self._last_record_time = now
+        if recent and self._undo and self._undo[-1][0].merge(operation):
+            top, old_size = self._undo.pop(); new_size = top.size()
+            self._undo.append((top, new_size)); self._bytes += new_size - old_size
+        else:
+            size = operation.size()
+            self._undo.append((operation, size)); self._bytes += size
+        while self._bytes > self.max_bytes and len(self._undo) > 1:
+            _, size = self._undo.popleft(); self._bytes -= size
+
+    def can_undo(self) -> bool: return bool(self._undo)
+    def can_redo(self) -> bool: return bool(self._redo)
+
+    def undo_description(self) -> str | None:
+        return f"{self._undo[-1][0].description} {self._undo[-1][0].key_id}" if self._undo else None
+
+    def redo_description(self) -> str | None:
+        return f"{self._redo[-1][0].description} {self._redo[-1][0].key_id}" if self._redo else None
+
+    def undo(self, project) -> EditOperation | None:
+        """Отменяет последний шаг; возвращает операцию (для обновления интерфейса) или None."""
+        if not self._undo: return None
+        entry = self._undo.pop(); entry[0].revert(project)
+        self._redo.append(entry); self._last_record_time = None # После отмены новая правка не сливается со старой
+        return entry[0]
+
+    def redo(self, project) -> EditOperation | None:
+        if not self._redo: return None
+        entry = self._redo.pop(); entry[0].apply(project)
+        self._undo.append(entry); self._last_record_time = None
+        return entry[0]
+
+    def stats(self) -> dict:
+        return {'undo': len(self._undo), 'redo': len(self._redo), 'bytes': self._bytes, 'max_bytes': self.max_bytes}
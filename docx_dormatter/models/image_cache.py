@@ -0,0 +1,134 @@
+import hashlib
+import io
+import re
+from collections import OrderedDict
+from pathlib import Path
+
+_pil_image = None # Модуль PIL.Image; импортируется при первом пережатии (ускоряет запуск GUI)
+
+
+def _load_pil():
+    """PIL.Image или None, если Pillow не установлен (изображения вставляются без пережатия)."""
+    global _pil_image
+    if _pil_image is None:
+        try:
+            from PIL import Image # type: ignore
+        except ImportError:
+            Image = False
+        _pil_image = Image
+    return _pil_image or None
+
+EMU_PER_MM = 36000
+# Ключи-изображения: {{..._PICTURE}} или элемент с 'type': 'image'; значение - путь к файлу
+IMAGE_KEY_PATTERN = re.compile(r"\{\{\w*_PICTURE\}\}")
+
+
+def is_image_key(key_id: str, data: dict) -> bool:
+    return data.get('type') == 'image' or bool(IMAGE_KEY_PATTERN.fullmatch(key_id))
+
+
+class ImageCache:
+    """
+    Кэш подготовленных изображений для подстановки в документы.
+    Ключ кэша - SHA-256 содержимого файла и целевой размер, поэтому одна и та же
+    фотография уменьшается и пережимается один раз на весь пакетный запуск,
+    даже если лежит по разным путям. Одинаковые байты python-docx хранит в пакете
+    одной частью (get_or_add_image сравнивает SHA-1), сколько бы ключей их ни использовало.
+    """
+    DEFAULT_DPI = 150
+    JPEG_QUALITY = 85
+
+    def __init__(self, max_entries: int = 128, dpi: int = DEFAULT_DPI, cache_dir: Path | None = None):
+        """
+        Args:
+            max_entries: Сколько подготовленных изображений держать в памяти (LRU).
+            dpi: Разрешение, до которого уменьшаются изображения при заданном размере.
+            cache_dir: Необязательная папка для хранения подготовленных изображений между запусками.
+        """
+        self.max_entries = max_entries
+        self.dpi = dpi
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self._prepared: OrderedDict[tuple, dict] = OrderedDict()
+        self._digests: dict[Path, tuple[tuple[int, int], str]] = {} # { path: ((mtime_ns, size), sha256) }
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def _file_digest(self, path: Path) -> tuple[str, bytes | None]:
+        """SHA-256 файла; для неизмененного файла (mtime/размер) файл повторно не читается."""
+        st = path.stat(); stamp = (st.st_mtime_ns, st.st_size)
+        cached = self._digests.get(path)
+        if cached and cached[0] == stamp: return cached[1], None
+        data = path.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        self._digests[path] = (stamp, digest)
+        return digest, data
+
+    def _target_pixels(self, width_mm: float | None, height_mm: float | None, source_size: tuple[int, int]) -> tuple[int, int]:
+        src_w, src_h = source_size
+        if width_mm and height_mm: target = (width_mm, height_mm)
+        elif width_mm: target = (width_mm, width_mm * src_h / src_w)
+        else: target = (height_mm * src_w / src_h, height_mm)
+        return tuple(max(1, round(mm / 25.4 * self.dpi)) for mm in target)
+
+    def _encode(self, data: bytes, width_mm: float | None, height_mm: float | None) -> tuple[bytes, str, tuple[int, int] | None]:
+        """Уменьшает и пережимает изображение (при наличии Pillow). Возвращает (байты, расширение, размер в пикселях)."""
+        if not (width_mm or height_mm): return data, 'bin', None
+        Image = _load_pil()
+        if Image is None: return data, 'bin', None
+        with Image.open(io.BytesIO(data)) as img:
+            source_size = img.size
+            target_px = self._target_pixels(width_mm, height_mm, source_size)
+            if target_px[0] >= source_size[0] and target_px[1] >= source_size[1]:
+                return data, 'bin', source_size # Увеличивать нет смысла - вставляем как есть
+            has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+            resized = img.convert('RGBA' if has_alpha else 'RGB').resize(target_px, Image.LANCZOS)
+            out = io.BytesIO()
+            if has_alpha: resized.save(out, format='PNG', optimize=True); ext = 'png'
+            else: resized.save(out, format='JPEG', quality=self.JPEG_QUALITY, optimize=True); ext = 'jpg'
+            return out.getvalue(), ext, target_px
+
+    def get(self, image_path: Path, width_mm: float | None = None, height_mm: float | None = None) -> dict:
+        """
+        Возвращает подготовленное изображение:
+        {'blob': bytes, 'width_emu': int | None, 'height_emu': int | None}.
+        Не заданный размер python-docx вычислит по пропорциям изображения.
+        """
+        image_path = Path(image_path)
+        digest, data = self._file_digest(image_path)
+        cache_key = (digest, width_mm, height_mm)
+        prepared = self._prepared.get(cache_key)
+        if prepared is not None:
+            self._prepared.move_to_end(cache_key); self.stats['hits'] += 1
+            return prepared
+        self.stats['misses'] += 1
+        blob = self._read_disk_cache(cache_key)
+        if blob is None:
+            if data is None: data = image_path.read_bytes()
+            blob, ext, _ = self._encode(data, width_mm, height_mm)
+            self._write_disk_cache(cache_key, blob, ext)
+        prepared = {
+            'blob': blob,
+            'width_emu': round(width_mm * EMU_PER_MM) if width_mm else None,
+            'height_emu': round(height_mm * EMU_PER_MM) if height_mm else None,
+        }
+        self._prepared[cache_key] = prepared
+        while len(self._prepared) > self.max_entries: self._prepared.popitem(last=False)
+        return prepared
+
+    def _disk_cache_name(self, cache_key: tuple) -> str:
+        digest, width_mm, height_mm = cache_key
+        return f"{digest}_{width_mm or 0}x{height_mm or 0}"
+
+    def _read_disk_cache(self, cache_key: tuple) -> bytes | None:
+        if not self.cache_dir: return None
+        for path in self.cache_dir.glob(self._disk_cache_name(cache_key) + ".*"):
+            try: return path.read_bytes()
+            except OSError: return None
+        return None
+
+    def _write_disk_cache(self, cache_key: tuple, blob: bytes, ext: str):
+        if not self.cache_dir: return
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            (self.cache_dir / f"{self._disk_cache_name(cache_key)}.{ext}").write_bytes(blob)
+        except OSError as e:
+            print(f"Предупреждение: не удалось записать кэш изображения: {e}")
@@ -0,0 +1,120 @@
+from bisect import bisect_left, insort
+
+
+class KeyIndex:
+    """
+    Поисковый индекс по именам ключей и таблиц проекта.
+    Поиск по префиксу - бинарный поиск в отсортированном списке нормализованных имен,
+    поиск по подстроке - пересечение множеств по триграммам.
+    Обновляется инкрементально через upsert/remove.
+    """
+    STATUS_FILTERS = ('all', 'empty', 'filled', 'is_frozen', 'table')
+
+    def __init__(self):
+        self._entries: dict[str, dict] = {} # { key_id: {'norm': ..., 'status': ..., 'is_frozen': ..., 'is_table': ...} }
+        self._sorted_norms: list[tuple[str, str]] = [] # [(norm, key_id), ...] по возрастанию
+        self._trigrams: dict[str, set[str]] = {} # { триграмма: {key_id, ...} }
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Имя для поиска: без фигурных скобок и пробелов по краям, в нижнем регистре."""
+        return text.strip('{} ').lower()
+
+    @staticmethod
+    def _iter_trigrams(norm: str):
+        for i in range(len(norm) - 2):
+            yield norm[i:i + 3]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key_id: str) -> bool:
+        return key_id in self._entries
+
+    def key_ids(self) -> set[str]:
+        return set(self._entries)
+
+    def upsert(self, key_id: str, data: dict) -> bool:
+        """Добавляет ключ или обновляет его статус. Возвращает True, если ключ новый."""
+        is_table = data.get('type') == 'dynamic_table'
+        entry = self._entries.get(key_id)
+        if entry is None:
+            norm = self.normalize(key_id)
+            entry = {'norm': norm}
+            self._entries[key_id] = entry
+            insort(self._sorted_norms, (norm, key_id))
+            for trigram in self._iter_trigrams(norm):
+                self._trigrams.setdefault(trigram, set()).add(key_id)
+            is_new = True
+        else:
+            is_new = False
+        entry['is_table'] = is_table
+        entry['status'] = 'table' if is_table else data.get('status', 'empty')
+        entry['is_frozen'] = False if is_table else data.get('is_frozen', False)
+        return is_new
+
+    def remove(self, key_id: str) -> bool:
+        entry = self._entries.pop(key_id, None)
+        if entry is None: return False
+        norm = entry['norm']
+        pos = bisect_left(self._sorted_norms, (norm, key_id))
+        if pos < len(self._sorted_norms) and self._sorted_norms[pos] == (norm, key_id):
+            del self._sorted_norms[pos]
+        for trigram in self._iter_trigrams(norm):
+            bucket = self._trigrams.get(trigram)
+            if bucket is not None:
+                bucket.discard(key_id)
+                if not bucket: del self._trigrams[trigram]
+        return True
+
+    def is_table(self, key_id: str) -> bool:
+        entry = self._entries.get(key_id)
+        return bool(entry and entry['is_table'])
+
+    def matches_status(self, key_id: str, status: str) -> bool:
+        entry = self._entries.get(key_id)
+        if entry is None: return False
+        if status == 'all': return True
+        if status == 'is_frozen': return entry['is_frozen']
+        return entry['status'] == status
+
+    def matches(self, key_id: str, text: str = '', status: str = 'all') -> bool:
+        """Проверка одного ключа без обращения к индексам (для инкрементальных обновлений)."""
+        entry = self._entries.get(key_id)
+        if entry is None or not self.matches_status(key_id, status): return False
+        query = self.normalize(text)
+        return not query or query in entry['norm']
+
+    def _prefix_candidates(self, query: str) -> list[str]:
+        start = bisect_left(self._sorted_norms, (query, ''))
+        result = []
+        for pos in range(start, len(self._sorted_norms)):
+            norm, key_id = self._sorted_norms[pos]
+            if not norm.startswith(query): break
+            result.append(key_id)
+        return result
+
+    def _substring_candidates(self, query: str) -> set[str]:
+        if len(query) < 3:
+            return {key_id for key_id, entry in self._entries.items() if query in entry['norm']}
+        buckets = [self._trigrams.get(trigram, set()) for trigram in self._iter_trigrams(query)]
+        buckets.sort(key=len)
+        candidates = set(buckets[0])
+        for bucket in buckets[1:]:
+            candidates &= bucket
+            if not candidates: break
+        return {key_id for key_id in candidates if query in self._entries[key_id]['norm']}
+
+    def search(self, text: str = '', status: str = 'all', prefix_only: bool = False) -> list[str]:
+        """
+        Возвращает отсортированный список key_id, подходящих под запрос и фильтр статуса.
+        По умолчанию ищется подстрока; prefix_only=True ограничивает поиск началом имени.
+        """
+        query = self.normalize(text)
+        if not query:
+            key_ids = self._entries
+        elif prefix_only:
+            key_ids = self._prefix_candidates(query)
+        else:
+            key_ids = self._substring_candidates(query)
+        return sorted(k for k in key_ids if self.matches_status(k, status))
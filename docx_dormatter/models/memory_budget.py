@@ -0,0 +1,186 @@
+import contextlib
+import gc
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+try:
+    import resource # Пиковый RSS процесса (нет в Windows)
+except ImportError:
+    resource = None
+
+MB = 1024 * 1024
+SCENARIOS = ('find_keys', 'generate', 'load')
+SYNTHETIC_TABLE_ID = "Items"
+SYNTHETIC_TABLE_KEYS = ["{{ITEM_NAME}}", "{{ITEM_QTY}}", "{{ITEM_NOTE}}"]
+
+# Бюджеты (МБ) для масштаба 1: peak - пик tracemalloc во время вызова, retained - память,
+# оставшаяся после вызова (включая возвращенный объект), rss - прирост пикового RSS процесса.
+# Для масштаба N бюджеты умножаются на N (входные данные растут линейно).
+# tracemalloc не видит память libxml2 (дерево lxml), поэтому для generate/find_keys важен и RSS.
+# Значения - измеренные (find_keys: пик 0.12; generate: пик 2.2, RSS 2.6; load: пик 2.8, удержано 1.4)
+# с запасом; RSS с запасом на шум аллокатора. Проверяются тестом tests/test_memory_budget.py.
+DEFAULT_BUDGETS = {
+    'find_keys': {'peak_mb': 1, 'retained_mb': 0.5, 'rss_mb': 8},
+    'generate': {'peak_mb': 4, 'retained_mb': 0.5, 'rss_mb': 8},
+    'load': {'peak_mb': 4, 'retained_mb': 2, 'rss_mb': 8},
+}
+
+
+def synthetic_sizes(scale: int) -> dict:
+    """Размеры синтетических входных данных для масштаба scale."""
+    return {'paragraphs': 200 * scale, 'keys': 100 * scale, 'table_rows': 300 * scale, 'project_keys': 2000 * scale}
+
+
+def build_synthetic_template(path: Path, paragraphs: int, keys: int):
+    """Шаблон: абзацы с ключами {{KEY_i}} и динамическая таблица со строкой-шаблоном."""
+    import docx
+    document = docx.Document()
+    for i in range(paragraphs):
+        document.add_paragraph(f"Абзац {i}: значение {{{{KEY_{i % keys}}}}} и текст для объема документа.")
+    table = document.add_table(rows=2, cols=len(SYNTHETIC_TABLE_KEYS) + 1)
+    for cell, title in zip(table.rows[0].cells, ["№", "Наименование", "Количество", "Примечание"]): cell.text = title
+    template_cells = table.rows[1].cells
+    template_cells[0].text = f"{{{{DYNAMIC_TABLE::{SYNTHETIC_TABLE_ID}}}}}"
+    for cell, key in zip(template_cells[1:], SYNTHETIC_TABLE_KEYS): cell.text = key
+    document.save(path)
+
+
+def build_synthetic_keys_data(keys: int, table_rows: int) -> dict:
+    keys_data = {f"{{{{KEY_{i}}}}}": {'value': f"Значение ключа {i}", 'status': 'filled'} for i in range(keys)}
+    keys_data[SYNTHETIC_TABLE_ID] = {
+        'type': 'dynamic_table', 'status': 'filled', 'template_keys': list(SYNTHETIC_TABLE_KEYS),
+        'data': [{"{{ITEM_NAME}}": f"Позиция {i}", "{{ITEM_QTY}}": str(i % 50 + 1), "{{ITEM_NOTE}}": f"Примечание к позиции {i}"}
+                 for i in range(table_rows)],
+    }
+    return keys_data
+
+
+def build_synthetic_project(path: Path, template_path: Path, keys_data: dict, extra_keys: int):
+    """Файл проекта: keys_data плюс extra_keys заполненных ключей для нагрузки на загрузку."""
+    from models.project import Project
+    keys_data = dict(keys_data)
+    for i in range(extra_keys):
+        keys_data[f"{{{{EXTRA_{i}}}}}"] = {'value': f"Дополнительное значение {i} " * 4, 'status': 'filled', 'is_frozen': False}
+    Project.write_project_file(path, {
+        "version": "1.0", "template_paths": [str(template_path)], "output_path": None, "keys_data": keys_data,
+    })
+
+
+def _peak_rss_bytes() -> int | None:
+    if resource is None: return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024 # В Linux - килобайты, в macOS - байты
+
+
+def prepare_inputs(work_dir: Path, scale: int = 1):
+    """Записывает синтетические входные данные в work_dir (шаблон, keys_data, файл проекта)."""
+    sizes = synthetic_sizes(scale)
+    template_path = work_dir / "template.docx"
+    build_synthetic_template(template_path, sizes['paragraphs'], sizes['keys'])
+    keys_data = build_synthetic_keys_data(sizes['keys'], sizes['table_rows'])
+    with open(work_dir / "keys_data.json", 'w', encoding='utf-8') as f: json.dump(keys_data, f, ensure_ascii=False)
+    build_synthetic_project(work_dir / "project.dfp", template_path, keys_data, sizes['project_keys'])
+
+
+def _scenario_runner(scenario: str, work_dir: Path):
+    """Функция, выполняющая проверяемый путь на подготовленных входных данных."""
+    from models.docx_handler import DocxHandler
+    from models.project import Project
+    template_path = work_dir / "template.docx"
+    handler = DocxHandler()
+    if scenario == 'find_keys':
+        return lambda: handler.find_keys_in_template(template_path)
+    if scenario == 'generate':
+        with open(work_dir / "keys_data.json", 'r', encoding='utf-8') as f: keys_data = json.load(f)
+        return lambda: handler.generate_document(template_path, work_dir / "output.docx", keys_data)
+    if scenario == 'load':
+        def load_project():
+            project = Project()
+            if not project.load(str(work_dir / "project.dfp")): raise RuntimeError("Не удалось загрузить синтетический проект")
+            return project
+        return load_project
+    raise ValueError(f"Неизвестный сценарий: {scenario}")
+
+
+def measure_scenario(scenario: str, work_dir: Path, scale: int = 1) -> dict:
+    """
+    Выполняет сценарий в текущем процессе: первый прогон без трассировки - для пикового RSS,
+    второй - под tracemalloc для пика и удерживаемой после вызова памяти.
+    Вывод генератора подавляется, чтобы не влиять на время и память.
+    """
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        run = _scenario_runner(scenario, Path(work_dir))
+        gc.collect()
+        rss_before = _peak_rss_bytes()
+        started = time.perf_counter()
+        result = run()
+        elapsed = time.perf_counter() - started
+        rss_after = _peak_rss_bytes()
+        del result; gc.collect()
+        tracemalloc.start()
+        try:
+            baseline, _ = tracemalloc.get_traced_memory()
+            result = run()
+            gc.collect()
+            retained, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        del result
+    return {
+        'scenario': scenario, 'scale': scale, 'seconds': round(elapsed, 3),
+        'peak_mb': round((peak - baseline) / MB, 2),
+        'retained_mb': round((retained - baseline) / MB, 2),
+        'rss_mb': round((rss_after - rss_before) / MB, 2) if rss_before is not None else None,
+        'rss_peak_mb': round(rss_after / MB, 2) if rss_after is not None else None,
+    }
+
+
+def run_isolated(scenario: str, work_dir: Path, scale: int = 1) -> dict:
+    """Сценарий в отдельном новом процессе: пиковый RSS не загрязняется подготовкой данных и другими сценариями."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return pool.submit(measure_scenario, scenario, work_dir, scale).result()
+
+
+def load_budgets(path: Path | None) -> dict:
+    """Бюджеты по умолчанию, переопределенные значениями из JSON-файла ({сценарий: {метрика: МБ}})."""
+    budgets = {scenario: dict(limits) for scenario, limits in DEFAULT_BUDGETS.items()}
+    if path is None: return budgets
+    with open(path, 'r', encoding='utf-8') as f: overrides = json.load(f)
+    for scenario, limits in overrides.items():
+        if scenario not in budgets: raise ValueError(f"Неизвестный сценарий в бюджетах: {scenario}")
+        budgets[scenario].update(limits)
+    return budgets
+
+
+def check_budget(measurement: dict, budgets: dict) -> list[str]:
+    """Возвращает список превышений бюджета (пустой - укладывается)."""
+    violations = []
+    for metric, limit_mb in budgets.get(measurement['scenario'], {}).items():
+        value = measurement.get(metric.removesuffix('_mb') + '_mb')
+        if value is None: continue # Метрика недоступна на этой платформе
+        scaled_limit = limit_mb * measurement['scale']
+        if value > scaled_limit:
+            violations.append(f"{measurement['scenario']}: {metric} {value} МБ > бюджета {scaled_limit} МБ")
+    return violations
+
+
+def run_memcheck(scenarios: list[str] | None = None, scale: int = 1, budgets: dict | None = None, isolated: bool = True) -> tuple[list[dict], list[str]]:
+    """Измеряет сценарии и сверяет с бюджетами. Возвращает (измерения, превышения)."""
+    budgets = budgets if budgets is not None else load_budgets(None)
+    scenarios = scenarios or list(SCENARIOS)
+    measurements = []; violations = []
+    with tempfile.TemporaryDirectory(prefix="docx_memcheck_") as tmp:
+        work_dir = Path(tmp)
+        prepare_inputs(work_dir, scale)
+        for scenario in scenarios:
+            measurement = run_isolated(scenario, work_dir, scale) if isolated else measure_scenario(scenario, work_dir, scale)
+            measurements.append(measurement)
+            violations.extend(check_budget(measurement, budgets))
+    return measurements, violations
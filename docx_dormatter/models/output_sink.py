@@ -0,0 +1,106 @@
+import io
+import os
+import zipfile
+from pathlib import Path
+
+from models.atomic_file import AtomicFile
+from models.zip_entries import write_zip_entry
+
+
+def output_name_for(template_path: Path) -> str:
+    """Имя сгенерированного документа: <имя шаблона>_gen.docx."""
+    template_path = Path(template_path)
+    return f"{template_path.stem}_gen{template_path.suffix}"
+
+
+class DirectoryOutputSink:
+    """Вывод по одному файлу в папку: DocxHandler атомарно заменяет документ по пути назначения."""
+    in_memory = False
+
+    def __init__(self, output_dir: Path):
+        self.output_dir = Path(output_dir)
+
+    def open_target(self, template_path: Path) -> Path:
+        return self.output_dir / output_name_for(template_path)
+
+    def commit(self, target: Path): pass # Документ уже на месте
+
+    def discard(self, target: Path): pass # Временный файл удаляет сам DocxHandler, прежний документ не трогается
+
+    def close(self, success: bool = True): pass
+
+    def describe(self) -> str: return str(self.output_dir)
+
+    def __enter__(self): return self
+
+    def __exit__(self, exc_type, exc, tb): self.close(success=exc_type is None)
+
+
+class _MemoryTarget(io.BytesIO):
+    """Буфер одного документа; name - имя записи в архиве."""
+    def __init__(self, name: str):
+        super().__init__()
+        self.name = name
+
+
+class ZipOutputSink:
+    """
+    Вывод всех документов пакетной генерации в один ZIP-архив по мере их готовности.
+    Документ рендерится в буфер в памяти (объем ограничен одним документом) и
+    добавляется в архив только после успешного сохранения: удалить запись из ZIP
+    нельзя, поэтому неудачный документ не должен попасть в архив частично.
+    DOCX уже сжат, поэтому записи хранятся без повторного сжатия.
+    Архив пишется во временный файл рядом с целевым и переименовывается в close():
+    прерванный запуск не оставляет поврежденного архива.
+    """
+    in_memory = True
+
+    def __init__(self, archive_path: Path):
+        self.archive_path = Path(archive_path)
+        self.archive_path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = AtomicFile(self.archive_path)
+        try:
+            self._zip = zipfile.ZipFile(self._file.file, 'w', compression=zipfile.ZIP_STORED, allowZip64=True)
+        except BaseException:
+            self._file.discard()
+            raise
+        self._names: set[str] = set()
+        self.entries = 0
+
+    def _unique_name(self, name: str) -> str:
+        """Шаблоны с одинаковым именем из разных папок не перезаписывают друг друга в архиве."""
+        stem, suffix = os.path.splitext(name); candidate = name; n = 2
+        while candidate in self._names: candidate = f"{stem}_{n}{suffix}"; n += 1
+        self._names.add(candidate)
+        return candidate
+
+    def open_target(self, template_path: Path) -> _MemoryTarget:
+        return _MemoryTarget(output_name_for(template_path))
+
+    def add(self, name: str, blob: bytes) -> str:
+        """Добавляет готовый документ в архив; возвращает имя записи."""
+        entry_name = write_zip_entry(self._zip, self._unique_name(name), blob)
+        self.entries += 1
+        return entry_name
+
+    def commit(self, target: _MemoryTarget):
+        self.add(target.name, target.getvalue()); target.close()
+
+    def discard(self, target: _MemoryTarget):
+        target.close()
+
+    def close(self, success: bool = True):
+        """Завершает архив; при success=False временный файл удаляется, прежний архив не трогается."""
+        if self._zip is None: return
+        zip_file, self._zip = self._zip, None
+        try:
+            zip_file.close()
+            if success: self._file.commit()
+        finally:
+            self._file.discard() # После commit() ничего не делает
+
+    def describe(self) -> str: return str(self.archive_path)
+
+    def __enter__(self): return self
+
+    def __exit__(self, exc_type, exc, tb): self.close(success=exc_type is None)
@@ -0,0 +1,153 @@
+import cProfile
+import functools
+import io
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+# Режим профилирования: при включенной сессии (enable) каждый вызов, помеченный @profiled
+# или обернутый в capture(), записывает в папку сессии три файла:
+#   <время>_<метка>.prof   - статистика cProfile (pstats, открывается snakeviz и т.п.);
+#   <время>_<метка>.folded - выборки стеков в формате "a;b;c N" (для flamegraph);
+#   <время>_<метка>.txt    - сводка: горячие функции и самые частые стеки.
+# Без сессии накладные расходы - одна проверка глобальной переменной.
+DEFAULT_SAMPLE_INTERVAL = 0.005 # с между выборками стека
+TOP_FUNCTIONS = 20
+TOP_STACKS = 10
+_UNSAFE_FILENAME_CHARS = re.compile(r"[^\w.-]+")
+
+_session: 'ProfileSession | None' = None
+_local = threading.local() # Вложенные измерения в одном потоке не запускаются (профилировщик уже работает)
+
+
+class StackSampler:
+    """Фоновый поток, периодически снимающий стек вызовов профилируемого потока."""
+
+    def __init__(self, thread_id: int, interval: float = DEFAULT_SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts: Counter[tuple[str, ...]] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="StackSampler", daemon=True)
+
+    def start(self): self._thread.start()
+
+    def stop(self):
+        self._stop.set(); self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                if code.co_filename != __file__: stack.append(f"{Path(code.co_filename).name}:{code.co_name}")
+                frame = frame.f_back
+            if stack: self.counts[tuple(reversed(stack))] += 1
+
+
+class ProfileSession:
+    """Папка отчетов и параметры профилирования."""
+
+    def __init__(self, output_dir: Path, sample_interval: float = DEFAULT_SAMPLE_INTERVAL, top: int = TOP_FUNCTIONS):
+        self.output_dir = Path(output_dir)
+        self.sample_interval = sample_interval
+        self.top = top
+        self.reports: list[Path] = [] # Сводки, записанные за сессию этим процессом
+        self.started = time.time()
+
+    def report_files(self) -> list[Path]:
+        """Все сводки (*.txt) в папке сессии, записанные после ее начала, в том числе процессами-исполнителями."""
+        if not self.output_dir.is_dir(): return []
+        return sorted(path for path in self.output_dir.glob("*.txt") if path.stat().st_mtime >= self.started)
+
+    @contextmanager
+    def capture(self, label: str):
+        """Профилирует блок кода и записывает отчет; вложенный вызов в том же потоке не измеряется отдельно."""
+        if getattr(_local, 'active', False): yield; return
+        profiler = cProfile.Profile()
+        try: profiler.enable()
+        except ValueError as e: # В этом процессе уже работает другой профилировщик
+            print(f"Профилирование '{label}' пропущено: {e}"); yield; return
+        _local.active = True
+        sampler = StackSampler(threading.get_ident(), self.sample_interval); sampler.start()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            profiler.disable(); sampler.stop(); _local.active = False
+            try: self.write_report(label, profiler, sampler.counts, elapsed)
+            except OSError as e: print(f"Ошибка записи профиля '{label}': {e}")
+
+    def write_report(self, label: str, profiler: cProfile.Profile, stack_counts: Counter, elapsed: float) -> Path:
+        import pstats
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        base = self.output_dir / f"{stamp}_{_UNSAFE_FILENAME_CHARS.sub('_', label)}"
+        profiler.dump_stats(base.with_suffix('.prof'))
+        with open(base.with_suffix('.folded'), 'w', encoding='utf-8') as f:
+            for stack, count in stack_counts.most_common(): f.write(f"{';'.join(stack)} {count}\n")
+        summary = io.StringIO()
+        summary.write(f"Профиль: {label}\nВремя выполнения: {elapsed * 1000:.1f} мс\n")
+        summary.write(f"Выборок стека: {sum(stack_counts.values())} (интервал {self.sample_interval * 1000:.0f} мс)\n\n")
+        stats = pstats.Stats(profiler, stream=summary).strip_dirs()
+        summary.write(f"=== Горячие функции: собственное время (топ {self.top}) ===\n")
+        stats.sort_stats(pstats.SortKey.TIME).print_stats(self.top)
+        summary.write(f"=== Горячие функции: время с вложенными вызовами (топ {self.top}) ===\n")
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+        summary.write(f"=== Самые частые стеки (топ {TOP_STACKS}) ===\n")
+        total = sum(stack_counts.values()) or 1
+        for stack, count in stack_counts.most_common(TOP_STACKS):
+            summary.write(f"{count * 100 / total:5.1f}%  {' <- '.join(reversed(stack[-6:]))}\n")
+        report_path = base.with_suffix('.txt')
+        report_path.write_text(summary.getvalue(), encoding='utf-8')
+        self.reports.append(report_path)
+        print(f"Профиль '{label}' ({elapsed * 1000:.0f} мс) записан: {report_path}")
+        return report_path
+
+
+def enable(output_dir: Path, **kwargs) -> ProfileSession:
+    """Включает профилирование процесса; отчеты пишутся в output_dir."""
+    global _session
+    _session = ProfileSession(output_dir, **kwargs)
+    return _session
+
+
+def disable():
+    global _session
+    _session = None
+
+
+def active_session() -> ProfileSession | None:
+    return _session
+
+
+@contextmanager
+def capture(label: str):
+    """Профилирует блок, если профилирование включено; иначе ничего не делает."""
+    if _session is None: yield; return
+    with _session.capture(label): yield
+
+
+def profiled(name: str, detail=None):
+    """
+    Декоратор: вызов функции профилируется при включенной сессии.
+    detail(*args, **kwargs) - уточнение метки (например, имя шаблона).
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _session is None: return function(*args, **kwargs)
+            label = name
+            if detail is not None:
+                try: label = f"{name}_{detail(*args, **kwargs)}"
+                except Exception: pass # Метка не важнее самого вызова
+            with _session.capture(label): return function(*args, **kwargs)
+        return wrapper
+    return decorator
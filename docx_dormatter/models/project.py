@@ -1,8 +1,10 @@
 import json
-import os
 from pathlib import Path
 import copy
 
+from models.atomic_file import AtomicFile
+from models.profiling import profiled
+
 class Project:
     """
     Класс для хранения и управления данными проекта.
@@ -13,8 +15,24 @@ class Project:
         self.template_paths: list[Path] = []
         self.output_path: Path | None = None
         self.keys_data: dict = {} # { key_id: { data_dict } }
+        # Номер ревизии растет при каждом изменении и не сбрасывается в reset(),
+        # чтобы фоновое сохранение могло понять, не устарел ли его снимок
+        self._revision: int = getattr(self, '_revision', 0)
         self.is_modified: bool = False
 
+    @property
+    def is_modified(self) -> bool:
+        return self._is_modified
+
+    @is_modified.setter
+    def is_modified(self, value: bool):
+        if value: self._revision += 1
+        self._is_modified = value
+
+    @property
+    def revision(self) -> int:
+        return self._revision
+
     # ... (reset, add_template, remove_template, set_output_path, add_found_key без изменений) ...
     def reset(self):
         self.__init__()
@@ -92,6 +110,24 @@ class Project:
             #     self.is_modified = True
             # pass # Решаем, нужно ли обновлять ключи, если таблица уже существует
 
+    def set_table_template_keys(self, table_id: str, template_keys: list[str]) -> bool:
+        """Обновляет template_keys существующей таблицы (например, после правки шаблона)."""
+        table_data = self.keys_data.get(table_id)
+        if not table_data or table_data.get('type') != 'dynamic_table': return False
+        if table_data.get('template_keys', []) == template_keys: return False
+        table_data['template_keys'] = list(template_keys)
+        self.is_modified = True
+        print(f"Обновлены template_keys таблицы {table_id}: {template_keys}")
+        return True
+
+    def remove_key(self, key_id: str) -> bool:
+        """Удаляет ключ или таблицу из keys_data."""
+        if key_id not in self.keys_data: return False
+        del self.keys_data[key_id]
+        self.is_modified = True
+        print(f"Удален элемент: {key_id}")
+        return True
+
     # ... (update_key_data, get_key_data, get_all_keys_data, set_keys_data,
     #      get_project_filename, save, load без изменений) ...
     def update_key_data(self, key_id: str, data: dict):
@@ -115,10 +151,74 @@ class Project:
                 old_data['status'] = data.get('status', 'unknown')
                 old_data['is_frozen'] = data.get('is_frozen', False)
                 data_changed = True
+            # Размер для ключей-изображений (мм); None - по пропорциям изображения
+            for size_field in ('image_width_mm', 'image_height_mm'):
+                if size_field in data and old_data.get(size_field) != data[size_field]:
+                    old_data[size_field] = data[size_field]
+                    data_changed = True
         if data_changed:
             self.is_modified = True
             print(f"Данные элемента '{key_id}' обновлены в модели.")
 
+    # --- Точечные изменения (для истории отмены) ---
+    # Списки строк и словари строк не изменяются на месте, а заменяются копиями (поверхностными),
+    # чтобы снимок фонового сохранения (snapshot) оставался согласованным.
+    def set_key_fields(self, key_id: str, fields: dict) -> bool:
+        """Записывает поля простого ключа; True - что-то изменилось."""
+        key_data = self.keys_data.get(key_id)
+        if key_data is None: return False
+        changed = {field: value for field, value in fields.items() if key_data.get(field) != value}
+        if not changed: return False
+        key_data.update(changed)
+        self.is_modified = True
+        return True
+
+    def _table_rows(self, table_id: str) -> list | None:
+        table_data = self.keys_data.get(table_id)
+        if not table_data or table_data.get('type') != 'dynamic_table': return None
+        return table_data.setdefault('data', [])
+
+    def set_table_cells(self, table_id: str, cells: list[tuple[int, str, str]]) -> bool:
+        """cells: [(row, column_key, value), ...]."""
+        rows = self._table_rows(table_id)
+        if rows is None: return False
+        new_rows = list(rows); copied: set[int] = set()
+        for row_idx, column_key, value in cells:
+            if not 0 <= row_idx < len(new_rows): continue
+            if row_idx not in copied: new_rows[row_idx] = dict(new_rows[row_idx]); copied.add(row_idx)
+            new_rows[row_idx][column_key] = value
+        self.keys_data[table_id]['data'] = new_rows
+        self.is_modified = True
+        return True
+
+    def insert_table_rows(self, table_id: str, index: int, new_rows: list[dict]) -> bool:
+        rows = self._table_rows(table_id)
+        if rows is None: return False
+        index = max(0, min(index, len(rows)))
+        self.keys_data[table_id]['data'] = rows[:index] + [dict(row) for row in new_rows] + rows[index:]
+        self.is_modified = True
+        return True
+
+    def delete_table_rows(self, table_id: str, indices: list[int]) -> list[tuple[int, dict]] | None:
+        """Удаляет строки по индексам; возвращает удаленные [(index, row), ...] или None."""
+        rows = self._table_rows(table_id)
+        if rows is None: return None
+        to_remove = {index for index in indices if 0 <= index < len(rows)}
+        removed = [(index, rows[index]) for index in sorted(to_remove)]
+        self.keys_data[table_id]['data'] = [row for index, row in enumerate(rows) if index not in to_remove]
+        self.is_modified = True
+        return removed
+
+    def permute_table_rows(self, table_id: str, start: int, order: list[int]) -> bool:
+        """Переставляет строки start..start+len(order)-1: новая строка i = старая строка start+order[i]."""
+        rows = self._table_rows(table_id)
+        if rows is None or start < 0 or start + len(order) > len(rows): return False
+        new_rows = list(rows)
+        for offset, old_offset in enumerate(order): new_rows[start + offset] = rows[start + old_offset]
+        self.keys_data[table_id]['data'] = new_rows
+        self.is_modified = True
+        return True
+
     def get_key_data(self, key_id: str) -> dict | None:
         return self.keys_data.get(key_id)
 
@@ -132,27 +232,56 @@ class Project:
         if self.filepath: return self.filepath.name
         return "Безымянный"
 
-    def save(self, path_str: str | None = None) -> bool:
+    def resolve_save_path(self, path_str: str | None = None) -> Path | None:
         save_path = Path(path_str) if path_str else self.filepath
-        if not save_path: print("Ошибка сохранения: Путь не указан."); return False
-        if save_path.suffix.lower() != '.dfp': save_path = save_path.with_suffix('.dfp')
-        project_data = {
+        if save_path and save_path.suffix.lower() != '.dfp': save_path = save_path.with_suffix('.dfp')
+        return save_path
+
+    def snapshot(self) -> dict:
+        """
+        Дешевый снимок состояния для фонового сохранения: копируется словарь keys_data
+        и словари элементов (без глубокого копирования). Этого достаточно, так как
+        методы проекта не изменяют списки строк таблиц на месте, а заменяют их целиком.
+        """
+        return {
             "version": "1.0",
             "template_paths": [str(p) for p in self.template_paths],
             "output_path": str(self.output_path) if self.output_path else None,
-            "keys_data": self.keys_data
+            "keys_data": {key_id: dict(data) for key_id, data in self.keys_data.items()}
         }
+
+    @staticmethod
+    def write_project_file(save_path: Path, project_data: dict):
+        """
+        Атомарная запись файла проекта: временный файл в той же папке, fsync, rename.
+        При сбое во время записи исходный файл остается нетронутым.
+        """
+        with AtomicFile(save_path, 'w', encoding='utf-8') as f:
+            json.dump(project_data, f, ensure_ascii=False, indent=4)
+
+    def mark_saved(self, save_path: Path, revision: int) -> bool:
+        """Фиксирует сохранение снимка ревизии revision; флаг изменений снимается, только если ревизия актуальна."""
+        self.filepath = save_path
+        if revision == self._revision:
+            self._is_modified = False
+            return True
+        return False
+
+    @profiled('project_save', lambda self, path_str=None: Path(path_str).stem if path_str else self.get_project_filename())
+    def save(self, path_str: str | None = None) -> bool:
+        """Синхронная запись (CLI). В GUI при работающем автосохранении - AutosaveWorker.save_project."""
+        save_path = self.resolve_save_path(path_str)
+        if not save_path: print("Ошибка сохранения: Путь не указан."); return False
         try:
-            with open(save_path, 'w', encoding='utf-8') as f:
-                json.dump(project_data, f, ensure_ascii=False, indent=4)
-            self.filepath = save_path
-            self.is_modified = False
+            self.write_project_file(save_path, self.snapshot())
+            self.mark_saved(save_path, self._revision)
             print(f"Проект успешно сохранен в: {save_path}")
             return True
         except Exception as e:
             print(f"Ошибка сохранения файла проекта '{save_path}': {e}")
             return False
 
+    @profiled('project_load', lambda self, path_str: Path(path_str).stem)
     def load(self, path_str: str) -> bool:
         load_path = Path(path_str)
         if not load_path.is_file(): print(f"Ошибка загрузки: Файл не найден - {load_path}"); return False
@@ -0,0 +1,114 @@
+import hashlib
+import io
+import mmap
+import shutil
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+
+from models.atomic_file import AtomicFile
+
+
+class _MappedReader(io.RawIOBase):
+    """Файловый объект поверх отображенной в память области: у каждого читателя своя позиция, данные не копируются целиком."""
+
+    def __init__(self, buffer):
+        super().__init__()
+        self._view = memoryview(buffer)
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET: self._pos = offset
+        elif whence == io.SEEK_CUR: self._pos += offset
+        else: self._pos = len(self._view) + offset
+        self._pos = max(0, self._pos)
+        return self._pos
+
+    def readinto(self, b) -> int:
+        n = max(0, min(len(b), len(self._view) - self._pos))
+        b[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def close(self):
+        if not self.closed: self._view.release()
+        super().close()
+
+
+class TemplateCache:
+    """
+    LRU-кэш шаблонов DOCX с ограничением по объему.
+    Шаблон один раз копируется в хранилище (store_dir) под неизменяемым именем,
+    вычисляемым из пути, времени изменения и размера, и открывается через mmap.
+    Процессы-исполнители, получившие тот же store_dir, отображают те же файлы,
+    поэтому страницы шаблона находятся в памяти в одном экземпляре (кэш страниц ОС).
+    """
+    DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, store_dir: Path | None = None):
+        self.max_bytes = max_bytes
+        self._owns_store = store_dir is None
+        self.store_dir = Path(store_dir) if store_dir else Path(tempfile.mkdtemp(prefix="docx_templates_"))
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self._entries: OrderedDict[str, dict] = OrderedDict() # { store_name: {'mmap': ..., 'size': ...} }
+        self._bytes = 0
+        self._hits = 0; self._misses = 0; self._evictions = 0
+
+    @staticmethod
+    def _store_name(template_path: Path) -> str:
+        resolved = Path(template_path).resolve()
+        st = resolved.stat()
+        ident = f"{resolved}|{st.st_mtime_ns}|{st.st_size}".encode('utf-8')
+        return hashlib.sha1(ident).hexdigest() + ".docx"
+
+    def publish(self, template_path: Path) -> Path:
+        """Помещает шаблон в хранилище (если его там еще нет) и возвращает путь к копии."""
+        store_file = self.store_dir / self._store_name(template_path)
+        if not store_file.exists():
+            # Атомарно: параллельные процессы не увидят частичный файл; fsync для временного хранилища не нужен
+            with open(template_path, 'rb') as src, AtomicFile(store_file, fsync=False) as dst: shutil.copyfileobj(src, dst)
+        return store_file
+
+    def _evict(self, store_name: str, count: bool = True):
+        entry = self._entries.pop(store_name)
+        self._bytes -= entry['size']
+        if count: self._evictions += 1
+        try: entry['mmap'].close()
+        except BufferError: pass # Документ еще читается - отображение освободится вместе с читателем
+
+    def open(self, template_path: Path) -> io.RawIOBase:
+        """Файловый объект только для чтения с содержимым шаблона (для docx.Document)."""
+        store_name = self._store_name(template_path)
+        entry = self._entries.get(store_name)
+        if entry is not None:
+            self._entries.move_to_end(store_name); self._hits += 1
+            return _MappedReader(entry['mmap'])
+        self._misses += 1
+        store_file = self.publish(template_path)
+        with open(store_file, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        entry = {'mmap': mapped, 'size': len(mapped)}
+        self._entries[store_name] = entry; self._bytes += entry['size']
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            self._evict(next(iter(self._entries)))
+        return _MappedReader(mapped)
+
+    def stats(self) -> dict:
+        return {
+            'hits': self._hits, 'misses': self._misses, 'evictions': self._evictions,
+            'entries': len(self._entries), 'bytes': self._bytes, 'max_bytes': self.max_bytes,
+        }
+
+    def close(self):
+        """Освобождает отображения; временное хранилище, созданное кэшем, удаляется."""
+        for store_name in list(self._entries): self._evict(store_name, count=False)
+        if self._owns_store: shutil.rmtree(self.store_dir, ignore_errors=True)
@@ -0,0 +1,182 @@
+import time
+import zipfile
+from pathlib import Path
+
+
+class TemplateWatcher:
+    """
+    Отслеживает изменения шаблонов проекта и сливает найденные различия в keys_data.
+    Ядро не зависит от Qt: в GUI об изменениях сообщает QFileSystemWatcher (notify_changed),
+    в CLI - poll(), сравнивающий время изменения и размер файлов.
+    Повторные события в пределах debounce_seconds объединяются в одно пересканирование,
+    а пересканируются только части пакета с изменившимся хэшем.
+    """
+    DEBOUNCE_SECONDS = 0.5
+
+    def __init__(self, project, docx_handler, debounce_seconds: float | None = None):
+        self.project = project
+        self.docx_handler = docx_handler
+        self.debounce_seconds = self.DEBOUNCE_SECONDS if debounce_seconds is None else debounce_seconds
+        self._parts: dict[Path, dict] = {} # { path: результат scan_template_parts }
+        self._results: dict[Path, dict] = {} # { path: {'keys': set, 'tables': dict} }
+        self._stamps: dict[Path, tuple[int, int] | None] = {} # { path: (mtime_ns, size) }
+        self._pending: dict[Path, float] = {} # { path: время последнего события }
+        self._unscanned: set[Path] = set() # Отслеживаемые шаблоны, которые еще ни разу не удалось прочитать
+
+    @staticmethod
+    def _stat(path: Path) -> tuple[int, int] | None:
+        try:
+            st = path.stat()
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def watched_paths(self) -> list[Path]:
+        return list(self._results) + sorted(self._unscanned - set(self._results))
+
+    def cached_scan(self, path: Path) -> dict | None:
+        """Последний результат сканирования шаблона ({'keys', 'tables'}) или None, если шаблон не отслеживается."""
+        return self._results.get(Path(path))
+
+    def track(self, path: Path) -> bool:
+        """
+        Запоминает текущее состояние шаблона как исходное (без изменения проекта).
+        Если шаблон не читается, исходное состояние не запоминается: пустой результат
+        означал бы, что все ключи шаблона удалены. Такой шаблон пересканируется при
+        следующем изменении файла, и его ключи сливаются в проект как добавленные.
+        """
+        path = Path(path)
+        self._stamps[path] = self._stat(path)
+        try:
+            self._parts[path] = self.docx_handler.scan_template_parts(path)
+        except (OSError, zipfile.BadZipFile) as e:
+            print(f"Ошибка сканирования шаблона {path}: {e}")
+            self._unscanned.add(path)
+            return False
+        self._results[path] = self.docx_handler.merge_part_scans(self._parts[path])
+        self._unscanned.discard(path)
+        return True
+
+    def forget(self, path: Path):
+        path = Path(path)
+        for storage in (self._parts, self._results, self._stamps, self._pending):
+            storage.pop(path, None)
+        self._unscanned.discard(path)
+
+    def sync_templates(self):
+        """Приводит набор отслеживаемых файлов к project.template_paths."""
+        current = set(self.project.template_paths)
+        for path in set(self.watched_paths()) - current: self.forget(path)
+        for path in self.project.template_paths:
+            if path not in self._results and path not in self._unscanned: self.track(path)
+
+    def notify_changed(self, path: Path, now: float | None = None):
+        """Регистрирует событие изменения; повторное событие откладывает обработку (debounce)."""
+        path = Path(path)
+        if path in self._results or path in self._unscanned:
+            self._pending[path] = time.monotonic() if now is None else now
+
+    def has_pending(self) -> bool:
+        return bool(self._pending)
+
+    def rescan(self, path: Path) -> dict | None:
+        """
+        Пересканирует шаблон (только измененные части) и возвращает различия
+        с предыдущим состоянием. None - файл сейчас не читается (например, еще записывается).
+        """
+        path = Path(path)
+        self._stamps[path] = self._stat(path)
+        try:
+            parts = self.docx_handler.scan_template_parts(path, self._parts.get(path))
+        except (OSError, zipfile.BadZipFile) as e:
+            print(f"Шаблон {path.name} недоступен для сканирования: {e}")
+            return None
+        old_result = self._results.get(path, {'keys': set(), 'tables': {}})
+        new_result = self.docx_handler.merge_part_scans(parts)
+        self._parts[path] = parts; self._results[path] = new_result
+        self._unscanned.discard(path)
+        old_tables = old_result['tables']; new_tables = new_result['tables']
+        return {
+            'path': path,
+            'added_keys': new_result['keys'] - old_result['keys'],
+            'removed_keys': old_result['keys'] - new_result['keys'],
+            'added_tables': {tid: info for tid, info in new_tables.items() if tid not in old_tables},
+            'removed_tables': set(old_tables) - set(new_tables),
+            'changed_tables': {tid: info for tid, info in new_tables.items()
+                               if tid in old_tables and old_tables[tid] != info},
+        }
+
+    def _is_referenced(self, key_id: str, is_table: bool) -> bool:
+        section = 'tables' if is_table else 'keys'
+        return any(key_id in result[section] for result in self._results.values())
+
+    @staticmethod
+    def _has_user_data(key_data: dict) -> bool:
+        """Введено ли значение ключа или есть ли строки таблицы."""
+        if key_data.get('type') == 'dynamic_table': return bool(key_data.get('data'))
+        return bool(str(key_data.get('value', '')).strip())
+
+    def apply_changes(self, changes: dict) -> dict:
+        """
+        Сливает различия в проект. Удаляются только пустые элементы, которые не встречаются
+        в других шаблонах проекта; замороженные ключи (is_frozen) и элементы с введенными
+        данными остаются в проекте (учитываются в 'kept') - ключ могли удалить из шаблона
+        временно, и данные пользователя не должны теряться.
+        """
+        summary = {'added': 0, 'removed': 0, 'updated': 0, 'kept': 0}
+        for key in changes['added_keys']:
+            if key not in self.project.keys_data: self.project.add_found_key(key); summary['added'] += 1
+        for table_id, table_info in changes['added_tables'].items():
+            if table_id not in self.project.keys_data: self.project.add_found_table(table_id, table_info.get('template_keys')); summary['added'] += 1
+            elif self.project.set_table_template_keys(table_id, table_info.get('template_keys', [])): summary['updated'] += 1
+        for table_id, table_info in changes['changed_tables'].items():
+            if self.project.set_table_template_keys(table_id, table_info.get('template_keys', [])): summary['updated'] += 1
+        for key in changes['removed_keys']:
+            key_data = self.project.get_key_data(key)
+            if key_data is None or key_data.get('is_frozen') or self._is_referenced(key, False): continue
+            if self._has_user_data(key_data): summary['kept'] += 1; continue
+            if self.project.remove_key(key): summary['removed'] += 1
+        for table_id in changes['removed_tables']:
+            table_data = self.project.get_key_data(table_id)
+            if table_data is None or self._is_referenced(table_id, True): continue
+            if self._has_user_data(table_data): summary['kept'] += 1; continue
+            if self.project.remove_key(table_id): summary['removed'] += 1
+        return summary
+
+    def process_pending(self, now: float | None = None, force: bool = False) -> list[tuple[dict, dict]]:
+        """Обрабатывает события, для которых истек интервал debounce. Возвращает [(changes, summary), ...]."""
+        now = time.monotonic() if now is None else now
+        processed = []
+        for path, event_time in list(self._pending.items()):
+            if not force and now - event_time < self.debounce_seconds: continue
+            del self._pending[path]
+            changes = self.rescan(path)
+            if changes is None: continue
+            summary = self.apply_changes(changes)
+            if any(summary.values()):
+                print(f"Шаблон {path.name} изменен: добавлено {summary['added']}, удалено {summary['removed']}, "
+                      f"обновлено {summary['updated']}, оставлено с данными {summary['kept']}")
+            processed.append((changes, summary))
+        return processed
+
+    def poll(self, now: float | None = None) -> list[tuple[dict, dict]]:
+        """Опрос файлов (для CLI): регистрирует изменения по mtime/размеру и обрабатывает отложенные."""
+        now = time.monotonic() if now is None else now
+        for path in self.watched_paths():
+            stamp = self._stat(path)
+            if stamp != self._stamps.get(path):
+                self._stamps[path] = stamp
+                if stamp is not None: self.notify_changed(path, now)
+        return self.process_pending(now)
+
+    def run(self, interval: float = 1.0, on_change=None, stop_event=None):
+        """Цикл опроса до установки stop_event (threading.Event) или KeyboardInterrupt."""
+        self.sync_templates()
+        try:
+            while stop_event is None or not stop_event.is_set():
+                for changes, summary in self.poll():
+                    if on_change: on_change(changes, summary)
+                if stop_event is not None: stop_event.wait(interval)
+                else: time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
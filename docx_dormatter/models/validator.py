@@ -0,0 +1,136 @@
+import time
+from pathlib import Path
+
+from models.image_cache import is_image_key
+
+ERROR = 'error'
+WARNING = 'warning'
+
+
+class ProjectValidator:
+    """
+    Быстрая проверка проекта перед генерацией: сверяет результаты сканирования шаблонов
+    с keys_data и находит то, что иначе обнаружилось бы только после полной генерации
+    (пустые и отсутствующие ключи, устаревшие template_keys, строки таблиц без значений,
+    расхождение числа ячеек, ошибки фильтров в ключах). Документы не открываются через python-docx: используются
+    готовые результаты сканирования (scan_provider), а при их отсутствии - сканирование частей пакета.
+    """
+
+    def __init__(self, docx_handler, scan_provider=None):
+        """
+        Args:
+            docx_handler: DocxHandler для сканирования шаблонов без кэшированного результата.
+            scan_provider: Необязательная функция path -> {'keys', 'tables'} | None
+                           (например, TemplateWatcher.cached_scan).
+        """
+        self.docx_handler = docx_handler
+        self.scan_provider = scan_provider
+
+    def _scan(self, template_path: Path) -> dict:
+        if self.scan_provider is not None:
+            cached = self.scan_provider(template_path)
+            if cached is not None: return cached
+        return self.docx_handler.merge_part_scans(self.docx_handler.scan_template_parts(template_path))
+
+    @staticmethod
+    def _issue(severity: str, code: str, template: Path | None, key: str | None, message: str) -> dict:
+        return {'severity': severity, 'code': code, 'template': template, 'key': key, 'message': message}
+
+    def _validate_table(self, template_path: Path, table_id: str, table_info: dict, table_data: dict | None, issues: list):
+        if table_data is None or table_data.get('type') != 'dynamic_table':
+            issues.append(self._issue(ERROR, 'missing_table', template_path, table_id, f"Таблица '{table_id}' отсутствует в проекте"))
+            return
+        scanned_keys = table_info.get('template_keys', [])
+        project_keys = table_data.get('template_keys', [])
+        if project_keys != scanned_keys:
+            issues.append(self._issue(ERROR, 'table_keys_outdated', template_path, table_id,
+                                      f"Таблица '{table_id}': столбцы проекта {project_keys} не совпадают с шаблоном {scanned_keys}"))
+        columns = table_info.get('columns'); grid_columns = table_info.get('grid_columns')
+        if columns is not None and grid_columns is not None and columns != grid_columns:
+            issues.append(self._issue(ERROR, 'column_count_mismatch', template_path, table_id,
+                                      f"Таблица '{table_id}': в первой строке {columns} ячеек, в сетке {grid_columns} - строки данных не будут добавлены"))
+        elif grid_columns is not None and len(project_keys) + 1 > grid_columns:
+            issues.append(self._issue(ERROR, 'column_count_mismatch', template_path, table_id,
+                                      f"Таблица '{table_id}': {len(project_keys)} столбцов данных не помещаются в {grid_columns - 1} ячеек"))
+        rows = table_data.get('data', [])
+        if not rows:
+            issues.append(self._issue(WARNING, 'empty_table', template_path, table_id, f"Таблица '{table_id}' не содержит строк"))
+            return
+        for key in project_keys:
+            missing_rows = [idx for idx, row in enumerate(rows, 1) if not str(row.get(key, '')).strip()]
+            if not missing_rows: continue
+            shown = ", ".join(map(str, missing_rows[:10])) + (" ..." if len(missing_rows) > 10 else "")
+            issues.append(self._issue(WARNING, 'table_cells_empty', template_path, table_id,
+                                      f"Таблица '{table_id}': столбец {key} пуст в {len(missing_rows)} строках ({shown})"))
+
+    def _validate_key(self, template_path: Path, key: str, key_data: dict | None, issues: list):
+        if self.docx_handler.DYNAMIC_TABLE_PATTERN.fullmatch(key):
+            # Маркер распознается только в первой ячейке строки таблицы - иначе таблица не заполняется
+            issues.append(self._issue(ERROR, 'misplaced_table_marker', template_path, key,
+                                      f"Маркер {key} не в первой ячейке строки таблицы - таблица не будет заполнена"))
+            return
+        if key_data is None:
+            issues.append(self._issue(ERROR, 'missing_key', template_path, key, f"Ключ {key} отсутствует в проекте"))
+            return
+        value = key_data.get('value', '')
+        if is_image_key(key, key_data):
+            if value and not Path(value).is_file():
+                issues.append(self._issue(ERROR, 'missing_image', template_path, key, f"Файл изображения для {key} не найден: {value}"))
+                return
+        if not str(value).strip():
+            issues.append(self._issue(WARNING, 'empty_key', template_path, key, f"Ключ {key} не заполнен"))
+
+    def validate(self, template_paths: list[Path], keys_data: dict) -> list[dict]:
+        """
+        Проверяет все шаблоны проекта.
+
+        Returns:
+            [{'severity': 'error'|'warning', 'code': str, 'template': Path|None, 'key': str|None, 'message': str}, ...]
+            Ошибки - генерация заведомо даст неверный документ; предупреждения - пустые значения.
+        """
+        issues: list[dict] = []
+        checked_keys: set[str] = set(); checked_tables: set[str] = set() # Общие ключи проверяются один раз
+        for template_path in template_paths:
+            template_path = Path(template_path)
+            if not template_path.is_file():
+                issues.append(self._issue(ERROR, 'missing_template', template_path, None, f"Шаблон не найден: {template_path}"))
+                continue
+            try:
+                scan = self._scan(template_path)
+            except Exception as e: # Поврежденный пакет или XML
+                issues.append(self._issue(ERROR, 'unreadable_template', template_path, None, f"Шаблон не читается: {e}"))
+                continue
+            for placeholder, message in sorted(scan.get('invalid_filters', {}).items()):
+                issues.append(self._issue(ERROR, 'invalid_filter', template_path, placeholder, f"Ключ {placeholder} не будет заменен: {message}"))
+            table_keys = set()
+            for table_id, table_info in scan['tables'].items():
+                table_keys.update(table_info.get('template_keys', []))
+                if table_id in checked_tables: continue
+                checked_tables.add(table_id)
+                self._validate_table(template_path, table_id, table_info, keys_data.get(table_id), issues)
+            # Ключи строк-шаблонов таблиц заполняются из данных таблицы, а не из keys_data
+            for key in sorted(scan['keys'] - table_keys - checked_keys):
+                checked_keys.add(key)
+                self._validate_key(template_path, key, keys_data.get(key), issues)
+        return issues
+
+    def timed_validate(self, template_paths: list[Path], keys_data: dict) -> tuple[list[dict], float]:
+        """validate() и затраченное время в миллисекундах."""
+        started = time.perf_counter()
+        issues = self.validate(template_paths, keys_data)
+        return issues, (time.perf_counter() - started) * 1000
+
+
+def has_errors(issues: list[dict]) -> bool:
+    return any(issue['severity'] == ERROR for issue in issues)
+
+
+def format_issue(issue: dict) -> str:
+    prefix = "Ошибка" if issue['severity'] == ERROR else "Предупреждение"
+    template = f"[{issue['template'].name}] " if issue['template'] else ""
+    return f"{prefix}: {template}{issue['message']}"
+
+
+def summarize_issues(issues: list[dict]) -> str:
+    errors = sum(1 for issue in issues if issue['severity'] == ERROR)
+    return f"ошибок: {errors}, предупреждений: {len(issues) - errors}"
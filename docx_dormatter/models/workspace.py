@@ -0,0 +1,199 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from models import profiling
+from models.batch_renderer import output_path_for
+from models.docx_handler import DocxHandler
+from models.project import Project
+from models.template_cache import TemplateCache
+from models.validator import ProjectValidator, format_issue, has_errors
+
+# Состояние процесса-исполнителя сборки рабочей области (заполняется в _init_worker)
+_worker_handler: DocxHandler | None = None
+_worker_keys_data: dict[int, dict] = {}
+
+
+def _init_worker(store_dir: str, max_bytes: int, keys_data_by_project: dict[int, dict], compress_level: int,
+                 profile_dir: str | None = None):
+    """Данные всех проектов передаются процессу один раз, задания содержат только номер проекта."""
+    global _worker_handler, _worker_keys_data
+    if profile_dir is not None: profiling.enable(Path(profile_dir))
+    _worker_handler = DocxHandler(template_cache=TemplateCache(max_bytes=max_bytes, store_dir=Path(store_dir)),
+                                  compress_level=compress_level)
+    _worker_keys_data = keys_data_by_project
+
+
+def _render_job(project_idx: int, template_path: str, output_path: str) -> tuple[int, str, bool, int, dict]:
+    success = _worker_handler.generate_document(Path(template_path), Path(output_path), _worker_keys_data[project_idx])
+    return project_idx, template_path, success, os.getpid(), _worker_handler.template_cache.stats()
+
+
+def discover_projects(inputs: list[Path]) -> list[Path]:
+    """Файлы проектов: папки просматриваются рекурсивно (*.dfp), файлы берутся как есть; повторы отбрасываются."""
+    found: dict[Path, Path] = {}
+    for item in map(Path, inputs):
+        candidates = sorted(item.rglob("*.dfp")) if item.is_dir() else [item]
+        for candidate in candidates: found.setdefault(candidate.resolve(), candidate)
+    return list(found.values())
+
+
+class WorkspaceBuild:
+    """
+    Сборка нескольких проектов за один запуск. Шаблоны, общие для проектов,
+    определяются по полному пути: каждый уникальный шаблон один раз публикуется
+    в общем mmap-хранилище TemplateCache и один раз сканируется (с компиляцией фильтров);
+    результат сканирования используется для проверки всех проектов с этим шаблоном.
+    Затем все пары проект x шаблон генерируются в общем пуле процессов; задания
+    упорядочены по шаблону, чтобы LRU исполнителей чаще попадал в уже открытые шаблоны.
+    """
+
+    def __init__(self, project_paths: list[Path], output_root: Path | None = None, workers: int = 1,
+                 cache_max_bytes: int = TemplateCache.DEFAULT_MAX_BYTES,
+                 compress_level: int = DocxHandler.DEFAULT_COMPRESS_LEVEL, validate: bool = True, strict: bool = False):
+        """
+        Args:
+            output_root: Общая папка вывода (документы проекта - в <output_root>/<имя проекта>);
+                         без нее используется output_path каждого проекта.
+            strict: Не генерировать проекты, в которых проверка нашла ошибки.
+        """
+        self.project_paths = [Path(p) for p in project_paths]
+        self.output_root = Path(output_root) if output_root else None
+        self.workers = workers
+        self.cache_max_bytes = cache_max_bytes
+        self.compress_level = compress_level
+        self.validate = validate
+        self.strict = strict
+        self.projects: list[Project] = []
+        self.templates: dict[Path, list[int]] = {} # { полный путь шаблона: [номера проектов] }
+        self.scans: dict[Path, dict] = {}
+
+    def _output_dir_for(self, project: Project) -> Path | None:
+        if self.output_root is not None: return self.output_root / project.filepath.stem
+        return project.output_path
+
+    def load_projects(self, summary: dict):
+        for project_path in self.project_paths:
+            project = Project()
+            if not project.load(str(project_path)):
+                summary['skipped_projects'].append({'project': str(project_path), 'reason': "не удалось загрузить"}); continue
+            self.projects.append(project)
+        for project_idx, project in enumerate(self.projects):
+            for template_path in project.template_paths:
+                users = self.templates.setdefault(Path(template_path).resolve(), [])
+                if project_idx not in users: users.append(project_idx) # Шаблон, указанный в проекте дважды, генерируется один раз
+
+    def compile_templates(self, cache: TemplateCache, handler: DocxHandler, summary: dict):
+        """Публикация и сканирование каждого уникального шаблона один раз."""
+        for template_path in self.templates:
+            try:
+                cache.publish(template_path)
+                self.scans[template_path] = handler.merge_part_scans(handler.scan_template_parts(template_path))
+            except Exception as e:
+                print(f"Ошибка: шаблон недоступен {template_path}: {e}")
+                summary['broken_templates'].append(str(template_path))
+
+    def plan_jobs(self, handler: DocxHandler, summary: dict) -> list[tuple[int, Path, Path]]:
+        """Задания (номер проекта, шаблон, файл вывода), сгруппированные по шаблону."""
+        runnable: set[int] = set(); planned_outputs: dict[Path, int] = {}
+        validator = ProjectValidator(handler, scan_provider=lambda path: self.scans.get(Path(path).resolve()))
+        for project_idx, project in enumerate(self.projects):
+            name = str(project.filepath)
+            output_dir = self._output_dir_for(project)
+            if output_dir is None:
+                summary['skipped_projects'].append({'project': name, 'reason': "папка вывода не задана"}); continue
+            if self.validate:
+                issues = validator.validate(project.template_paths, project.keys_data)
+                for issue in issues: print(f"[{name}] {format_issue(issue)}")
+                if has_errors(issues) and self.strict:
+                    summary['skipped_projects'].append({'project': name, 'reason': "ошибки проверки (--strict)"}); continue
+            try: output_dir.mkdir(parents=True, exist_ok=True)
+            except OSError as e:
+                summary['skipped_projects'].append({'project': name, 'reason': f"папка вывода недоступна: {e}"}); continue
+            runnable.add(project_idx)
+        jobs = []
+        for template_path, project_indices in self.templates.items():
+            for project_idx in project_indices:
+                if project_idx not in runnable: continue
+                if template_path not in self.scans: # Шаблон не прочитан - ошибка каждого проекта, который его использует
+                    self._record(summary, project_idx, template_path, False); continue
+                output_path = output_path_for(template_path, self._output_dir_for(self.projects[project_idx]))
+                owner = planned_outputs.get(output_path)
+                if owner is not None: # Файл уже создается - другим проектом или тем же (одноименный шаблон из другой папки)
+                    print(f"Ошибка: {output_path} уже создается проектом {self.projects[owner].get_project_filename()}")
+                    self._record(summary, project_idx, template_path, False); continue
+                planned_outputs[output_path] = project_idx
+                jobs.append((project_idx, template_path, output_path))
+        return jobs
+
+    def _record(self, summary: dict, project_idx: int, template_path, success: bool):
+        per_project = summary['projects'][str(self.projects[project_idx].filepath)]
+        if success: summary['success'] += 1; per_project['success'] += 1
+        else:
+            summary['errors'] += 1; per_project['errors'] += 1
+            summary['failed'].append({'project': str(self.projects[project_idx].filepath), 'template': str(template_path)})
+
+    def run(self) -> dict:
+        """
+        Returns:
+            {'projects': {путь проекта: {'success', 'errors'}}, 'templates': N уникальных, 'template_uses': N ссылок,
+             'renders': N, 'success': N, 'errors': N, 'failed': [...], 'skipped_projects': [...],
+             'broken_templates': [...], 'cache': {...}, 'seconds': float}
+        """
+        started = time.perf_counter()
+        summary = {'projects': {}, 'templates': 0, 'template_uses': 0, 'renders': 0, 'success': 0, 'errors': 0,
+                   'failed': [], 'skipped_projects': [], 'broken_templates': [], 'cache': {}, 'seconds': 0.0}
+        self.load_projects(summary)
+        summary['projects'] = {str(project.filepath): {'success': 0, 'errors': 0} for project in self.projects}
+        summary['templates'] = len(self.templates)
+        summary['template_uses'] = sum(len(indices) for indices in self.templates.values())
+        cache = TemplateCache(max_bytes=self.cache_max_bytes)
+        try:
+            handler = DocxHandler(template_cache=cache, compress_level=self.compress_level)
+            self.compile_templates(cache, handler, summary)
+            jobs = self.plan_jobs(handler, summary)
+            summary['renders'] = len(jobs)
+            if self.workers <= 1:
+                for project_idx, template_path, output_path in jobs:
+                    success = handler.generate_document(template_path, output_path, self.projects[project_idx].keys_data)
+                    self._record(summary, project_idx, template_path, success)
+                summary['cache'] = cache.stats()
+            else:
+                summary['cache'] = self._run_pool(jobs, cache, summary)
+        finally:
+            cache.close()
+        summary['seconds'] = round(time.perf_counter() - started, 3)
+        return summary
+
+    def _run_pool(self, jobs: list, cache: TemplateCache, summary: dict) -> dict:
+        worker_stats: dict[int, dict] = {}
+        keys_data_by_project = {idx: self.projects[idx].keys_data for idx in {job[0] for job in jobs}}
+        session = profiling.active_session()
+
+        def collect(future, project_idx, template_path):
+            try:
+                _, _, success, pid, stats = future.result()
+                worker_stats[pid] = stats
+            except Exception as e:
+                print(f"Ошибка в процессе генерации: {e}")
+                success = False
+            self._record(summary, project_idx, template_path, success)
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(str(cache.store_dir), self.cache_max_bytes, keys_data_by_project, self.compress_level,
+                                           str(session.output_dir) if session else None)) as pool:
+            pending = deque()
+            for project_idx, template_path, output_path in jobs:
+                pending.append((pool.submit(_render_job, project_idx, str(template_path), str(output_path)), project_idx, template_path))
+                if len(pending) >= 2 * self.workers: collect(*pending.popleft())
+            while pending: collect(*pending.popleft())
+        stats = {key: sum(s[key] for s in worker_stats.values()) for key in ('hits', 'misses', 'evictions', 'bytes')}
+        stats['workers'] = len(worker_stats)
+        return stats
+
+
+def build_workspace(inputs: list[Path], **kwargs) -> dict:
+    """Находит проекты в inputs (папки и файлы .dfp) и собирает их; kwargs - параметры WorkspaceBuild."""
+    return WorkspaceBuild(discover_projects(inputs), **kwargs).run()
@@ -0,0 +1,13 @@
+import zipfile
+
+# Фиксированная дата записей ZIP (части DOCX, документы в архиве вывода): повторный запуск дает побайтно тот же файл
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+def write_zip_entry(zip_file: zipfile.ZipFile, member_name: str, blob: bytes) -> str:
+    """Записывает blob с фиксированной датой, без зависимости от ОС и прав файла; сжатие - как у архива."""
+    info = zipfile.ZipInfo(member_name, date_time=ZIP_DATE_TIME)
+    info.create_system = 0; info.external_attr = 0
+    info.compress_type = zip_file.compression
+    zip_file.writestr(info, blob, compresslevel=zip_file.compresslevel)
+    return info.filename
@@ -0,0 +1,55 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Модули приложения импортируются как models.*, как при запуске из папки docx_dormatter
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', "slow: долгие проверки (отключаются через -m 'not slow')")
+
+
+def build_template(path: Path, paragraphs: list[str], table_rows: list[list[str]] | None = None) -> Path:
+    """Небольшой шаблон DOCX: абзацы по одному на строку и (необязательно) таблица из table_rows."""
+    import docx
+    document = docx.Document()
+    for text in paragraphs: document.add_paragraph(text)
+    if table_rows:
+        table = document.add_table(rows=len(table_rows), cols=len(table_rows[0]))
+        for row, values in zip(table.rows, table_rows):
+            for cell, value in zip(row.cells, values): cell.text = value
+    document.save(path)
+    return path
+
+
+def document_text(path_or_stream) -> list[str]:
+    """Тексты абзацев основного документа, затем тексты ячеек таблиц построчно."""
+    import docx
+    document = docx.Document(path_or_stream)
+    lines = [p.text for p in document.paragraphs]
+    for table in document.tables:
+        for row in table.rows: lines.append(" | ".join(cell.text for cell in row.cells))
+    return lines
+
+
+@pytest.fixture
+def make_template(tmp_path):
+    return lambda name, paragraphs, table_rows=None: build_template(tmp_path / name, paragraphs, table_rows)
+
+
+@pytest.fixture
+def simple_template(make_template):
+    return make_template("simple.docx", ["Организация: {{ORG_NAME}}", "Дата: {{DATE}}"],
+                         [["№", "Имя"], ["{{DYNAMIC_TABLE::Items}}", "{{ITEM_NAME}}"]])
+
+
+@pytest.fixture
+def simple_keys_data():
+    return {
+        '{{ORG_NAME}}': {'value': 'ООО Ромашка', 'status': 'filled', 'is_frozen': False},
+        '{{DATE}}': {'value': '2024-03-05', 'status': 'filled', 'is_frozen': False},
+        'Items': {'type': 'dynamic_table', 'columns': [], 'template_keys': ['{{ITEM_NAME}}'],
+                  'data': [{'{{ITEM_NAME}}': 'Сервер'}, {'{{ITEM_NAME}}': 'Коммутатор'}]},
+    }
@@ -0,0 +1,20 @@
+import pytest
+
+from models.atomic_file import AtomicFile
+
+
+def test_commit_replaces_target(tmp_path):
+    target = tmp_path / "out.txt"; target.write_text("старое", encoding='utf-8')
+    with AtomicFile(target, 'w', encoding='utf-8') as f:
+        f.write("новое")
+        assert target.read_text(encoding='utf-8') == "старое" # До commit() файл не меняется
+    assert target.read_text(encoding='utf-8') == "новое"
+    assert [path.name for path in tmp_path.iterdir()] == ["out.txt"]
+
+
+def test_error_and_discard_keep_target(tmp_path):
+    target = tmp_path / "out.bin"; target.write_bytes(b"old")
+    with pytest.raises(RuntimeError):
+        with AtomicFile(target) as f: f.write(b"partial"); raise RuntimeError("сбой")
+    atomic = AtomicFile(target, fsync=False); atomic.file.write(b"new"); atomic.discard(); atomic.commit()
+    assert target.read_bytes() == b"old" and [path.name for path in tmp_path.iterdir()] == ["out.bin"]
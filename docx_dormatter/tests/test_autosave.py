@@ -0,0 +1,77 @@
+import json
+import threading
+
+import pytest
+
+from models.autosave import AutosaveWorker
+from models.project import Project
+
+
+def _project(tmp_path, simple_keys_data) -> Project:
+    project = Project()
+    project.keys_data = {key: dict(data) for key, data in simple_keys_data.items()}
+    project.filepath = tmp_path / "project.dfp"
+    return project
+
+
+def test_failed_write_keeps_previous_file(tmp_path):
+    save_path = tmp_path / "project.dfp"
+    Project.write_project_file(save_path, {'keys_data': {'a': 1}})
+    with pytest.raises(TypeError): Project.write_project_file(save_path, {'keys_data': {'a': object()}})
+    assert json.loads(save_path.read_text(encoding='utf-8')) == {'keys_data': {'a': 1}}
+    assert [path.name for path in tmp_path.iterdir()] == ["project.dfp"] # Временный файл удален
+
+
+def test_worker_writes_snapshot_and_reports_revision(tmp_path, simple_keys_data):
+    project = _project(tmp_path, simple_keys_data); project.is_modified = True
+    finished = []
+    worker = AutosaveWorker(on_finished=lambda *args: finished.append(args))
+    try:
+        assert worker.submit_project(project)
+        revision = project.revision
+        project.set_key_fields('{{ORG_NAME}}', {'value': 'после снимка'}) # Снимок уже сделан - в файл не попадет
+        assert worker.wait_idle(timeout=10)
+    finally:
+        worker.stop(timeout=10)
+    assert finished == [(project.filepath, revision, True, '')]
+    saved = json.loads(project.filepath.read_text(encoding='utf-8'))
+    assert saved['keys_data']['{{ORG_NAME}}']['value'] == 'ООО Ромашка'
+    # Ревизия устарела: флаг изменений остается
+    assert not project.mark_saved(project.filepath, revision) and project.is_modified
+
+
+def test_manual_save_is_not_overwritten_by_pending_autosave(tmp_path, simple_keys_data):
+    project = _project(tmp_path, simple_keys_data); project.is_modified = True
+    worker = AutosaveWorker()
+    try:
+        assert worker.submit_project(project) # Снимок со старым значением ждет записи или пишется
+        project.set_key_fields('{{ORG_NAME}}', {'value': 'новое'})
+        assert worker.save_project(project)
+        assert not project.is_modified
+    finally:
+        worker.stop(timeout=10)
+    saved = json.loads(project.filepath.read_text(encoding='utf-8'))
+    assert saved['keys_data']['{{ORG_NAME}}']['value'] == 'новое'
+
+
+def test_older_revision_is_never_written(tmp_path, simple_keys_data, monkeypatch):
+    project = _project(tmp_path, simple_keys_data); project.is_modified = True
+    write_started = threading.Event(); release = threading.Event()
+    original_write = Project.write_project_file
+
+    def slow_write(save_path, project_data):
+        write_started.set(); release.wait(10)
+        original_write(save_path, project_data)
+    worker = AutosaveWorker()
+    try:
+        old_snapshot, old_revision = project.snapshot(), project.revision
+        project.set_key_fields('{{ORG_NAME}}', {'value': 'новое'})
+        monkeypatch.setattr(Project, 'write_project_file', staticmethod(slow_write))
+        worker.submit(project.filepath, project.snapshot(), project.revision) # Новая ревизия пишется (запись задержана)
+        assert write_started.wait(10)
+        worker.submit(project.filepath, old_snapshot, old_revision) # Старый снимок пришел позже
+        release.set()
+    finally:
+        worker.stop(timeout=10)
+    saved = json.loads(project.filepath.read_text(encoding='utf-8'))
+    assert saved['keys_data']['{{ORG_NAME}}']['value'] == 'новое'
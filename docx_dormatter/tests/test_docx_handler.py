@@ -0,0 +1,118 @@
+import io
+import zipfile
+
+import pytest
+
+from models.docx_handler import DocxHandler
+from models.zip_entries import ZIP_DATE_TIME
+from conftest import document_text
+
+
+@pytest.fixture
+def handler():
+    return DocxHandler()
+
+
+def test_failed_save_keeps_previous_output(tmp_path, handler, simple_template, simple_keys_data, monkeypatch):
+    output_path = tmp_path / "out.docx"
+    output_path.write_bytes(b"previous")
+
+    def broken_save(doc, target):
+        target.write(b"partial"); raise OSError("disk full")
+    monkeypatch.setattr(handler, 'save_document', broken_save)
+    assert not handler.generate_document(simple_template, output_path, simple_keys_data)
+    assert output_path.read_bytes() == b"previous"
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["out.docx", "simple.docx"]
+
+
+def test_output_replaced_only_after_save(tmp_path, handler, simple_template, simple_keys_data):
+    output_path = tmp_path / "out.docx"
+    output_path.write_bytes(b"previous")
+    events = handler.iter_generate_document(simple_template, output_path, simple_keys_data)
+    for event in events:
+        assert output_path.read_bytes() == b"previous" or event['event'] == 'saved'
+    assert output_path.read_bytes()[:2] == b"PK"
+
+
+@pytest.mark.parametrize('compress_level', [0, 6, 9])
+def test_output_is_byte_identical(tmp_path, simple_template, simple_keys_data, compress_level):
+    outputs = []
+    for run in range(2):
+        output_path = tmp_path / f"out{run}.docx"
+        assert DocxHandler(compress_level=compress_level).generate_document(simple_template, output_path, simple_keys_data)
+        outputs.append(output_path.read_bytes())
+    stream = io.BytesIO()
+    assert DocxHandler(compress_level=compress_level).generate_document(simple_template, stream, simple_keys_data)
+    assert outputs[0] == outputs[1] == stream.getvalue()
+
+
+def test_parts_written_in_partname_order(tmp_path, handler, simple_template, simple_keys_data):
+    output_path = tmp_path / "out.docx"
+    handler.generate_document(simple_template, output_path, simple_keys_data)
+    with zipfile.ZipFile(output_path) as package:
+        names = package.namelist()
+        assert names[:2] == ['[Content_Types].xml', '_rels/.rels']
+        part_names = [name for name in names[2:] if not name.endswith('.rels')]
+        assert part_names == sorted(part_names)
+        assert {info.date_time for info in package.infolist()} == {ZIP_DATE_TIME}
+        content_types = package.read('[Content_Types].xml').decode('utf-8')
+    # Каждая часть описана в [Content_Types].xml: своей записью Override или Default по расширению
+    for name in part_names:
+        assert f'PartName="/{name}"' in content_types or f'Extension="{name.rsplit(".", 1)[1]}"' in content_types
+    assert '<Override PartName="/word/document.xml"' in content_types
+    assert document_text(output_path)[:2] == ["Организация: ООО Ромашка", "Дата: 2024-03-05"]
+
+
+def test_event_sequence(tmp_path, handler, simple_template, simple_keys_data):
+    events = list(handler.iter_generate_document(simple_template, tmp_path / "out.docx", simple_keys_data))
+    kinds = [event['event'] for event in events]
+    assert kinds[0] == 'opened' and kinds[-1] == 'saved'
+    assert 'part' in kinds and 'table_row' in kinds and 'paragraphs' in kinds
+    rows = [event for event in events if event['event'] == 'table_row']
+    assert (rows[-1]['row'], rows[-1]['total']) == (2, 2)
+
+
+def test_cancel_mid_document_leaves_no_file(tmp_path, handler, simple_template, simple_keys_data):
+    output_path = tmp_path / "out.docx"
+    events = handler.iter_generate_document(simple_template, output_path, simple_keys_data)
+    for event in events:
+        if event['event'] == 'part': events.close(); break
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["simple.docx"]
+
+
+def test_cancel_after_saved_keeps_document(tmp_path, handler, simple_template, simple_keys_data):
+    output_path = tmp_path / "out.docx"
+    events = handler.iter_generate_document(simple_template, output_path, simple_keys_data)
+    for event in events:
+        if event['event'] == 'saved': events.close(); break
+    assert document_text(output_path)[0] == "Организация: ООО Ромашка"
+
+
+def test_missing_files_are_reported_by_stage(tmp_path, handler, simple_template, simple_keys_data):
+    [error] = handler.iter_generate_document(tmp_path / "missing.docx", tmp_path / "out.docx", simple_keys_data)
+    assert (error['event'], error['stage']) == ('error', 'open')
+    assert error['message'] == f"Шаблон не найден: {tmp_path / 'missing.docx'}"
+    error = list(handler.iter_generate_document(simple_template, tmp_path / "no_dir" / "out.docx", simple_keys_data))[-1]
+    assert (error['event'], error['stage']) == ('error', 'save')
+    assert error['message'] == f"Папка вывода не найдена: {tmp_path / 'no_dir'}"
+
+
+BLOCK_PARAGRAPHS = ["Заголовок", "{{IF::ORG_NAME}}", "Организация {{ORG_NAME}}", "{{END_IF::ORG_NAME}}",
+                    "{{IF::EMPTY}}", "скрыто", "{{END_IF::EMPTY}}",
+                    "{{REPEAT::Items}}", "Элемент {{ITEM_NAME}}", "{{END_REPEAT::Items}}", "Конец"]
+
+
+def test_repeat_and_if_blocks(tmp_path, handler, make_template, simple_keys_data):
+    template_path = make_template("blocks.docx", BLOCK_PARAGRAPHS)
+    scan = handler.find_keys_in_template(template_path)
+    assert scan['tables']['Items'] == {'template_keys': ['{{ITEM_NAME}}'], 'kind': 'repeat'}
+    keys_data = dict(simple_keys_data, **{'{{EMPTY}}': {'value': '', 'status': 'empty'}})
+    output_path = tmp_path / "out.docx"
+    assert handler.generate_document(template_path, output_path, keys_data)
+    assert document_text(output_path) == ["Заголовок", "Организация ООО Ромашка", "Элемент Сервер", "Элемент Коммутатор", "Конец"]
+
+
+def test_parts_without_directives_skip_block_walk(tmp_path, handler, simple_template, simple_keys_data, monkeypatch):
+    def unexpected(*args): raise AssertionError("_expand_blocks вызван для части без директив")
+    monkeypatch.setattr(handler, '_expand_blocks', unexpected)
+    assert handler.generate_document(simple_template, tmp_path / "out.docx", simple_keys_data)
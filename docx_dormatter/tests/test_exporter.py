@@ -0,0 +1,69 @@
+import csv
+import json
+
+import pytest
+
+from models import exporter as exporter_module
+from models.exporter import ProjectExporter, iter_keys_data_from_file
+
+
+@pytest.mark.parametrize('fmt', ProjectExporter.FORMATS)
+def test_export_writes_keys_and_tables(tmp_path, simple_keys_data, fmt):
+    stats = ProjectExporter(fmt).export(simple_keys_data.items(), tmp_path / "out")
+    assert stats['keys'] == 2 and stats['tables'] == {'Items': 2}
+    assert sorted(path.name for path in stats['files']) == [f"keys.{fmt}", f"table_Items.{fmt}"]
+    with open(tmp_path / "out" / f"table_Items.{fmt}", encoding='utf-8', newline='') as f:
+        records = list(csv.DictReader(f)) if fmt == 'csv' else [json.loads(line) for line in f]
+    assert [record['ITEM_NAME'] for record in records] == ['Сервер', 'Коммутатор']
+    assert [str(record['№ п/п']) for record in records] == ['1', '2']
+
+
+def test_stream_reader_matches_json(tmp_path, simple_keys_data):
+    project_file = tmp_path / "project.dfp"
+    project_file.write_text(json.dumps({'template_paths': [], 'keys_data': simple_keys_data}, ensure_ascii=False), encoding='utf-8')
+    assert dict(iter_keys_data_from_file(project_file, chunk_size=7)) == simple_keys_data
+
+
+def test_unknown_format_rejected():
+    with pytest.raises(ValueError): ProjectExporter('xml')
+
+
+@pytest.fixture
+def large_table_project(tmp_path):
+    rows = [{'{{NAME}}': f"Строка {i}" * 5, '{{NUM}}': str(i)} for i in range(20000)]
+    keys_data = {'{{ORG_NAME}}': {'value': 'ООО Ромашка', 'status': 'filled'},
+                 'Big': {'type': 'dynamic_table', 'columns': [], 'template_keys': ['{{NAME}}', '{{NUM}}'], 'data': rows},
+                 '{{DATE}}': {'value': '2024-03-05', 'status': 'filled'}}
+    project_file = tmp_path / "big.dfp"
+    project_file.write_text(json.dumps({'template_paths': [], 'keys_data': keys_data}, ensure_ascii=False, indent=4), encoding='utf-8')
+    return project_file, keys_data
+
+
+def test_large_value_is_parsed_a_logarithmic_number_of_times(large_table_project, monkeypatch):
+    project_file, keys_data = large_table_project
+    attempts = []
+    original = json.JSONDecoder.raw_decode
+    monkeypatch.setattr(json.JSONDecoder, 'raw_decode', lambda self, s, idx=0: attempts.append(idx) or original(self, s, idx))
+    assert dict(iter_keys_data_from_file(project_file, chunk_size=4096)) == keys_data
+    # Таблица ~3 МБ: при дочитывании по 4 КБ без роста буфера было бы ~700 повторных разборов
+    assert len(attempts) < 40
+
+
+def test_rows_are_streamed_with_bounded_buffer(tmp_path, large_table_project, monkeypatch):
+    project_file, keys_data = large_table_project
+    buffer_sizes = []
+    original_fill = exporter_module._JsonStreamReader._fill
+    def recording_fill(self, size=None):
+        filled = original_fill(self, size); buffer_sizes.append(len(self._buf)); return filled
+    monkeypatch.setattr(exporter_module._JsonStreamReader, '_fill', recording_fill)
+    stats = ProjectExporter('csv').export(iter_keys_data_from_file(project_file, chunk_size=4096, stream_rows=True), tmp_path / "out")
+    assert stats == {'keys': 2, 'tables': {'Big': 20000}, 'files': [tmp_path / "out" / "keys.csv", tmp_path / "out" / "table_Big.csv"]}
+    assert max(buffer_sizes) < 16384 # В памяти одна строка таблицы, а не вся таблица
+    with open(tmp_path / "out" / "table_Big.csv", encoding='utf-8', newline='') as f:
+        assert [record['NUM'] for record in csv.DictReader(f)] == [str(i) for i in range(20000)]
+
+
+def test_streamed_rows_can_be_skipped(large_table_project):
+    project_file, _ = large_table_project
+    items = [(key_id, data.get('value')) for key_id, data in iter_keys_data_from_file(project_file, stream_rows=True)]
+    assert items == [('{{ORG_NAME}}', 'ООО Ромашка'), ('Big', None), ('{{DATE}}', '2024-03-05')]
@@ -0,0 +1,48 @@
+import pytest
+
+from models.docx_handler import DocxHandler
+from models.filters import FilterError, FilterMemo, base_key, compile_placeholder
+from conftest import document_text
+
+
+@pytest.mark.parametrize('placeholder, value, expected', [
+    ("{{NAME|upper}}", "ромашка", "РОМАШКА"),
+    ("{{NAME|lower|capitalize}}", "ООО РОМАШКА", "Ооо ромашка"),
+    ("{{NAME|strip|title}}", "  ооо ромашка ", "Ооо Ромашка"),
+    ("{{DATE|date:%d.%m.%Y}}", "2024-03-05", "05.03.2024"),
+    ("{{DATE|date:%H:%M}}", "2024-03-05 14:30", "14:30"), # Двоеточие внутри аргумента
+    ("{{DATE|date:%d.%m.%Y}}", "не дата", "не дата"),
+    ("{{SUM|number:2}}", "1234567.891", "1\u00a0234\u00a0567,89"),
+    ("{{SUM|number}}", "12 345,5", "12\u00a0345,5"),
+    ("{{SUM|number:0}}", "abc", "abc"),
+    ("{{NOTE|default:нет}}", "  ", "нет"),
+    ("{{NOTE|default:нет}}", "есть", "есть"),
+])
+def test_filter_chains(placeholder, value, expected):
+    assert compile_placeholder(placeholder).apply(value) == expected
+
+
+@pytest.mark.parametrize('placeholder', ["{{NAME|unknown}}", "{{NAME|upper:1}}", "{{DATE|date}}", "{{SUM|number:x}}"])
+def test_invalid_filters_raise(placeholder):
+    with pytest.raises(FilterError): compile_placeholder(placeholder)
+
+
+def test_base_key_and_memo():
+    assert base_key("{{ DATE | date:%Y}}") == "{{DATE}}" and base_key("{{DATE}}") == "{{DATE}}"
+    assert compile_placeholder("{{DATE|upper}}") is compile_placeholder("{{DATE|upper}}")
+    memo = FilterMemo()
+    assert [memo.apply("{{NAME|upper}}", "a") for _ in range(3)] == ["A"] * 3
+    assert (memo.hits, memo.misses) == (2, 1)
+
+
+def test_filters_in_rendered_document(tmp_path, make_template, simple_keys_data):
+    template_path = make_template("filters.docx", ["{{ORG_NAME|upper}} от {{DATE|date:%d.%m.%Y}}", "{{DATE|bogus}}"],
+                                  [["№", "Имя"], ["{{DYNAMIC_TABLE::Items}}", "{{ITEM_NAME|upper}}"]])
+    handler = DocxHandler()
+    scan = handler.find_keys_in_template(template_path)
+    assert scan['keys'] >= {'{{ORG_NAME}}', '{{DATE}}'} and set(scan['invalid_filters']) == {'{{DATE|bogus}}'}
+    assert scan['tables']['Items']['template_keys'] == ['{{ITEM_NAME}}']
+    output_path = tmp_path / "out.docx"
+    assert handler.generate_document(template_path, output_path, simple_keys_data)
+    assert document_text(output_path)[0] == "ООО РОМАШКА от 05.03.2024"
+    assert document_text(output_path)[-2:] == ["1 | СЕРВЕР", "2 | КОММУТАТОР"]
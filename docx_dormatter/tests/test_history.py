@@ -0,0 +1,82 @@
+import copy
+
+from models.history import BatchOperation, DeleteRows, EditHistory, InsertRows, PermuteRows, SetCells, SetKeyFields
+from models.project import Project
+
+ITEM = '{{ITEM_NAME}}'
+
+
+def _project(simple_keys_data) -> Project:
+    project = Project()
+    project.keys_data = copy.deepcopy(simple_keys_data)
+    return project
+
+
+def _record(history: EditHistory, project: Project, operation, now: float):
+    assert operation.apply(project)
+    history.record(operation, now=now)
+
+
+def test_undo_redo_round_trip(simple_keys_data):
+    project = _project(simple_keys_data); history = EditHistory()
+    steps = [
+        SetKeyFields('{{ORG_NAME}}', {'value': 'ООО Ромашка'}, {'value': 'ООО Лютик'}),
+        SetCells('Items', [(0, ITEM, 'Сервер', 'Хранилище')]),
+        InsertRows('Items', 1, [{ITEM: 'Маршрутизатор'}, {ITEM: 'Шлюз'}]),
+        PermuteRows('Items', 0, [3, 2, 1, 0]),
+        DeleteRows('Items', [(0, {ITEM: 'Коммутатор'}), (2, {ITEM: 'Маршрутизатор'})]),
+    ]
+    states = [copy.deepcopy(project.keys_data)]
+    for now, operation in enumerate(steps, 1):
+        _record(history, project, operation, now * 10.0) # Шаги далеко во времени - без слияния
+        states.append(copy.deepcopy(project.keys_data))
+    assert [row[ITEM] for row in project.keys_data['Items']['data']] == ['Шлюз', 'Хранилище']
+    for state in reversed(states[:-1]):
+        assert history.undo(project) is not None and project.keys_data == state
+    assert history.undo(project) is None
+    for state in states[1:]:
+        assert history.redo(project) is not None and project.keys_data == state
+    assert not history.can_redo()
+
+
+def test_typing_merges_into_one_step(simple_keys_data):
+    project = _project(simple_keys_data); history = EditHistory(merge_seconds=1.5)
+    value = 'ООО Ромашка'
+    for now, char in enumerate("!!!"):
+        _record(history, project, SetKeyFields('{{ORG_NAME}}', {'value': value}, {'value': value + char}), now * 0.5)
+        value += char
+    _record(history, project, SetKeyFields('{{ORG_NAME}}', {'is_frozen': False}, {'is_frozen': True}), 1.2)
+    assert history.stats()['undo'] == 2 # Заморозка - отдельный шаг
+    history.undo(project); history.undo(project)
+    assert project.keys_data == simple_keys_data
+
+
+def test_batch_is_one_step_and_new_edit_clears_redo(simple_keys_data):
+    project = _project(simple_keys_data); history = EditHistory()
+    batch = BatchOperation('Items', [SetCells('Items', [(1, ITEM, 'Коммутатор', 'A')]), InsertRows('Items', 2, [{ITEM: 'B'}])])
+    _record(history, project, batch, 0.0)
+    history.undo(project)
+    assert project.keys_data == simple_keys_data and history.can_redo()
+    _record(history, project, SetKeyFields('{{DATE}}', {'value': '2024-03-05'}, {'value': ''}), 10.0)
+    assert not history.can_redo()
+
+
+def test_memory_cap_drops_oldest_steps(simple_keys_data):
+    project = _project(simple_keys_data)
+    operation_size = SetKeyFields('{{ORG_NAME}}', {'value': 'x' * 1000}, {'value': 'y' * 1000}).size()
+    history = EditHistory(max_bytes=operation_size * 3)
+    for now in range(10):
+        before = project.keys_data['{{ORG_NAME}}']['value']
+        _record(history, project, SetKeyFields('{{ORG_NAME}}', {'value': before}, {'value': str(now) * 1000}), now * 10.0)
+    stats = history.stats()
+    assert stats['undo'] == 3 and stats['bytes'] <= stats['max_bytes']
+    while history.undo(project): pass
+    assert project.keys_data['{{ORG_NAME}}']['value'] == '6' * 1000 # Старше трех шагов отменить нельзя
+
+
+def test_snapshot_is_not_changed_by_later_edits(simple_keys_data):
+    project = _project(simple_keys_data)
+    snapshot = project.snapshot()
+    SetCells('Items', [(0, ITEM, 'Сервер', 'Другое')]).apply(project)
+    InsertRows('Items', 0, [{ITEM: 'Новая'}]).apply(project)
+    assert snapshot['keys_data']['Items']['data'] == simple_keys_data['Items']['data']
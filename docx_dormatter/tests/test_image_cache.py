@@ -0,0 +1,80 @@
+import io
+import zipfile
+
+import docx
+import pytest
+
+from models.docx_handler import DocxHandler
+from models.image_cache import ImageCache
+from conftest import document_text
+
+Image = pytest.importorskip("PIL.Image")
+
+
+@pytest.fixture
+def photo(tmp_path):
+    path = tmp_path / "photo.png"
+    Image.new('RGB', (1200, 600), (200, 30, 30)).save(path)
+    return path
+
+
+def test_cache_key_is_content_and_size(tmp_path, photo):
+    copy_path = tmp_path / "copy.png"; copy_path.write_bytes(photo.read_bytes())
+    cache = ImageCache()
+    first = cache.get(photo, 50)
+    assert cache.get(copy_path, 50) is first # Те же байты по другому пути
+    assert cache.get(photo, 40) is not first # Другой размер - другая запись
+    assert cache.stats == {'hits': 1, 'misses': 2}
+
+
+def test_unchanged_file_digest_is_reused(photo):
+    cache = ImageCache()
+    digest, data = cache._file_digest(photo)
+    assert data == photo.read_bytes()
+    assert cache._file_digest(photo) == (digest, None) # Файл не перечитывается
+    Image.new('RGB', (10, 10)).save(photo)
+    new_digest, new_data = cache._file_digest(photo)
+    assert new_data is not None and new_digest != digest
+
+
+def test_downscaled_to_target_size(photo):
+    prepared = ImageCache(dpi=150).get(photo, width_mm=50)
+    with Image.open(io.BytesIO(prepared['blob'])) as img:
+        assert img.size == (295, 148) and img.format == 'JPEG'
+    assert (prepared['width_emu'], prepared['height_emu']) == (50 * 36000, None)
+    # Увеличение не выполняется: файл вставляется как есть
+    assert ImageCache(dpi=150).get(photo, width_mm=500)['blob'] == photo.read_bytes()
+
+
+def test_disk_cache_is_reused_between_runs(tmp_path, photo, monkeypatch):
+    blob = ImageCache(cache_dir=tmp_path / "images").get(photo, 50)['blob']
+    assert [path.suffix for path in (tmp_path / "images").iterdir()] == ['.jpg']
+    second = ImageCache(cache_dir=tmp_path / "images")
+    monkeypatch.setattr(second, '_encode', lambda *args: pytest.fail("изображение пережимается повторно"))
+    assert second.get(photo, 50)['blob'] == blob
+
+
+def test_image_stored_once_in_package(tmp_path, photo):
+    document = docx.Document()
+    document.sections[0].header.paragraphs[0].text = "Логотип: {{LOGO_PICTURE}}"
+    document.add_paragraph("Первый {{LOGO_PICTURE}} абзац"); document.add_paragraph("{{LOGO_PICTURE}}")
+    document.save(tmp_path / "logo.docx")
+    handler = DocxHandler()
+    keys_data = {'{{LOGO_PICTURE}}': {'value': str(photo), 'image_width_mm': 30}}
+    assert handler.generate_document(tmp_path / "logo.docx", tmp_path / "out.docx", keys_data)
+    with zipfile.ZipFile(tmp_path / "out.docx") as package:
+        assert len([name for name in package.namelist() if name.startswith('word/media/')]) == 1
+    assert handler.image_cache.stats == {'hits': 2, 'misses': 1}
+    result = docx.Document(tmp_path / "out.docx")
+    assert len(result.inline_shapes) == 2
+    assert document_text(tmp_path / "out.docx") == ["Первый  абзац", ""]
+
+
+@pytest.mark.parametrize('content', [None, b"not an image"])
+def test_missing_or_unreadable_image_removes_key(tmp_path, make_template, content):
+    image_path = tmp_path / "logo.png"
+    if content is not None: image_path.write_bytes(content)
+    template_path = make_template("logo.docx", ["До {{LOGO_PICTURE}} после"])
+    assert DocxHandler().generate_document(template_path, tmp_path / "out.docx", {'{{LOGO_PICTURE}}': {'value': str(image_path)}})
+    assert document_text(tmp_path / "out.docx") == ["До  после"]
+    assert not docx.Document(tmp_path / "out.docx").inline_shapes
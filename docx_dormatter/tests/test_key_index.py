@@ -0,0 +1,31 @@
+from models.key_index import KeyIndex
+
+
+def _index(keys_data: dict) -> KeyIndex:
+    index = KeyIndex()
+    for key_id, data in keys_data.items(): index.upsert(key_id, data)
+    return index
+
+
+def _brute_force(keys_data: dict, text: str) -> list[str]:
+    query = KeyIndex.normalize(text)
+    return sorted(key_id for key_id in keys_data if query in KeyIndex.normalize(key_id))
+
+
+def test_substring_and_prefix_search(simple_keys_data):
+    keys_data = dict(simple_keys_data, **{'{{ORG_ADDRESS}}': {'value': '', 'status': 'empty'}})
+    index = _index(keys_data)
+    for text in ('', 'o', 'or', 'org', '{{org_n', 'name', 'ate', 'items', 'нет'):
+        assert index.search(text) == _brute_force(keys_data, text)
+    assert index.search('ORG', prefix_only=True) == ['{{ORG_ADDRESS}}', '{{ORG_NAME}}']
+    assert index.search('name', prefix_only=True) == []
+
+
+def test_status_filters_and_incremental_updates(simple_keys_data):
+    index = _index(simple_keys_data)
+    assert index.search(status='table') == ['Items']
+    assert index.search(status='empty') == []
+    assert not index.upsert('{{DATE}}', {'value': '', 'status': 'empty', 'is_frozen': True})
+    assert index.search(status='empty') == index.search(status='is_frozen') == ['{{DATE}}']
+    assert index.remove('{{ORG_NAME}}') and not index.remove('{{ORG_NAME}}')
+    assert index.search('org') == [] and len(index) == 2
@@ -0,0 +1,17 @@
+import pytest
+
+from models.memory_budget import DEFAULT_BUDGETS, check_budget, run_memcheck
+
+
+@pytest.mark.slow
+def test_default_budgets_hold():
+    # Каждый сценарий - в отдельном процессе, как в команде memcheck
+    measurements, violations = run_memcheck()
+    assert violations == [], "\n".join(violations)
+    assert [m['scenario'] for m in measurements] == list(DEFAULT_BUDGETS)
+
+
+def test_violation_reported_for_exceeded_budget():
+    measurements, violations = run_memcheck(['find_keys'], budgets={'find_keys': {'peak_mb': 0.001}}, isolated=False)
+    assert violations == [f"find_keys: peak_mb {measurements[0]['peak_mb']} МБ > бюджета 0.001 МБ"]
+    assert check_budget(dict(measurements[0], scale=2), {'find_keys': {'peak_mb': measurements[0]['peak_mb'] / 2}}) == []
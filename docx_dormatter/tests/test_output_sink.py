@@ -0,0 +1,46 @@
+import zipfile
+
+import pytest
+
+from models.batch_renderer import render_templates
+from models.output_sink import ZipOutputSink
+from models.zip_entries import ZIP_DATE_TIME
+
+
+@pytest.fixture
+def templates(tmp_path, make_template):
+    (tmp_path / "other").mkdir()
+    return [make_template("a.docx", ["A: {{ORG_NAME}}"]), make_template("b.docx", ["B: {{DATE}}"]),
+            make_template("other/a.docx", ["Другой A: {{ORG_NAME}}"])]
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_archive_matches_directory_output(tmp_path, templates, simple_keys_data, workers):
+    (tmp_path / "dir").mkdir()
+    directory_summary = render_templates(templates[:2], tmp_path / "dir", simple_keys_data)
+    assert directory_summary['success'] == 2
+    with ZipOutputSink(tmp_path / "out.zip") as sink:
+        summary = render_templates(templates, tmp_path / "unused", simple_keys_data, workers=workers, sink=sink)
+    assert summary['success'] == 3 and summary['output'] == str(tmp_path / "out.zip")
+    with zipfile.ZipFile(tmp_path / "out.zip") as archive:
+        assert archive.namelist() == ["a_gen.docx", "b_gen.docx", "a_gen_2.docx"] # Одноименные шаблоны не перезаписываются
+        assert {info.date_time for info in archive.infolist()} == {ZIP_DATE_TIME}
+        for name in ("a_gen.docx", "b_gen.docx"): assert archive.read(name) == (tmp_path / "dir" / name).read_bytes()
+
+
+def test_failed_document_is_not_added(tmp_path, templates, simple_keys_data):
+    broken = tmp_path / "broken.docx"; broken.write_bytes(b"not a zip")
+    with ZipOutputSink(tmp_path / "out.zip") as sink:
+        summary = render_templates([broken, templates[0]], tmp_path, simple_keys_data, sink=sink)
+    assert (summary['success'], summary['failed']) == (1, [str(broken)])
+    with zipfile.ZipFile(tmp_path / "out.zip") as archive: assert archive.namelist() == ["a_gen.docx"]
+
+
+def test_interrupted_run_keeps_previous_archive(tmp_path):
+    archive_path = tmp_path / "out.zip"
+    archive_path.write_bytes(b"previous")
+    with pytest.raises(RuntimeError):
+        with ZipOutputSink(archive_path) as sink:
+            sink.add("a.docx", b"data"); raise RuntimeError("прервано")
+    assert archive_path.read_bytes() == b"previous"
+    assert [path.name for path in tmp_path.iterdir()] == ["out.zip"]
@@ -0,0 +1,35 @@
+import pytest
+
+from models import profiling
+
+
+@pytest.fixture
+def session(tmp_path):
+    yield profiling.enable(tmp_path / "profiles", sample_interval=0.001)
+    profiling.disable()
+
+
+@profiling.profiled('work', lambda n: n)
+def _work(n: int) -> int:
+    return sum(i * i for i in range(n))
+
+
+def test_profiled_call_writes_reports(session):
+    assert _work(20000) == sum(i * i for i in range(20000))
+    [report] = session.reports
+    assert report.name.endswith("_work_20000.txt")
+    assert {path.suffix for path in session.output_dir.iterdir()} == {'.prof', '.folded', '.txt'}
+    assert "Горячие функции" in report.read_text(encoding='utf-8')
+    assert session.report_files() == [report]
+
+
+def test_nested_capture_writes_one_report(session):
+    with profiling.capture("outer"):
+        _work(10)
+    assert len(session.reports) == 1
+
+
+def test_disabled_profiling_is_a_no_op(tmp_path):
+    profiling.disable()
+    with profiling.capture("nothing"): _work(10)
+    assert profiling.active_session() is None and not list(tmp_path.iterdir())
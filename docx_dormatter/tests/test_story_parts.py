@@ -0,0 +1,83 @@
+import zipfile
+
+import docx
+import pytest
+from docx.opc.constants import CONTENT_TYPE as CT, RELATIONSHIP_TYPE as RT
+from docx.opc.packuri import PackURI
+from docx.opc.part import Part
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+
+from models.docx_handler import DocxHandler
+
+
+FOOTNOTES_XML = (
+    f'<w:footnotes {nsdecls("w")}>'
+    '<w:footnote w:id="1"><w:p><w:r><w:t>Сноска: {{DATE}}</w:t></w:r></w:p></w:footnote>'
+    '</w:footnotes>'
+)
+TEXTBOX_XML = (
+    f'<w:r {nsdecls("w")} xmlns:v="urn:schemas-microsoft-com:vml"><w:pict><v:shape><v:textbox><w:txbxContent>'
+    '<w:p><w:r><w:t>Надпись: {{BOX}}</w:t></w:r></w:p>'
+    '</w:txbxContent></v:textbox></v:shape></w:pict></w:r>'
+)
+
+
+@pytest.fixture
+def story_template(tmp_path):
+    """Шаблон с ключами в колонтитулах, таблицей в верхнем колонтитуле, надписью и сносками."""
+    document = docx.Document()
+    section = document.sections[0]
+    section.header.paragraphs[0].text = "Шапка: {{ORG_NAME}}"
+    header_table = section.header.add_table(rows=2, cols=2, width=section.page_width)
+    for cell, value in zip(header_table.rows[0].cells + header_table.rows[1].cells, ["№", "Имя", "{{DYNAMIC_TABLE::Items}}", "{{ITEM_NAME}}"]):
+        cell.text = value
+    section.footer.paragraphs[0].text = "Подвал: {{FOOTER_NOTE}}"
+    document.add_paragraph("Текст документа").runs[0]._r.addnext(parse_xml(TEXTBOX_XML))
+    footnotes = Part(PackURI('/word/footnotes.xml'), CT.WML_FOOTNOTES, FOOTNOTES_XML.encode('utf-8'), document.part.package)
+    document.part.relate_to(footnotes, RT.FOOTNOTES)
+    path = tmp_path / "stories.docx"
+    document.save(path)
+    return path
+
+
+@pytest.fixture
+def story_keys_data(simple_keys_data):
+    return dict(simple_keys_data, **{'{{FOOTER_NOTE}}': {'value': 'конец', 'status': 'filled'},
+                                     '{{BOX}}': {'value': 'в рамке', 'status': 'filled'}})
+
+
+def _part_texts(path, part_name) -> list[str]:
+    """Тексты всех абзацев части (включая ячейки и надписи)."""
+    with zipfile.ZipFile(path) as package: root = parse_xml(package.read(part_name))
+    return ["".join(t.text or '' for t in p.iter(qn('w:t'))) for p in root.iter(qn('w:p'))]
+
+
+def test_scan_finds_keys_in_all_story_parts(story_template):
+    handler = DocxHandler()
+    parts = handler.scan_template_parts(story_template)
+    assert {'word/document.xml', 'word/header1.xml', 'word/footer1.xml', 'word/footnotes.xml'} <= set(parts)
+    assert parts['word/header1.xml']['keys'] >= {'{{ORG_NAME}}'}
+    assert parts['word/header1.xml']['tables']['Items']['template_keys'] == ['{{ITEM_NAME}}']
+    assert parts['word/footer1.xml']['keys'] == {'{{FOOTER_NOTE}}'}
+    assert parts['word/footnotes.xml']['keys'] == {'{{DATE}}'}
+    assert '{{BOX}}' in parts['word/document.xml']['keys'] # Абзац надписи (w:txbxContent)
+    result = handler.find_keys_in_template(story_template)
+    assert result['keys'] == {'{{ORG_NAME}}', '{{ITEM_NAME}}', '{{FOOTER_NOTE}}', '{{DATE}}', '{{BOX}}'}
+    assert set(result['tables']) == {'Items'}
+
+
+def test_footnotes_are_committed_as_plain_part(story_template):
+    handler = DocxHandler()
+    stories = {part_name: commit for _, _, commit, part_name in handler._get_story_parts(docx.Document(story_template))}
+    assert stories['word/footnotes.xml'] is not None # Обычная Part: результат записывается через commit()
+    assert stories['word/header1.xml'] is None and stories['word/document.xml'] is None
+
+
+def test_render_fills_all_story_parts(tmp_path, story_template, story_keys_data):
+    output_path = tmp_path / "out.docx"
+    assert DocxHandler().generate_document(story_template, output_path, story_keys_data)
+    assert _part_texts(output_path, 'word/header1.xml') == ["Шапка: ООО Ромашка", "№", "Имя", "1", "Сервер", "2", "Коммутатор"]
+    assert _part_texts(output_path, 'word/footer1.xml') == ["Подвал: конец"]
+    assert _part_texts(output_path, 'word/footnotes.xml') == ["Сноска: 2024-03-05"]
+    assert "Надпись: в рамке" in _part_texts(output_path, 'word/document.xml')
@@ -0,0 +1,92 @@
+import os
+
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen') # Виджеты без дисплея
+pytest.importorskip("PySide6")
+from PySide6.QtWidgets import QApplication
+
+from models.history import BatchOperation, InsertRows, PermuteRows, SetCells
+from models.project import Project
+from views.table_editor import TableEditorWidget
+
+NAME = '{{NAME}}'; QTY = '{{QTY}}'
+
+
+@pytest.fixture(scope='module')
+def qapp():
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def editor(qapp):
+    """Редактор таблицы Items из пяти строк; операции применяются к проекту, как в MainWindow."""
+    project = Project()
+    project.keys_data = {'Items': {'type': 'dynamic_table', 'columns': [], 'template_keys': [NAME, QTY],
+                                   'data': [{NAME: f"r{i}", QTY: str(i)} for i in range(5)]}}
+    widget = TableEditorWidget(); widget.operations = []
+    def on_operation(operation):
+        assert operation.apply(project); widget.operations.append(operation)
+    widget.edit_operation.connect(on_operation)
+    widget.set_table_data('Items', project.get_key_data('Items')); widget.project = project
+    yield widget
+    widget.deleteLater()
+
+
+def _contents(editor) -> list[list[str]]:
+    table = editor.table_widget
+    return [[table.item(row, col).text() if table.item(row, col) else '' for col in range(table.columnCount())]
+            for row in range(table.rowCount())]
+
+
+def _project_rows(editor) -> list[list[str]]:
+    return [[str(i), row.get(NAME, ''), row.get(QTY, '')] for i, row in enumerate(editor.project.get_key_data('Items')['data'], 1)]
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("a\tb\r\nc\td\r\n", [["a", "b"], ["c", "d"]]), # Перевод строки после последней строки не дает пустой строки
+    ('"строка 1\nстрока 2"\t"он сказал ""да"""\n', [["строка 1\nстрока 2", 'он сказал "да"']]),
+    ("x\t\ty\n", [["x", "", "y"]]),
+    ("", []),
+])
+def test_parse_clipboard_rows(text, expected):
+    assert TableEditorWidget.parse_clipboard_rows(text) == expected
+
+
+def test_paste_overwrites_and_appends_rows(editor):
+    rows = TableEditorWidget.parse_clipboard_rows('a\t1\r\n"две\nстроки"\t2\r\nc\t3\r\n')
+    assert editor.paste_rows(rows, 3, 1) == 3
+    assert _contents(editor)[3:] == [["4", "a", "1"], ["5", "две\nстроки", "2"], ["6", "c", "3"]]
+    [operation] = editor.operations
+    assert isinstance(operation, BatchOperation)
+    insert, cells = operation.operations
+    assert isinstance(insert, InsertRows) and (insert.index, len(insert.rows)) == (5, 1)
+    assert isinstance(cells, SetCells) and cells.cells[0] == (3, NAME, "r3", "a")
+    assert _project_rows(editor) == _contents(editor)
+
+
+def test_paste_extra_columns_are_dropped(editor):
+    editor.paste_rows([["x", "y", "лишний"]], 0, 2) # С последнего столбца: помещается одно значение
+    assert _contents(editor)[0] == ["1", "r0", "x"]
+    assert _project_rows(editor) == _contents(editor)
+
+
+def test_move_non_contiguous_selection_blocked_at_edge(editor):
+    editor._select_rows([0, 2, 3])
+    editor._move_rows(-1) # Строка 0 упирается в начало, 2 и 3 поднимаются
+    assert [row[1] for row in _contents(editor)] == ["r0", "r2", "r3", "r1", "r4"]
+    assert [row[0] for row in _contents(editor)] == ["1", "2", "3", "4", "5"] # Нумерация не переставляется
+    [operation] = editor.operations
+    assert isinstance(operation, PermuteRows) and (operation.start, operation.order) == (0, [0, 2, 3, 1])
+    assert editor._selected_rows() == [0, 1, 2]
+    editor._move_rows(-1) # Все выделенные строки уперлись: операции нет
+    assert len(editor.operations) == 1
+    assert _project_rows(editor) == _contents(editor)
+
+
+def test_move_down_stops_at_last_row(editor):
+    editor._select_rows([1, 4])
+    editor._move_rows(1)
+    assert [row[1] for row in _contents(editor)] == ["r0", "r2", "r1", "r3", "r4"]
+    assert editor._selected_rows() == [2, 4]
+    assert _project_rows(editor) == _contents(editor)
@@ -0,0 +1,32 @@
+import os
+
+from models.template_cache import TemplateCache
+
+
+def test_lru_hits_misses_and_eviction(make_template):
+    first = make_template("first.docx", ["{{A}}"]); second = make_template("second.docx", ["{{B}}"])
+    cache = TemplateCache(max_bytes=first.stat().st_size + 1)
+    try:
+        assert cache.open(first).read() == first.read_bytes()
+        assert cache.open(first).read() == first.read_bytes()
+        cache.open(second) # Лимит - один шаблон: первый вытесняется
+        cache.open(first)
+        assert {key: cache.stats()[key] for key in ('hits', 'misses', 'evictions', 'entries')} == \
+            {'hits': 1, 'misses': 3, 'evictions': 2, 'entries': 1}
+    finally:
+        cache.close()
+    assert not cache.store_dir.exists()
+
+
+def test_changed_template_gets_new_store_file(make_template):
+    template_path = make_template("t.docx", ["{{A}}"])
+    cache = TemplateCache()
+    try:
+        before = cache.publish(template_path)
+        assert cache.publish(template_path) == before
+        make_template("t.docx", ["{{A}} {{B}}"])
+        os.utime(template_path, ns=(0, template_path.stat().st_mtime_ns + 1)) # Гарантированно другое время изменения
+        after = cache.publish(template_path)
+        assert after != before and after.read_bytes() == template_path.read_bytes()
+    finally:
+        cache.close()
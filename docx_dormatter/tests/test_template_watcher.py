@@ -0,0 +1,66 @@
+from models.docx_handler import DocxHandler
+from models.project import Project
+from models.template_watcher import TemplateWatcher
+from conftest import build_template
+
+
+def _watched_project(template_path) -> tuple[Project, TemplateWatcher]:
+    project = Project(); project.template_paths = [template_path]
+    watcher = TemplateWatcher(project, DocxHandler(), debounce_seconds=0)
+    watcher.sync_templates()
+    return project, watcher
+
+
+def _rescan(watcher: TemplateWatcher, path) -> dict:
+    watcher.notify_changed(path)
+    [(changes, summary)] = watcher.process_pending(force=True)
+    return {'changes': changes, 'summary': summary}
+
+
+def test_unchanged_parts_are_not_rescanned(simple_template):
+    handler = DocxHandler()
+    first = handler.scan_template_parts(simple_template)
+    second = handler.scan_template_parts(simple_template, first)
+    assert all(second[name] is first[name] for name in first)
+    build_template(simple_template, ["{{OTHER}}"])
+    third = handler.scan_template_parts(simple_template, second)
+    assert third['word/document.xml'] is not second['word/document.xml']
+    assert third['word/document.xml']['keys'] == {'{{OTHER}}'}
+
+
+def test_rescan_diff_is_merged_into_project(simple_template, simple_keys_data):
+    project, watcher = _watched_project(simple_template)
+    project.keys_data = {key: dict(data) for key, data in simple_keys_data.items()}
+    project.keys_data['{{DATE}}']['value'] = ''
+    build_template(simple_template, ["Организация: {{ORG_NAME}}", "{{NEW_KEY}}"])
+    result = _rescan(watcher, simple_template)
+    assert result['changes']['added_keys'] == {'{{NEW_KEY}}'}
+    assert result['changes']['removed_keys'] == {'{{DATE}}', '{{ITEM_NAME}}'}
+    assert result['changes']['removed_tables'] == {'Items'}
+    # Пустой {{DATE}} удален, таблица со строками осталась
+    assert result['summary'] == {'added': 1, 'removed': 1, 'updated': 0, 'kept': 1}
+    assert set(project.keys_data) == {'{{ORG_NAME}}', '{{NEW_KEY}}', 'Items'}
+
+
+def test_keys_with_data_or_frozen_are_kept(simple_template, simple_keys_data):
+    project, watcher = _watched_project(simple_template)
+    project.keys_data = {key: dict(data) for key, data in simple_keys_data.items()}
+    project.keys_data['{{ORG_NAME}}']['is_frozen'] = True; project.keys_data['{{ORG_NAME}}']['value'] = ''
+    build_template(simple_template, ["пусто"])
+    summary = _rescan(watcher, simple_template)['summary']
+    assert summary['removed'] == 0 and summary['kept'] == 2
+    assert set(project.keys_data) == set(simple_keys_data)
+
+
+def test_unreadable_template_is_not_cached_as_empty(tmp_path, simple_keys_data):
+    template_path = tmp_path / "later.docx"
+    template_path.write_bytes(b"not a zip yet")
+    project, watcher = _watched_project(template_path)
+    project.keys_data = {key: dict(data) for key, data in simple_keys_data.items()}
+    assert watcher.cached_scan(template_path) is None
+    assert watcher.watched_paths() == [template_path]
+    build_template(template_path, ["{{ORG_NAME}} {{EXTRA}}"])
+    summary = _rescan(watcher, template_path)['summary']
+    # Первое удачное сканирование - только добавления, ничего не удаляется
+    assert summary == {'added': 1, 'removed': 0, 'updated': 0, 'kept': 0}
+    assert watcher.cached_scan(template_path)['keys'] == {'{{ORG_NAME}}', '{{EXTRA}}'}
@@ -0,0 +1,72 @@
+import docx
+import pytest
+
+from models.docx_handler import DocxHandler
+from models.validator import ERROR, WARNING, ProjectValidator, has_errors
+
+
+@pytest.fixture
+def validator():
+    return ProjectValidator(DocxHandler())
+
+
+def _codes(issues) -> dict[str, tuple]:
+    return {issue['code']: (issue['severity'], issue['key']) for issue in issues}
+
+
+def test_valid_project_has_no_issues(validator, simple_template, simple_keys_data):
+    assert validator.validate([simple_template], simple_keys_data) == []
+
+
+def test_key_issues(validator, tmp_path, make_template, simple_keys_data):
+    image_path = tmp_path / "нет.png"
+    template_path = make_template("keys.docx", ["{{ORG_NAME}} {{DATE}} {{MISSING}}", "{{LOGO}}", "{{DATE|bogus}}", "{{DYNAMIC_TABLE::Loose}}"])
+    keys_data = dict(simple_keys_data, **{'{{ORG_NAME}}': {'value': '  ', 'status': 'empty'},
+                                          '{{LOGO}}': {'type': 'image', 'value': str(image_path)}})
+    issues = validator.validate([template_path], keys_data)
+    assert _codes(issues) == {
+        'missing_key': (ERROR, '{{MISSING}}'),
+        'empty_key': (WARNING, '{{ORG_NAME}}'),
+        'missing_image': (ERROR, '{{LOGO}}'),
+        'invalid_filter': (ERROR, '{{DATE|bogus}}'),
+        'misplaced_table_marker': (ERROR, '{{DYNAMIC_TABLE::Loose}}'),
+    }
+    assert has_errors(issues)
+
+
+def test_table_issues(validator, simple_template, simple_keys_data):
+    outdated = dict(simple_keys_data, Items=dict(simple_keys_data['Items'], template_keys=['{{OLD_NAME}}']))
+    assert _codes(validator.validate([simple_template], outdated)) == {'table_keys_outdated': (ERROR, 'Items'),
+                                                                     'table_cells_empty': (WARNING, 'Items')}
+    rows = [{'{{ITEM_NAME}}': 'Сервер'}, {'{{ITEM_NAME}}': ' '}, {}]
+    [issue] = validator.validate([simple_template], dict(simple_keys_data, Items=dict(simple_keys_data['Items'], data=rows)))
+    assert issue['code'] == 'table_cells_empty' and "в 2 строках (2, 3)" in issue['message']
+    [issue] = validator.validate([simple_template], {key: data for key, data in simple_keys_data.items() if key != 'Items'})
+    assert (issue['code'], issue['key']) == ('missing_table', 'Items')
+
+
+def test_column_count_mismatch(validator, tmp_path, simple_keys_data):
+    document = docx.Document()
+    table = document.add_table(rows=2, cols=3)
+    for cell, value in zip(table.rows[1].cells, ["{{DYNAMIC_TABLE::Items}}", "{{ITEM_NAME}}", ""]): cell.text = value
+    first_row = table.rows[0]._tr
+    first_row.remove(first_row.tc_lst[-1]) # В первой строке 2 ячейки, в сетке 3
+    document.save(tmp_path / "grid.docx")
+    [issue] = validator.validate([tmp_path / "grid.docx"], simple_keys_data)
+    assert (issue['code'], issue['key']) == ('column_count_mismatch', 'Items') and "в первой строке 2 ячеек, в сетке 3" in issue['message']
+    # Сетка совпадает, но столбцов данных больше, чем ячеек в строке-шаблоне
+    wide = dict(simple_keys_data['Items'], template_keys=['{{ITEM_NAME}}', '{{ITEM_PRICE}}'])
+    codes = _codes(validator.validate([tmp_path / "grid.docx"], dict(simple_keys_data, Items=wide)))
+    assert codes['column_count_mismatch'] == (ERROR, 'Items')
+
+
+def test_scan_provider_result_is_used(simple_template, simple_keys_data, monkeypatch):
+    handler = DocxHandler()
+    monkeypatch.setattr(handler, 'scan_template_parts', lambda path: pytest.fail("шаблон сканируется повторно"))
+    requested = []
+    def scan_provider(path):
+        requested.append(path)
+        return {'keys': {'{{ORG_NAME}}', '{{CACHED}}'}, 'tables': {}}
+    issues = ProjectValidator(handler, scan_provider=scan_provider).validate([simple_template], simple_keys_data)
+    assert requested == [simple_template]
+    assert _codes(issues) == {'missing_key': (ERROR, '{{CACHED}}')}
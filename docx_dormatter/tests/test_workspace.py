@@ -0,0 +1,50 @@
+import pytest
+
+from models.project import Project
+from models.workspace import WorkspaceBuild, build_workspace, discover_projects
+from conftest import document_text
+
+
+def _write_project(path, template_paths, keys_data, output_path=None):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    Project.write_project_file(path, {"version": "1.0", "template_paths": [str(p) for p in template_paths],
+                                      "output_path": str(output_path) if output_path else None, "keys_data": keys_data})
+    return path
+
+
+@pytest.fixture
+def shared_template(make_template):
+    return make_template("shared.docx", ["Организация: {{ORG_NAME}}"])
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_shared_template_built_for_each_project(tmp_path, shared_template, simple_keys_data, workers):
+    other_keys = dict(simple_keys_data, **{'{{ORG_NAME}}': {'value': 'ООО Лютик', 'status': 'filled'}})
+    _write_project(tmp_path / "projects" / "a.dfp", [shared_template], simple_keys_data)
+    _write_project(tmp_path / "projects" / "nested" / "b.dfp", [shared_template], other_keys)
+    assert [path.name for path in discover_projects([tmp_path / "projects", tmp_path / "projects" / "a.dfp"])] == ["a.dfp", "b.dfp"]
+    summary = build_workspace([tmp_path / "projects"], output_root=tmp_path / "out", workers=workers)
+    assert (summary['templates'], summary['template_uses'], summary['renders']) == (1, 2, 2)
+    assert (summary['success'], summary['errors']) == (2, 0)
+    assert document_text(tmp_path / "out" / "a" / "shared_gen.docx") == ["Организация: ООО Ромашка"]
+    assert document_text(tmp_path / "out" / "b" / "shared_gen.docx") == ["Организация: ООО Лютик"]
+
+
+def test_duplicate_and_broken_templates(tmp_path, shared_template, make_template, simple_keys_data):
+    broken = tmp_path / "broken.docx"; broken.write_bytes(b"not a zip")
+    (tmp_path / "other").mkdir()
+    same_name = make_template("other/shared.docx", ["{{DATE}}"])
+    project_path = _write_project(tmp_path / "p.dfp", [shared_template, shared_template, same_name, broken], simple_keys_data)
+    summary = WorkspaceBuild([project_path], output_root=tmp_path / "out", validate=False).run()
+    # Повтор шаблона генерируется один раз; одноименный шаблон и нечитаемый шаблон - ошибки проекта
+    assert summary['renders'] == 1
+    assert summary['projects'][str(project_path)] == {'success': 1, 'errors': 2}
+    assert summary['broken_templates'] == [str(broken.resolve())]
+    assert {entry['template'] for entry in summary['failed']} == {str(same_name.resolve()), str(broken.resolve())}
+
+
+def test_projects_writing_the_same_file(tmp_path, shared_template, simple_keys_data):
+    first = _write_project(tmp_path / "a.dfp", [shared_template], simple_keys_data, output_path=tmp_path / "out")
+    second = _write_project(tmp_path / "b.dfp", [shared_template], simple_keys_data, output_path=tmp_path / "out")
+    summary = build_workspace([first, second], validate=False)
+    assert summary['projects'] == {str(first): {'success': 1, 'errors': 0}, str(second): {'success': 0, 'errors': 1}}
@@ -0,0 +1,107 @@
+from bisect import bisect_left
+
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex
+from PySide6.QtGui import QColor
+
+from models.key_index import KeyIndex
+
+
+class KeysListModel(QAbstractListModel):
+    """
+    Модель списка ключей и таблиц для QListView.
+    Изменения keys_data применяются инкрементально (вставка/удаление/обновление строк),
+    поиск и фильтр по статусу выполняются через KeyIndex.
+    """
+    KeyIdRole = Qt.ItemDataRole.UserRole
+    TABLE_PREFIX = "[ТАБЛИЦА] "
+    BULK_UPDATE_THRESHOLD = 100
+    _STATUS_COLORS = {'filled': QColor('green'), 'empty': QColor('darkorange')}
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._index = KeyIndex()
+        self._visible: list[str] = [] # key_id видимых строк, отсортированы
+        self._filter_text = ''
+        self._filter_status = 'all'
+
+    # --- Интерфейс QAbstractListModel ---
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._visible)
+
+    def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._visible): return None
+        key_id = self._visible[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return f"{self.TABLE_PREFIX}{key_id}" if self._index.is_table(key_id) else key_id
+        if role == self.KeyIdRole:
+            return key_id
+        if role == Qt.ItemDataRole.ForegroundRole and not self._index.is_table(key_id):
+            if self._index.matches_status(key_id, 'is_frozen'): return QColor('gray')
+            for status, color in self._STATUS_COLORS.items():
+                if self._index.matches_status(key_id, status): return color
+        return None
+
+    # --- Вспомогательные методы ---
+    def key_id_at(self, row: int) -> str | None:
+        return self._visible[row] if 0 <= row < len(self._visible) else None
+
+    def index_of_key(self, key_id: str) -> QModelIndex:
+        pos = bisect_left(self._visible, key_id)
+        if pos < len(self._visible) and self._visible[pos] == key_id: return self.index(pos, 0)
+        return QModelIndex()
+
+    def is_table(self, key_id: str) -> bool:
+        return self._index.is_table(key_id)
+
+    def _insert_visible(self, key_id: str):
+        pos = bisect_left(self._visible, key_id)
+        if pos < len(self._visible) and self._visible[pos] == key_id: return
+        self.beginInsertRows(QModelIndex(), pos, pos)
+        self._visible.insert(pos, key_id)
+        self.endInsertRows()
+
+    def _remove_visible(self, key_id: str):
+        pos = bisect_left(self._visible, key_id)
+        if pos >= len(self._visible) or self._visible[pos] != key_id: return
+        self.beginRemoveRows(QModelIndex(), pos, pos)
+        del self._visible[pos]
+        self.endRemoveRows()
+
+    # --- Обновление данных ---
+    def update_key(self, key_id: str, data: dict | None):
+        """
+        Применяет изменение одного элемента keys_data.
+        Уже видимая строка не скрывается при смене статуса, чтобы не терять
+        выделение во время редактирования; фильтр пересчитается при его смене.
+        """
+        if data is None:
+            self._index.remove(key_id); self._remove_visible(key_id); return
+        self._index.upsert(key_id, data)
+        model_index = self.index_of_key(key_id)
+        if model_index.isValid():
+            self.dataChanged.emit(model_index, model_index, [Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.ForegroundRole])
+        elif self._index.matches(key_id, self._filter_text, self._filter_status):
+            self._insert_visible(key_id)
+
+    def sync(self, keys_data: dict):
+        """Приводит модель к содержимому keys_data: удаляет исчезнувшие, добавляет новые, обновляет статусы."""
+        removed_ids = self._index.key_ids() - keys_data.keys()
+        new_count = sum(1 for key_id in keys_data if key_id not in self._index)
+        if len(removed_ids) + new_count > self.BULK_UPDATE_THRESHOLD:
+            # Массовое изменение (открытие проекта): один сброс модели вместо тысяч вставок/удалений
+            for key_id in removed_ids: self._index.remove(key_id)
+            for key_id, data in keys_data.items(): self._index.upsert(key_id, data)
+            self.set_filter(self._filter_text, self._filter_status)
+            return
+        for key_id in removed_ids:
+            self.update_key(key_id, None)
+        for key_id, data in keys_data.items():
+            self.update_key(key_id, data)
+
+    def set_filter(self, text: str = '', status: str = 'all'):
+        """Задает строку поиска и фильтр статуса; список строк пересчитывается по индексу."""
+        self._filter_text = text
+        self._filter_status = status if status in KeyIndex.STATUS_FILTERS else 'all'
+        self.beginResetModel()
+        self._visible = self._index.search(self._filter_text, self._filter_status)
+        self.endResetModel()
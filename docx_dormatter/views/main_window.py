@@ -5,43 +5,103 @@ from pathlib import Path
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QLabel, QMenuBar, QStatusBar, QFileDialog, QMessageBox,
-    QListWidget, QSplitter, QListWidgetItem
+    QListView, QSplitter, QInputDialog, QLineEdit, QComboBox, QProgressDialog
 )
 from PySide6.QtGui import QAction, QKeySequence, QCloseEvent
-from PySide6.QtCore import Qt, Slot
+from PySide6.QtCore import Qt, Slot, Signal, QObject, QModelIndex, QFileSystemWatcher, QTimer, QSettings, QDateTime
 
 from models.project import Project
-from models.docx_handler import DocxHandler
-from views.simple_key_editor import SimpleKeyEditorWidget
-from views.table_editor import TableEditorWidget
+from models.exporter import ProjectExporter
+from models.template_watcher import TemplateWatcher
+from models.autosave import AutosaveWorker
+from models.validator import ProjectValidator, format_issue, has_errors, summarize_issues
+from models.history import EditHistory
+from models import profiling
+from views.keys_list_model import KeysListModel
+# DocxHandler (python-docx, lxml) и редакторы импортируются при первом обращении - окно появляется раньше
+
+class _AutosaveNotifier(QObject):
+    """Переносит уведомления AutosaveWorker из фонового потока в поток интерфейса."""
+    finished = Signal(str, int, bool, str)
 
 class MainWindow(QMainWindow):
     """
     Главное окно приложения.
     (Версия 7.1: Исправлена активация кнопки генерации)
     """
+    AUTOSAVE_DEFAULT_INTERVAL_SEC = 60
+    GENERATE_PROGRESS_SCALE = 1000 # Делений индикатора на один шаблон
     def __init__(self, parent=None):
         # ... (код __init__ без изменений) ...
         super().__init__(parent)
-        self.project = Project(); self.docx_handler = DocxHandler()
+        self.project = Project()
+        self._docx_handler = None; self._template_watcher = None
+        self._simple_key_editor = None; self._table_editor = None
         self.setWindowTitle(self._build_window_title()); self.resize(1100, 750)
         self._central_widget = QSplitter(Qt.Orientation.Horizontal); self.setCentralWidget(self._central_widget)
         left_panel = QWidget(); left_layout = QVBoxLayout(left_panel)
         left_layout.addWidget(QLabel("Найденные ключи и таблицы:"))
-        self.keys_list_widget = QListWidget(); self.keys_list_widget.currentItemChanged.connect(self._on_key_selected)
-        left_layout.addWidget(self.keys_list_widget); self._central_widget.addWidget(left_panel)
+        filter_layout = QHBoxLayout()
+        self.key_search_edit = QLineEdit(); self.key_search_edit.setPlaceholderText("Поиск ключа..."); self.key_search_edit.setClearButtonEnabled(True)
+        self.key_search_edit.textChanged.connect(self._on_keys_filter_changed); filter_layout.addWidget(self.key_search_edit, 1)
+        self.key_status_combo = QComboBox()
+        for status_label, status in (("Все", 'all'), ("Пустые", 'empty'), ("Заполненные", 'filled'), ("Замороженные", 'is_frozen'), ("Таблицы", 'table')):
+            self.key_status_combo.addItem(status_label, status)
+        self.key_status_combo.currentIndexChanged.connect(self._on_keys_filter_changed); filter_layout.addWidget(self.key_status_combo)
+        left_layout.addLayout(filter_layout)
+        self.keys_list_model = KeysListModel(self)
+        self.keys_list_view = QListView(); self.keys_list_view.setModel(self.keys_list_model); self.keys_list_view.setUniformItemSizes(True)
+        self.keys_list_view.selectionModel().currentChanged.connect(self._on_key_selected)
+        left_layout.addWidget(self.keys_list_view); self._central_widget.addWidget(left_panel)
         right_panel = QWidget(); self.editor_layout = QVBoxLayout(right_panel)
         self.editor_layout.setContentsMargins(5, 0, 0, 0)
-        self.simple_key_editor = SimpleKeyEditorWidget(); self.simple_key_editor.data_changed.connect(self._on_editor_data_changed)
-        self.editor_layout.addWidget(self.simple_key_editor)
-        self.table_editor = TableEditorWidget(); self.table_editor.data_changed.connect(self._on_editor_data_changed)
-        self.editor_layout.addWidget(self.table_editor)
         self.editor_layout.addStretch(1); self._central_widget.addWidget(right_panel)
         self._central_widget.setSizes([350, 750])
+        self._file_watcher = QFileSystemWatcher(self); self._file_watcher.fileChanged.connect(self._on_template_file_changed)
+        self._template_rescan_timer = QTimer(self); self._template_rescan_timer.setSingleShot(True)
+        self._template_rescan_timer.setInterval(int(TemplateWatcher.DEBOUNCE_SECONDS * 1000)); self._template_rescan_timer.timeout.connect(self._on_templates_rescan)
+        self._settings = QSettings("DocxFormatter", "DocxGenerator")
+        self.history = EditHistory(max_bytes=self._settings.value("history/max_mb", 16, type=int) * 1024 * 1024)
+        self._autosave_notifier = _AutosaveNotifier(self); self._autosave_notifier.finished.connect(self._on_autosave_finished)
+        self.autosave_worker = AutosaveWorker(on_finished=lambda path, rev, ok, err: self._autosave_notifier.finished.emit(str(path), rev, ok, err))
+        self._autosave_timer = QTimer(self); self._autosave_timer.timeout.connect(self._on_autosave_timer)
         self._create_menus(); self.setStatusBar(QStatusBar(self)); self.statusBar().showMessage("Приложение готово.")
+        self.autosave_status_label = QLabel(); self.statusBar().addPermanentWidget(self.autosave_status_label)
+        self._apply_autosave_settings()
         self._update_ui_state()
 
 
+    @property
+    def docx_handler(self):
+        if self._docx_handler is None:
+            from models.docx_handler import DocxHandler
+            self._docx_handler = DocxHandler()
+        return self._docx_handler
+    @property
+    def template_watcher(self) -> TemplateWatcher:
+        if self._template_watcher is None: self._template_watcher = TemplateWatcher(self.project, self.docx_handler)
+        return self._template_watcher
+    def _add_editor(self, editor):
+        editor.edit_operation.connect(self._on_edit_operation)
+        self.editor_layout.insertWidget(self.editor_layout.count() - 1, editor) # Перед растяжкой
+        return editor
+    @property
+    def simple_key_editor(self):
+        if self._simple_key_editor is None:
+            from views.simple_key_editor import SimpleKeyEditorWidget
+            self._simple_key_editor = self._add_editor(SimpleKeyEditorWidget())
+        return self._simple_key_editor
+    @property
+    def table_editor(self):
+        if self._table_editor is None:
+            from views.table_editor import TableEditorWidget
+            self._table_editor = self._add_editor(TableEditorWidget())
+        return self._table_editor
+    def _created_editors(self) -> list:
+        """Уже созданные редакторы (обращение к ним не создает новых виджетов)."""
+        return [editor for editor in (self._simple_key_editor, self._table_editor) if editor is not None]
+    def _clear_editors(self):
+        for editor in self._created_editors(): editor.clear_editor()
     def _build_window_title(self) -> str:
         base_title = "Генератор документов DOCX"; project_name = self.project.get_project_filename()
         modified_marker = "*" if self.project.is_modified else ""; return f"{project_name}{modified_marker} - {base_title}"
@@ -64,6 +124,10 @@ class MainWindow(QMainWindow):
         # Активируем генерацию, если есть шаблоны (путь проверим при нажатии)
         self.generate_docs_action.setEnabled(bool(self.project.template_paths))
         # -----------------------
+        self.export_data_action.setEnabled(bool(self.project.keys_data))
+        undo_text = self.history.undo_description(); redo_text = self.history.redo_description()
+        self.undo_action.setEnabled(undo_text is not None); self.undo_action.setText(f"&Отменить {undo_text}" if undo_text else "&Отменить")
+        self.redo_action.setEnabled(redo_text is not None); self.redo_action.setText(f"&Повторить {redo_text}" if redo_text else "&Повторить")
 
         self._update_window_title()
 
@@ -79,13 +143,31 @@ class MainWindow(QMainWindow):
         self.save_project_as_action = QAction("Сохранить проект &как...", self); self.save_project_as_action.setShortcut(QKeySequence.StandardKey.SaveAs)
         self.save_project_as_action.triggered.connect(self._on_save_project_as); file_menu.addAction(self.save_project_as_action)
         file_menu.addSeparator()
+        self.autosave_action = QAction("Авто&сохранение", self); self.autosave_action.setCheckable(True)
+        self.autosave_action.setChecked(self._settings.value("autosave/enabled", True, type=bool))
+        self.autosave_action.toggled.connect(self._on_autosave_toggled); file_menu.addAction(self.autosave_action)
+        autosave_interval_action = QAction("Интервал автосохранения...", self); autosave_interval_action.triggered.connect(self._on_autosave_interval)
+        file_menu.addAction(autosave_interval_action)
+        file_menu.addSeparator()
         exit_action = QAction("&Выход", self); exit_action.setShortcut(QKeySequence.StandardKey.Quit)
         exit_action.triggered.connect(self.close); file_menu.addAction(exit_action)
+        edit_menu = menu_bar.addMenu("&Правка")
+        self.undo_action = QAction("&Отменить", self); self.undo_action.setShortcut(QKeySequence.StandardKey.Undo)
+        self.undo_action.triggered.connect(self._on_undo); edit_menu.addAction(self.undo_action)
+        self.redo_action = QAction("&Повторить", self); self.redo_action.setShortcut(QKeySequence.StandardKey.Redo)
+        self.redo_action.triggered.connect(self._on_redo); edit_menu.addAction(self.redo_action)
         project_menu = menu_bar.addMenu("&Проект")
         self.add_template_action = QAction("Добавить &шаблон...", self); self.add_template_action.triggered.connect(self._on_add_template)
         project_menu.addAction(self.add_template_action)
         self.generate_docs_action = QAction("&Сгенерировать документы...", self); self.generate_docs_action.triggered.connect(self._on_generate_docs)
         project_menu.addAction(self.generate_docs_action)
+        self.export_data_action = QAction("&Экспорт данных...", self); self.export_data_action.triggered.connect(self._on_export_data)
+        project_menu.addAction(self.export_data_action)
+        project_menu.addSeparator()
+        self.profiling_action = QAction("&Профилирование", self); self.profiling_action.setCheckable(True)
+        self.profiling_action.setToolTip("Записывать профили загрузки, сохранения, сканирования и генерации")
+        self.profiling_action.toggled.connect(self._on_profiling_toggled); project_menu.addAction(self.profiling_action)
+        self.profiling_action.setChecked(self._settings.value("profiling/enabled", False, type=bool))
         help_menu = menu_bar.addMenu("&Справка"); about_action = QAction("&О программе", self)
         # about_action.triggered.connect(self._on_about)
         help_menu.addAction(about_action)
@@ -101,8 +183,8 @@ class MainWindow(QMainWindow):
     @Slot()
     def _on_new_project(self):
         if not self._check_unsaved_changes(): return
-        self.project.reset(); self.statusBar().showMessage("Создан новый пустой проект.")
-        self.keys_list_widget.clear(); self.simple_key_editor.clear_editor(); self.table_editor.clear_editor()
+        self.project.reset(); self.history.clear(); self._sync_template_watch(); self.statusBar().showMessage("Создан новый пустой проект.")
+        self.keys_list_model.sync(self.project.keys_data); self._clear_editors()
         self._update_ui_state(); print("Действие: Новый проект")
     @Slot()
     def _on_open_project(self):
@@ -110,17 +192,18 @@ class MainWindow(QMainWindow):
         start_dir = str(self.project.filepath.parent) if self.project.filepath else str(Path.home())
         ff = "Проекты DocxFormatter (*.dfp);;Все файлы (*)"; fp_str, _ = QFileDialog.getOpenFileName(self, "Открыть проект", start_dir, ff)
         if fp_str:
-            self.simple_key_editor.clear_editor(); self.table_editor.clear_editor()
+            self._clear_editors(); self.history.clear()
             if self.project.load(fp_str):
                 self.statusBar().showMessage(f"Проект '{self.project.get_project_filename()}' загружен.")
-                self._update_keys_list_widget()
-            else: QMessageBox.warning(self, "Ошибка загрузки", f"... {fp_str}"); self.statusBar().showMessage("Ошибка ...") ; self.keys_list_widget.clear()
+                self._update_keys_list()
+            else: QMessageBox.warning(self, "Ошибка загрузки", f"... {fp_str}"); self.statusBar().showMessage("Ошибка ...") ; self._update_keys_list()
+            self._sync_template_watch()
             self._update_ui_state(); print(f"Действие: Открыть проект - {fp_str}")
         else: self.statusBar().showMessage("Открытие проекта отменено.")
     @Slot()
     def _on_save_project(self) -> bool:
         if not self.project.filepath: return self._on_save_project_as()
-        if self.project.save(): self.statusBar().showMessage(f"Проект сохранен в '{self.project.filepath.name}'."); self._update_ui_state(); print(f"Д: Сохранить - {self.project.filepath}"); return True
+        if self.autosave_worker.save_project(self.project): self.statusBar().showMessage(f"Проект сохранен в '{self.project.filepath.name}'."); self._update_ui_state(); print(f"Д: Сохранить - {self.project.filepath}"); return True
         else: QMessageBox.critical(self, "Ошибка сохранения", f"... {self.project.filepath}"); self.statusBar().showMessage("Ошибка ..."); return False
     @Slot()
     def _on_save_project_as(self) -> bool:
@@ -128,7 +211,7 @@ class MainWindow(QMainWindow):
         start_fn = self.project.filepath.name if self.project.filepath else "Новый проект.dfp"; start_path = str(Path(start_dir) / start_fn)
         ff = "Проекты DocxFormatter (*.dfp);;Все файлы (*)"; fp_str, _ = QFileDialog.getSaveFileName(self, "Сохранить проект как...", start_path, ff)
         if fp_str:
-            if self.project.save(fp_str): self.statusBar().showMessage(f"Проект сохранен как '{self.project.filepath.name}'."); self._update_ui_state(); print(f"Д: Сохранить как - {fp_str}"); return True
+            if self.autosave_worker.save_project(self.project, fp_str): self.statusBar().showMessage(f"Проект сохранен как '{self.project.filepath.name}'."); self._update_ui_state(); print(f"Д: Сохранить как - {fp_str}"); return True
             else: QMessageBox.critical(self, "Ошибка сохранения", f"... {fp_str}"); self.statusBar().showMessage("Ошибка ..."); return False
         else: self.statusBar().showMessage("Сохранение отменено."); return False
     @Slot()
@@ -149,41 +232,57 @@ class MainWindow(QMainWindow):
                     for table_id, table_info in found_tables_info.items():
                          if table_id not in self.project.keys_data: self.project.add_found_table(table_id, table_info.get('template_keys')); tables_added += 1
                 self.statusBar().showMessage(f"Шаблон '{template_path.name}' добавлен. Новых ключей: {keys_added}, таблиц: {tables_added}.")
-                self._update_keys_list_widget(); self._update_ui_state(); print(f"Д: Добавить шаблон - {fp_str}")
+                self._sync_template_watch(); self._update_keys_list(); self._update_ui_state(); print(f"Д: Добавить шаблон - {fp_str}")
             else: QMessageBox.warning(self, "Ошибка", f"... {fp_str} ..."); self.statusBar().showMessage("Ошибка ...")
         else: self.statusBar().showMessage("Добавление шаблона отменено.")
-    def _update_keys_list_widget(self):
-        current_selection = self.keys_list_widget.currentItem(); current_text = current_selection.text() if current_selection else None
-        self.keys_list_widget.clear();
-        if not self.project.keys_data: return
-        sorted_key_ids = sorted(self.project.keys_data.keys()); item_to_select = None
-        for key_id in sorted_key_ids:
-            item_text = key_id; key_info = self.project.keys_data[key_id]
-            if key_info.get('type') == 'dynamic_table': item_text = f"[ТАБЛИЦА] {key_id}"
-            list_item = QListWidgetItem(item_text); list_item.setData(Qt.ItemDataRole.UserRole, key_id)
-            self.keys_list_widget.addItem(list_item)
-            if item_text == current_text: item_to_select = list_item
-        if item_to_select: self.keys_list_widget.setCurrentItem(item_to_select)
+    def _update_keys_list(self):
+        """Инкрементально синхронизирует список ключей с keys_data (выделение сохраняется моделью)."""
+        self.keys_list_model.sync(self.project.keys_data)
+        current = self.keys_list_view.currentIndex()
+        if current.isValid(): self._on_key_selected(current, QModelIndex())
+    @Slot()
+    def _on_keys_filter_changed(self):
+        current_key_id = self.keys_list_view.currentIndex().data(KeysListModel.KeyIdRole)
+        self.keys_list_model.set_filter(self.key_search_edit.text(), self.key_status_combo.currentData())
+        if current_key_id:
+            index = self.keys_list_model.index_of_key(current_key_id)
+            if index.isValid(): self.keys_list_view.setCurrentIndex(index)
+    @Slot(QModelIndex, QModelIndex)
+    def _on_key_selected(self, current: QModelIndex, previous: QModelIndex):
+        key_id = current.data(KeysListModel.KeyIdRole) if current.isValid() else None
+        shown_ids = [self._simple_key_editor.get_current_key_id()] if self._simple_key_editor is not None and not self._simple_key_editor.isHidden() else []
+        if self._table_editor is not None and not self._table_editor.isHidden(): shown_ids.append(self._table_editor.get_current_table_id())
+        if key_id and key_id in shown_ids:
+            return # Та же строка после пересчета фильтра - редактор не перезагружаем
+        for editor in self._created_editors(): editor.setVisible(False)
+        if key_id:
+            key_data = self.project.get_key_data(key_id)
+            if self.keys_list_model.is_table(key_id): print(f"Выбрана таблица: {key_id}"); self.table_editor.set_table_data(key_id, key_data); self.statusBar().showMessage(f"Выбрана таблица: {key_id}")
+            else: print(f"Выбран ключ: {key_id}"); self.simple_key_editor.set_key_data(key_id, key_data); self.statusBar().showMessage(f"Выбран ключ: {key_id}")
+        else: self._clear_editors(); self.statusBar().showMessage("Ключ не выбран.")
+    @Slot(object)
+    def _on_edit_operation(self, operation):
+        """Правка из редактора: применяется к проекту точечно и записывается в историю отмены."""
+        if not operation.apply(self.project): return
+        self.history.record(operation)
+        self.keys_list_model.update_key(operation.key_id, self.project.get_key_data(operation.key_id)); self._update_ui_state()
+    def _after_history_step(self, operation, action: str):
+        """Обновляет список и показывает затронутый элемент в редакторе после отмены/повтора."""
+        if operation is None: return
+        key_id = operation.key_id; key_data = self.project.get_key_data(key_id)
+        self.keys_list_model.update_key(key_id, key_data)
+        index = self.keys_list_model.index_of_key(key_id)
+        if index.isValid() and self.keys_list_view.currentIndex() != index: self.keys_list_view.setCurrentIndex(index) # Редактор загрузится в _on_key_selected
+        else:
+            # Скрываются только созданные редакторы: обращение к свойству создало бы ненужный виджет
+            for editor in self._created_editors(): editor.setVisible(False)
+            if self.keys_list_model.is_table(key_id): self.table_editor.set_table_data(key_id, key_data)
+            else: self.simple_key_editor.set_key_data(key_id, key_data)
+        self.statusBar().showMessage(f"{action}: {operation.description} {key_id}"); self._update_ui_state()
     @Slot()
-    def _on_key_selected(self, current_item: QListWidgetItem | None, previous_item: QListWidgetItem | None):
-        self.simple_key_editor.setVisible(False); self.table_editor.setVisible(False)
-        if current_item:
-            item_text = current_item.text(); key_id = current_item.data(Qt.ItemDataRole.UserRole)
-            is_table = item_text.startswith("[ТАБЛИЦА]")
-            if key_id:
-                key_data = self.project.get_key_data(key_id)
-                if is_table: print(f"Выбрана таблица: {key_id}"); self.table_editor.set_table_data(key_id, key_data); self.statusBar().showMessage(f"Выбрана таблица: {key_id}")
-                else: print(f"Выбран ключ: {key_id}"); self.simple_key_editor.set_key_data(key_id, key_data); self.statusBar().showMessage(f"Выбран ключ: {key_id}")
-            else: self.statusBar().showMessage("Ошибка: ID ...")
-        else: self.simple_key_editor.clear_editor(); self.table_editor.clear_editor(); self.statusBar().showMessage("Ключ не выбран.")
+    def _on_undo(self): self._after_history_step(self.history.undo(self.project), "Отменено")
     @Slot()
-    def _on_editor_data_changed(self):
-        if self.simple_key_editor.isVisible():
-            key_id = self.simple_key_editor.get_current_key_id()
-            if key_id: edited_data = self.simple_key_editor.get_edited_data(); self.project.update_key_data(key_id, edited_data); self._update_ui_state(); print(f"Данные ключа '{key_id}' обновлены.")
-        elif self.table_editor.isVisible():
-            table_id = self.table_editor.get_current_table_id()
-            if table_id: edited_data = self.table_editor.get_edited_data(); self.project.update_key_data(table_id, edited_data); self._update_ui_state(); print(f"Данные таблицы '{table_id}' обновлены.")
+    def _on_redo(self): self._after_history_step(self.history.redo(self.project), "Повторено")
     @Slot()
     def _on_generate_docs(self):
         print("Действие: Сгенерировать документы")
@@ -199,20 +298,125 @@ class MainWindow(QMainWindow):
              reply = QMessageBox.question(self, "Сохранить?", "...", QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, QMessageBox.StandardButton.Yes)
              if reply == QMessageBox.StandardButton.Yes:
                  if not self._on_save_project(): self.statusBar().showMessage("Генерация отменена ..."); return
+        if not self._confirm_validation(): self.statusBar().showMessage("Генерация отменена: исправьте ошибки проекта"); return
         output_dir = self.project.output_path; keys_data = self.project.get_all_keys_data()
-        success_count = 0; error_count = 0
-        self.statusBar().showMessage("Начало генерации..."); QApplication.processEvents()
-        for template_path in self.project.template_paths:
+        success_count = 0; error_count = 0; cancelled = False
+        self.statusBar().showMessage("Начало генерации...")
+        template_count = len(self.project.template_paths)
+        progress = QProgressDialog("Начало генерации...", "Отмена", 0, template_count * self.GENERATE_PROGRESS_SCALE, self)
+        progress.setWindowTitle("Генерация документов"); progress.setWindowModality(Qt.WindowModality.WindowModal); progress.setMinimumDuration(300)
+        for template_idx, template_path in enumerate(self.project.template_paths):
             output_filename = f"{template_path.stem}_gen{template_path.suffix}"; output_filepath = output_dir / output_filename
-            self.statusBar().showMessage(f"Генерация '{output_filename}'..."); QApplication.processEvents()
-            if self.docx_handler.generate_document(template_path, output_filepath, keys_data): success_count += 1
-            else: error_count += 1
+            self.statusBar().showMessage(f"Генерация '{output_filename}'...")
+            events = self.docx_handler.iter_generate_document(template_path, output_filepath, keys_data)
+            part_index = 0; part_total = 1; last_event = None
+            with profiling.capture(f"generate_{template_path.stem}"):
+                for last_event in events:
+                    event = last_event['event']
+                    if event == 'part': part_index, part_total = last_event['index'] - 1, last_event['total']
+                    elif event == 'table_row': progress.setLabelText(f"{output_filename}: таблица '{last_event['table_id']}', строка {last_event['row']} из {last_event['total']}")
+                    elif event == 'paragraphs':
+                        progress.setLabelText(f"{output_filename}: абзацы {last_event['done']} из {last_event['total']}")
+                        fraction = (part_index + last_event['done'] / max(last_event['total'], 1)) / part_total
+                        progress.setValue(int((template_idx + fraction) * self.GENERATE_PROGRESS_SCALE))
+                    QApplication.processEvents()
+                    if progress.wasCanceled() and event != 'saved': events.close(); cancelled = True; break # Отмена посреди документа
+            # Отмена после события 'saved' не трогает уже сохраненный документ - он засчитывается
+            if last_event is not None and last_event['event'] == 'saved': success_count += 1
+            elif not cancelled: error_count += 1
+            if cancelled or progress.wasCanceled(): cancelled = True; break
+            progress.setValue((template_idx + 1) * self.GENERATE_PROGRESS_SCALE)
+        progress.close()
         final_message = f"Генерация завершена. Успешно: {success_count}"
+        session = profiling.active_session(); profile_note = f" Профили: {session.output_dir}" if session is not None else ""
+        if cancelled:
+            final_message = f"Генерация отменена. Успешно: {success_count}"
+            self.statusBar().showMessage(final_message + profile_note); return
         if error_count > 0: final_message += f", Ошибки: {error_count}"; QMessageBox.warning(self, "...", final_message + "\n...")
         else: QMessageBox.information(self, "Генерация завершена", final_message)
-        self.statusBar().showMessage(final_message)
+        self.statusBar().showMessage(final_message + profile_note)
+    def _confirm_validation(self) -> bool:
+        """Быстрая проверка проекта по кэшированным результатам сканирования; True - продолжать генерацию."""
+        self.template_watcher.sync_templates()
+        validator = ProjectValidator(self.docx_handler, scan_provider=self.template_watcher.cached_scan)
+        issues, elapsed_ms = validator.timed_validate(self.project.template_paths, self.project.get_all_keys_data())
+        print(f"Проверка проекта: {summarize_issues(issues)} ({elapsed_ms:.0f} мс)")
+        if not issues: return True
+        errors = has_errors(issues)
+        box = QMessageBox(QMessageBox.Icon.Warning if errors else QMessageBox.Icon.Information, "Проверка проекта",
+                          f"Перед генерацией найдены проблемы ({summarize_issues(issues)}).\nПродолжить генерацию?", parent=self)
+        box.setDetailedText("\n".join(format_issue(issue) for issue in issues))
+        box.setStandardButtons(QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+        # При ошибках по умолчанию - прервать: документы заведомо получатся неверными
+        box.setDefaultButton(QMessageBox.StandardButton.No if errors else QMessageBox.StandardButton.Yes)
+        return box.exec() == QMessageBox.StandardButton.Yes
+    def _sync_template_watch(self):
+        """Приводит набор отслеживаемых шаблонов к project.template_paths."""
+        if self._template_watcher is None and not self.project.template_paths: return # Не загружаем python-docx без шаблонов
+        self.template_watcher.sync_templates()
+        watched = set(self._file_watcher.files()); wanted = {str(p) for p in self.template_watcher.watched_paths()}
+        if watched - wanted: self._file_watcher.removePaths(list(watched - wanted))
+        missing = [p for p in wanted - watched if Path(p).exists()]
+        if missing: self._file_watcher.addPaths(missing)
+    @Slot(str)
+    def _on_template_file_changed(self, path_str: str):
+        self.template_watcher.notify_changed(Path(path_str)); self._template_rescan_timer.start() # Перезапуск таймера = debounce
+    @Slot()
+    def _on_templates_rescan(self):
+        results = self.template_watcher.process_pending(force=True)
+        # Word сохраняет через замену файла - путь выпадает из QFileSystemWatcher, возвращаем его
+        self._sync_template_watch()
+        changed = [(changes, summary) for changes, summary in results if any(summary.values())]
+        if not changed: return
+        self._update_keys_list(); self._update_ui_state()
+        names = ", ".join(changes['path'].name for changes, _ in changed)
+        added = sum(s['added'] for _, s in changed); removed = sum(s['removed'] for _, s in changed); updated = sum(s['updated'] for _, s in changed); kept = sum(s['kept'] for _, s in changed)
+        self.statusBar().showMessage(f"Шаблоны изменены ({names}): добавлено {added}, удалено {removed}, обновлено {updated}, оставлено с данными {kept}.")
+    @Slot()
+    def _on_export_data(self):
+        print("Действие: Экспорт данных")
+        fmt, ok = QInputDialog.getItem(self, "Экспорт данных", "Формат:", list(ProjectExporter.FORMATS), 0, False)
+        if not ok: self.statusBar().showMessage("Экспорт отменен."); return
+        start_dir = str(self.project.filepath.parent) if self.project.filepath else str(Path.home())
+        dir_path_str = QFileDialog.getExistingDirectory(self, "Выберите папку для экспорта", start_dir)
+        if not dir_path_str: self.statusBar().showMessage("Экспорт отменен."); return
+        try: stats = ProjectExporter(fmt).export(self.project.keys_data.items(), Path(dir_path_str))
+        except OSError as e: QMessageBox.critical(self, "Ошибка экспорта", f"{e}"); self.statusBar().showMessage("Ошибка экспорта."); return
+        self.statusBar().showMessage(f"Экспорт завершен. Ключей: {stats['keys']}, таблиц: {len(stats['tables'])}.")
+    def _apply_autosave_settings(self):
+        interval_sec = self._settings.value("autosave/interval_sec", self.AUTOSAVE_DEFAULT_INTERVAL_SEC, type=int)
+        self._autosave_timer.setInterval(max(1, interval_sec) * 1000)
+        if self.autosave_action.isChecked(): self._autosave_timer.start(); self.autosave_status_label.setText(f"Автосохранение: каждые {interval_sec} с")
+        else: self._autosave_timer.stop(); self.autosave_status_label.setText("Автосохранение: выкл.")
+    @Slot(bool)
+    def _on_autosave_toggled(self, checked: bool):
+        self._settings.setValue("autosave/enabled", checked); self._apply_autosave_settings()
+    @Slot(bool)
+    def _on_profiling_toggled(self, checked: bool):
+        """Профили пишутся в папку из настроек (profiling/dir), по умолчанию ~/docx_dormatter_profiles."""
+        self._settings.setValue("profiling/enabled", checked)
+        if not checked: profiling.disable(); self.statusBar().showMessage("Профилирование выключено."); return
+        profile_dir = Path(self._settings.value("profiling/dir", str(Path.home() / "docx_dormatter_profiles"), type=str))
+        profiling.enable(profile_dir); self.statusBar().showMessage(f"Профилирование включено, отчеты: {profile_dir}")
+    @Slot()
+    def _on_autosave_interval(self):
+        current = self._settings.value("autosave/interval_sec", self.AUTOSAVE_DEFAULT_INTERVAL_SEC, type=int)
+        interval_sec, ok = QInputDialog.getInt(self, "Автосохранение", "Интервал, с:", current, 5, 3600)
+        if ok: self._settings.setValue("autosave/interval_sec", interval_sec); self._apply_autosave_settings()
+    @Slot()
+    def _on_autosave_timer(self):
+        # Без файла проекта сохранять некуда - ждем явного "Сохранить как"
+        if not self.project.is_modified or not self.project.filepath: return
+        if self.autosave_worker.submit_project(self.project): self.autosave_status_label.setText("Автосохранение: сохранение...")
+    @Slot(str, int, bool, str)
+    def _on_autosave_finished(self, path_str: str, revision: int, success: bool, error_message: str):
+        save_path = Path(path_str)
+        if not success: self.autosave_status_label.setText("Автосохранение: ошибка!"); self.autosave_status_label.setToolTip(error_message); return
+        if save_path == self.project.resolve_save_path(): self.project.mark_saved(save_path, revision)
+        self.autosave_status_label.setText(f"Автосохранено в {QDateTime.currentDateTime().toString('HH:mm:ss')}"); self.autosave_status_label.setToolTip(str(save_path))
+        self._update_ui_state()
     def closeEvent(self, event: QCloseEvent):
-        if self._check_unsaved_changes(): event.accept()
+        if self._check_unsaved_changes(): self._autosave_timer.stop(); self.autosave_worker.stop(); event.accept()
         else: event.ignore()
     # def _on_about(self): print("Действие: О программе")
 
@@ -1,20 +1,26 @@
 from PySide6.QtWidgets import (
         QWidget, QVBoxLayout, QHBoxLayout, QLabel, QTextEdit, QCheckBox, QSizePolicy,
-        QFrame, QSpacerItem # Добавлены QFrame и QSpacerItem
+        QFrame, QSpacerItem, # Добавлены QFrame и QSpacerItem
+        QPushButton, QDoubleSpinBox, QFileDialog
     )
-from PySide6.QtCore import Qt, Signal, Slot
+from PySide6.QtCore import Qt, Signal, Slot, QEvent
+from PySide6.QtGui import QKeySequence
+
+from models.image_cache import is_image_key
+from models.history import SetKeyFields
 
 class SimpleKeyEditorWidget(QWidget):
     """
     Виджет для редактирования значения простого ключа {{...}}.
     """
-    # Сигнал, испускаемый при изменении данных пользователем
-    data_changed = Signal()
+    # Операция истории (SetKeyFields) для каждого изменения; применяет ее к проекту владелец
+    edit_operation = Signal(object)
 
     def __init__(self, parent=None):
         super().__init__(parent)
 
         self._current_key_id: str | None = None # Храним ID текущего редактируемого ключа
+        self._data_ref: dict | None = None # Данные ключа в Project - значения "до" для истории отмены
 
         main_layout = QVBoxLayout(self)
         main_layout.setContentsMargins(0, 0, 0, 0) # Убираем отступы у основного layout
@@ -30,9 +36,29 @@ class SimpleKeyEditorWidget(QWidget):
         self.value_edit.setMinimumHeight(60) # Минимальная высота
         # Устанавливаем политику размера, чтобы поле могло растягиваться
         self.value_edit.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+        # Отмена/повтор - общая история окна, а не собственный стек поля ввода
+        self.value_edit.setUndoRedoEnabled(False); self.value_edit.installEventFilter(self)
 
         self.freeze_checkbox = QCheckBox("Заморозить (запретить авто-обновление/редактирование)")
 
+        # --- Параметры изображения (только для ключей-изображений {{..._PICTURE}}) ---
+        # Значение ключа - путь к файлу, размер в мм; 0 - по пропорциям изображения
+        self.image_options = QWidget()
+        image_layout = QHBoxLayout(self.image_options)
+        image_layout.setContentsMargins(0, 0, 0, 0)
+        self.browse_image_button = QPushButton("Выбрать изображение...")
+        self.image_width_spin = QDoubleSpinBox()
+        self.image_height_spin = QDoubleSpinBox()
+        for spin in (self.image_width_spin, self.image_height_spin):
+            spin.setRange(0, 1000); spin.setDecimals(1); spin.setSuffix(" мм"); spin.setSpecialValueText("авто")
+        image_layout.addWidget(self.browse_image_button)
+        image_layout.addWidget(QLabel("Ширина:"))
+        image_layout.addWidget(self.image_width_spin)
+        image_layout.addWidget(QLabel("Высота:"))
+        image_layout.addWidget(self.image_height_spin)
+        image_layout.addStretch(1)
+        self.image_options.setVisible(False)
+
         # --- Статус валидации (пока заглушка) ---
         self.status_label = QLabel("Статус: -")
         self.status_label.setStyleSheet("color: gray;")
@@ -48,6 +74,7 @@ class SimpleKeyEditorWidget(QWidget):
         main_layout.addLayout(value_header_layout)
 
         main_layout.addWidget(self.value_edit)
+        main_layout.addWidget(self.image_options)
         main_layout.addWidget(self.freeze_checkbox)
 
         # Добавляем разделитель для визуального отделения (опционально)
@@ -63,15 +90,36 @@ class SimpleKeyEditorWidget(QWidget):
         # --- Подключение сигналов ---
         self.value_edit.textChanged.connect(self._on_data_edited)
         self.freeze_checkbox.stateChanged.connect(self._on_data_edited)
+        self.image_width_spin.valueChanged.connect(self._on_data_edited)
+        self.image_height_spin.valueChanged.connect(self._on_data_edited)
+        self.browse_image_button.clicked.connect(self._on_browse_image)
 
         # Изначально виджет скрыт
         self.setVisible(False)
 
+    def eventFilter(self, watched, event) -> bool:
+        # Ctrl+Z / Ctrl+Y не перехватываются полем ввода и достаются действиям окна
+        if watched is self.value_edit and event.type() == QEvent.Type.ShortcutOverride:
+            if event.matches(QKeySequence.StandardKey.Undo) or event.matches(QKeySequence.StandardKey.Redo):
+                event.ignore(); return True
+        return super().eventFilter(watched, event)
+
     @Slot()
     def _on_data_edited(self):
         """Слот, вызываемый при изменении текста или состояния чекбокса."""
-        # Испускаем сигнал, что данные изменились
-        self.data_changed.emit()
+        if self._current_key_id and self._data_ref is not None:
+            after = {field: value for field, value in self.get_edited_data().items() if self._data_ref.get(field) != value}
+            if after:
+                before = {field: self._data_ref.get(field) for field in after}
+                self.edit_operation.emit(SetKeyFields(self._current_key_id, before, after))
+
+    @Slot()
+    def _on_browse_image(self):
+        """Выбор файла изображения; путь записывается в значение ключа."""
+        ff = "Изображения (*.png *.jpg *.jpeg *.bmp *.gif *.tif *.tiff);;Все файлы (*)"
+        fp_str, _ = QFileDialog.getOpenFileName(self, "Выбрать изображение", self.value_edit.toPlainText().strip(), ff)
+        if fp_str:
+            self.value_edit.setPlainText(fp_str) # textChanged испустит edit_operation
 
     def set_key_data(self, key_id: str, data: dict | None):
         """
@@ -84,15 +132,21 @@ class SimpleKeyEditorWidget(QWidget):
                   Может быть None, если ключ не найден (хотя этого не должно быть).
         """
         self._current_key_id = key_id
+        self._data_ref = data
         self.key_label.setText(f"Ключ: {key_id}")
 
         if data:
-            # Блокируем сигналы на время установки данных, чтобы не вызвать data_changed
+            # Блокируем сигналы на время установки данных, чтобы не вызвать edit_operation
             self.value_edit.blockSignals(True)
             self.freeze_checkbox.blockSignals(True)
+            self.image_width_spin.blockSignals(True)
+            self.image_height_spin.blockSignals(True)
 
             self.value_edit.setPlainText(data.get('value', ''))
             self.freeze_checkbox.setChecked(data.get('is_frozen', False))
+            self.image_options.setVisible(is_image_key(key_id, data))
+            self.image_width_spin.setValue(data.get('image_width_mm') or 0)
+            self.image_height_spin.setValue(data.get('image_height_mm') or 0)
             # Обновляем статус (пока просто текстом)
             status = data.get('status', 'unknown')
             self.status_label.setText(f"Статус: {status}")
@@ -109,6 +163,8 @@ class SimpleKeyEditorWidget(QWidget):
             # Разблокируем сигналы
             self.value_edit.blockSignals(False)
             self.freeze_checkbox.blockSignals(False)
+            self.image_width_spin.blockSignals(False)
+            self.image_height_spin.blockSignals(False)
 
             # Управляем активностью поля ввода в зависимости от "заморозки"
             self.value_edit.setReadOnly(data.get('is_frozen', False))
@@ -130,11 +186,15 @@ class SimpleKeyEditorWidget(QWidget):
         # TODO: Добавить реальную валидацию для статуса 'invalid'
         current_status = 'filled' if current_value else 'empty'
 
-        return {
+        edited_data = {
             'value': current_value,
             'status': current_status,
             'is_frozen': self.freeze_checkbox.isChecked()
         }
+        if self.image_options.isVisibleTo(self):
+            edited_data['image_width_mm'] = self.image_width_spin.value() or None
+            edited_data['image_height_mm'] = self.image_height_spin.value() or None
+        return edited_data
 
     def get_current_key_id(self) -> str | None:
         """Возвращает ID ключа, который сейчас редактируется."""
@@ -143,6 +203,7 @@ class SimpleKeyEditorWidget(QWidget):
     def clear_editor(self):
         """Очищает поля редактора и скрывает его."""
         self._current_key_id = None
+        self._data_ref = None
         self.key_label.setText("Ключ: Не выбран")
         # Блокируем сигналы перед очисткой
         self.value_edit.blockSignals(True)
@@ -154,4 +215,5 @@ class SimpleKeyEditorWidget(QWidget):
         self.status_label.setText("Статус: -")
         self.status_label.setStyleSheet("color: gray;")
         self.value_edit.setReadOnly(False) # Снимаем блокировку при очистке
+        self.image_options.setVisible(False)
         self.setVisible(False) # Скрываем виджет
\ No newline at end of file
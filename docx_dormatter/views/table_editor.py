@@ -1,9 +1,14 @@
+import csv
+import io
+
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QTableWidget, QTableWidgetItem,
-    QPushButton, QAbstractItemView, QHeaderView, QSizePolicy, QMessageBox
+    QPushButton, QAbstractItemView, QHeaderView, QSizePolicy, QMessageBox, QApplication
 )
-from PySide6.QtCore import Qt, Signal, Slot
-from PySide6.QtGui import QIcon # Для иконок кнопок (опционально)
+from PySide6.QtCore import Qt, Signal, Slot, QItemSelection, QItemSelectionModel
+from PySide6.QtGui import QIcon, QAction, QKeySequence # QIcon - для иконок кнопок (опционально)
+
+from models.history import SetCells, InsertRows, DeleteRows, PermuteRows, BatchOperation
 
 # TODO: Рассмотреть возможность использования QStyledItemDelegate для кастомных редакторов ячеек (например, QDateEdit)
 
@@ -11,8 +16,8 @@ class TableEditorWidget(QWidget):
     """
     Виджет для редактирования данных динамической таблицы.
     """
-    # Сигнал, испускаемый при изменении данных пользователем
-    data_changed = Signal()
+    # Операция истории (SetCells, InsertRows, ...) для каждого изменения; применяет ее к проекту владелец
+    edit_operation = Signal(object)
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -33,12 +38,15 @@ class TableEditorWidget(QWidget):
         button_layout = QHBoxLayout()
         self.add_row_button = QPushButton("Добавить строку")
         # self.add_row_button.setIcon(QIcon("path/to/add_icon.png")) # Опционально
-        self.delete_row_button = QPushButton("Удалить строку")
+        self.delete_row_button = QPushButton("Удалить строки")
+        self.paste_button = QPushButton("Вставить из буфера")
+        self.paste_button.setToolTip("Вставка строк, скопированных из Excel (столбцы через табуляцию), начиная с текущей ячейки")
         self.move_up_button = QPushButton("Вверх")
         self.move_down_button = QPushButton("Вниз")
 
         button_layout.addWidget(self.add_row_button)
         button_layout.addWidget(self.delete_row_button)
+        button_layout.addWidget(self.paste_button)
         button_layout.addStretch(1) # Пространство между группами кнопок
         button_layout.addWidget(self.move_up_button)
         button_layout.addWidget(self.move_down_button)
@@ -48,7 +56,7 @@ class TableEditorWidget(QWidget):
         self.table_widget = QTableWidget()
         # Настройки таблицы
         self.table_widget.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows) # Выделение строк целиком
-        self.table_widget.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection) # Только одну строку можно выбрать
+        self.table_widget.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection) # Несколько строк (Shift/Ctrl)
         self.table_widget.verticalHeader().setVisible(False) # Скрываем нумерацию строк по умолчанию (будет в первом столбце)
         self.table_widget.horizontalHeader().setStretchLastSection(True) # Последний столбец растягивается
         self.table_widget.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
@@ -60,7 +68,12 @@ class TableEditorWidget(QWidget):
         self.delete_row_button.clicked.connect(self._delete_row)
         self.move_up_button.clicked.connect(self._move_row_up)
         self.move_down_button.clicked.connect(self._move_row_down)
+        self.paste_button.clicked.connect(self._paste_from_clipboard)
         self.table_widget.itemChanged.connect(self._on_item_changed) # Сигнал изменения ячейки
+        # Ctrl+V в таблице - вставка блока строк вместо вставки в одну ячейку
+        paste_action = QAction(self.table_widget); paste_action.setShortcut(QKeySequence.StandardKey.Paste)
+        paste_action.setShortcutContext(Qt.ShortcutContext.WidgetWithChildrenShortcut)
+        paste_action.triggered.connect(self._paste_from_clipboard); self.table_widget.addAction(paste_action)
 
         # Изначально виджет скрыт
         self.setVisible(False)
@@ -76,7 +89,7 @@ class TableEditorWidget(QWidget):
                    'template_keys': [...], 'data': [{'col1': val1,...}, ...]}
         """
         self._current_table_id = table_id
-        self._project_data_ref = data # Сохраняем ссылку для get_edited_data
+        self._project_data_ref = data # Ссылка на строки проекта - значения "до" для операций истории
         self.table_id_label.setText(f"Таблица: {table_id}")
 
         self.table_widget.blockSignals(True) # Блокируем сигналы на время заполнения
@@ -134,35 +147,6 @@ class TableEditorWidget(QWidget):
 
         self.table_widget.blockSignals(False) # Разблокируем сигналы
 
-    def get_edited_data(self) -> dict:
-        """
-        Собирает данные из QTableWidget и возвращает их в формате для Project.
-        """
-        if not self._current_table_id or self._project_data_ref is None:
-            return {}
-
-        edited_data_list = []
-        row_count = self.table_widget.rowCount()
-        col_count = self.table_widget.columnCount()
-
-        if col_count != len(self._column_keys) + 1:
-            print("Ошибка: несоответствие количества столбцов и ключей!")
-            return {} # Или вернуть старые данные?
-
-        for row_idx in range(row_count):
-            row_data_dict = {}
-            for col_idx, col_key in enumerate(self._column_keys):
-                item = self.table_widget.item(row_idx, col_idx + 1) # +1 из-за "№ п/п"
-                value = item.text() if item else ''
-                row_data_dict[col_key] = value
-            edited_data_list.append(row_data_dict)
-
-        # Возвращаем обновленные данные, сохраняя остальные поля из оригинала
-        updated_project_data = self._project_data_ref.copy()
-        updated_project_data['data'] = edited_data_list
-        return updated_project_data
-
-
     def get_current_table_id(self) -> str | None:
         """Возвращает ID таблицы, которая сейчас редактируется."""
         return self._current_table_id
@@ -180,10 +164,11 @@ class TableEditorWidget(QWidget):
         self.table_widget.blockSignals(False)
         self.setVisible(False)
 
-    def _renumber_rows(self):
-        """Обновляет нумерацию в первом столбце."""
+    def _renumber_rows(self, start_row: int = 0, end_row: int | None = None):
+        """Обновляет нумерацию в первом столбце для строк start_row..end_row (по умолчанию - до конца)."""
+        end_row = self.table_widget.rowCount() - 1 if end_row is None else min(end_row, self.table_widget.rowCount() - 1)
         self.table_widget.blockSignals(True) # Блокируем сигнал itemChanged
-        for row_idx in range(self.table_widget.rowCount()):
+        for row_idx in range(max(0, start_row), end_row + 1):
             item = self.table_widget.item(row_idx, 0)
             if item:
                 item.setText(str(row_idx + 1))
@@ -194,82 +179,150 @@ class TableEditorWidget(QWidget):
                 self.table_widget.setItem(row_idx, 0, num_item)
         self.table_widget.blockSignals(False)
 
+    def _selected_rows(self) -> list[int]:
+        """Индексы выделенных строк по возрастанию (или текущая строка, если выделения нет)."""
+        rows = sorted({index.row() for index in self.table_widget.selectionModel().selectedRows()})
+        if not rows and self.table_widget.currentRow() >= 0: rows = [self.table_widget.currentRow()]
+        return rows
+
+    def _begin_batch(self):
+        """Пакетное изменение: без перерисовки и без itemChanged на каждую ячейку."""
+        self.table_widget.setUpdatesEnabled(False); self.table_widget.blockSignals(True)
+
+    def _end_batch(self, renumber_from: int, renumber_to: int | None = None):
+        """Завершает пакетное изменение: одна перенумерация затронутого диапазона."""
+        self.table_widget.blockSignals(False); self.table_widget.setUpdatesEnabled(True)
+        self._renumber_rows(renumber_from, renumber_to)
+
+    def _project_rows(self) -> list[dict]:
+        """Строки таблицы в Project - значения "до" для операций истории."""
+        return self._project_data_ref.get('data', []) if self._project_data_ref is not None else []
+
+    def _row_values(self, row: int) -> dict:
+        project_rows = self._project_rows()
+        row_data = project_rows[row] if 0 <= row < len(project_rows) else {}
+        return {key: str(row_data.get(key, '')) for key in self._column_keys}
+
+    def _emit_operation(self, operation):
+        if self._current_table_id: self.edit_operation.emit(operation)
+
+    def _swap_rows(self, row_a: int, row_b: int):
+        for col in range(1, self.table_widget.columnCount()): # Столбец нумерации остается на месте
+            item_a = self.table_widget.takeItem(row_a, col); item_b = self.table_widget.takeItem(row_b, col)
+            if item_b is not None: self.table_widget.setItem(row_a, col, item_b)
+            if item_a is not None: self.table_widget.setItem(row_b, col, item_a)
+
+    def _select_rows(self, rows: list[int]):
+        selection = self.table_widget.selectionModel(); model = self.table_widget.model()
+        selection.clearSelection()
+        last_col = self.table_widget.columnCount() - 1
+        for row in rows:
+            top_left = model.index(row, 0); bottom_right = model.index(row, last_col)
+            selection.select(QItemSelection(top_left, bottom_right), QItemSelectionModel.SelectionFlag.Select)
+        if rows: self.table_widget.setCurrentCell(rows[0], max(0, self.table_widget.currentColumn()), QItemSelectionModel.SelectionFlag.NoUpdate)
+
     @Slot()
     def _add_row(self):
-        """Добавляет пустую строку в конец таблицы."""
-        current_row = self.table_widget.currentRow() # Получаем текущую строку для вставки после нее
-        if current_row < 0: # Если ничего не выбрано, добавляем в конец
-            current_row = self.table_widget.rowCount()
-        else:
-            current_row += 1 # Вставляем после выбранной
-
-        self.table_widget.insertRow(current_row)
-        self._renumber_rows() # Обновляем нумерацию
-        self.data_changed.emit() # Сигналим об изменении
+        """Добавляет пустую строку после последней выделенной (или в конец таблицы)."""
+        selected = self._selected_rows()
+        new_row = selected[-1] + 1 if selected else self.table_widget.rowCount()
+        self.table_widget.insertRow(new_row)
+        self._renumber_rows(new_row) # Обновляем нумерацию
+        self._emit_operation(InsertRows(self._current_table_id, new_row, [{key: '' for key in self._column_keys}]))
 
     @Slot()
     def _delete_row(self):
-        """Удаляет выбранную строку."""
-        current_row = self.table_widget.currentRow()
-        if current_row >= 0:
-            confirm = QMessageBox.question(self, "Удаление строки",
-                                           f"Вы уверены, что хотите удалить строку {current_row + 1}?",
-                                           QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
-                                           QMessageBox.StandardButton.No)
-            if confirm == QMessageBox.StandardButton.Yes:
-                self.table_widget.removeRow(current_row)
-                self._renumber_rows() # Обновляем нумерацию
-                self.data_changed.emit() # Сигналим об изменении
+        """Удаляет все выделенные строки одним изменением."""
+        rows = self._selected_rows()
+        if not rows: return
+        question = f"Вы уверены, что хотите удалить строку {rows[0] + 1}?" if len(rows) == 1 else f"Вы уверены, что хотите удалить выделенные строки ({len(rows)})?"
+        confirm = QMessageBox.question(self, "Удаление строк", question,
+                                       QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                                       QMessageBox.StandardButton.No)
+        if confirm != QMessageBox.StandardButton.Yes: return
+        project_rows = self._project_rows()
+        self._emit_operation(DeleteRows(self._current_table_id, [(row, project_rows[row]) for row in rows if row < len(project_rows)]))
+        self._begin_batch()
+        for row in reversed(rows): self.table_widget.removeRow(row) # С конца - индексы не сдвигаются
+        self._end_batch(rows[0])
+
+    def _move_rows(self, step: int):
+        """
+        Сдвигает выделенные строки на step (-1 вверх, +1 вниз) одним изменением.
+        Строка, упершаяся в границу таблицы или в такую же неподвижную выделенную строку, остается на месте.
+        """
+        rows = self._selected_rows()
+        if not rows: return
+        limit = 0 if step < 0 else self.table_widget.rowCount() - 1
+        stuck: set[int] = set(); moved = []
+        start = max(0, min(rows[0], rows[0] + step)); end = min(self.table_widget.rowCount() - 1, max(rows[-1], rows[-1] + step))
+        order = list(range(end - start + 1)) # Та же перестановка для истории: новая позиция -> старая
+        self._begin_batch()
+        for row in (rows if step < 0 else reversed(rows)): # Сначала строки со стороны движения
+            if row == limit or (row + step) in stuck: stuck.add(row); moved.append(row); continue
+            self._swap_rows(row, row + step); moved.append(row + step)
+            a, b = row - start, row + step - start; order[a], order[b] = order[b], order[a]
+        self._select_rows(sorted(moved))
+        if order != sorted(order): self._emit_operation(PermuteRows(self._current_table_id, start, order))
+        self._end_batch(start, end)
 
     @Slot()
     def _move_row_up(self):
-        """Перемещает выбранную строку на одну позицию вверх."""
-        current_row = self.table_widget.currentRow()
-        if current_row > 0: # Нельзя переместить самую верхнюю строку
-            self.table_widget.blockSignals(True) # Блокируем сигналы
-            # Сохраняем данные перемещаемой строки
-            row_data = []
-            for col in range(self.table_widget.columnCount()):
-                item = self.table_widget.takeItem(current_row, col)
-                row_data.append(item)
-
-            # Удаляем строку
-            self.table_widget.removeRow(current_row)
-            # Вставляем строку на новую позицию
-            new_row_index = current_row - 1
-            self.table_widget.insertRow(new_row_index)
-            # Вставляем данные обратно
-            for col, item in enumerate(row_data):
-                self.table_widget.setItem(new_row_index, col, item)
-
-            self.table_widget.selectRow(new_row_index) # Выбираем перемещенную строку
-            self.table_widget.blockSignals(False) # Разблокируем сигналы
-            self._renumber_rows()
-            self.data_changed.emit()
+        """Перемещает выделенные строки на одну позицию вверх."""
+        self._move_rows(-1)
 
     @Slot()
     def _move_row_down(self):
-        """Перемещает выбранную строку на одну позицию вниз."""
-        current_row = self.table_widget.currentRow()
-        row_count = self.table_widget.rowCount()
-        if current_row >= 0 and current_row < row_count - 1: # Нельзя переместить самую нижнюю
-            self.table_widget.blockSignals(True)
-            row_data = []
-            for col in range(self.table_widget.columnCount()):
-                item = self.table_widget.takeItem(current_row, col)
-                row_data.append(item)
-
-            self.table_widget.removeRow(current_row)
-            new_row_index = current_row + 1
-            self.table_widget.insertRow(new_row_index)
-            for col, item in enumerate(row_data):
-                self.table_widget.setItem(new_row_index, col, item)
-
-            self.table_widget.selectRow(new_row_index)
-            self.table_widget.blockSignals(False)
-            self._renumber_rows()
-            self.data_changed.emit()
+        """Перемещает выделенные строки на одну позицию вниз."""
+        self._move_rows(1)
+
+    @staticmethod
+    def parse_clipboard_rows(text: str) -> list[list[str]]:
+        """Разбирает текст в формате Excel (табуляция между ячейками, кавычки у многострочных ячеек)."""
+        if text.endswith('\n'): text = text[:-1] # Excel добавляет перевод строки после последней строки
+        if text.endswith('\r'): text = text[:-1]
+        return [row for row in csv.reader(io.StringIO(text), delimiter='\t') if row]
 
+    def paste_rows(self, rows: list[list[str]], start_row: int, start_col: int) -> int:
+        """
+        Записывает блок значений начиная с ячейки (start_row, start_col), перезаписывая
+        существующие строки и добавляя недостающие. Одно изменение: одна перенумерация и одна операция истории.
+        Возвращает число вставленных строк.
+        """
+        if not rows or not self._column_keys: return 0
+        start_col = max(1, start_col) # В столбец нумерации не вставляем
+        col_count = self.table_widget.columnCount()
+        old_row_count = self.table_widget.rowCount()
+        start_row = min(start_row, old_row_count)
+        operations = []; cells = []
+        if start_row + len(rows) > old_row_count:
+            operations.append(InsertRows(self._current_table_id, old_row_count,
+                                         [{key: '' for key in self._column_keys} for _ in range(start_row + len(rows) - old_row_count)]))
+        self._begin_batch()
+        try:
+            if start_row + len(rows) > old_row_count: self.table_widget.setRowCount(start_row + len(rows))
+            for row_offset, values in enumerate(rows):
+                row = start_row + row_offset; before_row = self._row_values(row)
+                for col_offset, value in enumerate(values[:col_count - start_col]):
+                    self.table_widget.setItem(row, start_col + col_offset, QTableWidgetItem(value))
+                    column_key = self._column_keys[start_col + col_offset - 1]
+                    if before_row[column_key] != value: cells.append((row, column_key, before_row[column_key], value))
+            if cells: operations.append(SetCells(self._current_table_id, cells))
+            if operations: self._emit_operation(BatchOperation(self._current_table_id, operations, "вставка из буфера"))
+        finally:
+            self._end_batch(start_row)
+        return len(rows)
+
+    @Slot()
+    def _paste_from_clipboard(self):
+        if not self._current_table_id: return
+        rows = self.parse_clipboard_rows(QApplication.clipboard().text())
+        if not rows: return
+        start_row = self.table_widget.currentRow()
+        start_col = self.table_widget.currentColumn()
+        if start_row < 0: start_row = self.table_widget.rowCount(); start_col = 1 # Без текущей ячейки - в конец таблицы
+        pasted = self.paste_rows(rows, start_row, start_col)
+        print(f"Вставлено строк из буфера обмена: {pasted}")
 
     @Slot(QTableWidgetItem)
     def _on_item_changed(self, item: QTableWidgetItem):
@@ -277,5 +330,7 @@ class TableEditorWidget(QWidget):
         # Игнорируем изменения в первом столбце (нумерация)
         if item.column() == 0:
             return
-        print(f"Ячейка [{item.row()}, {item.column()}] изменена: {item.text()}") # Отладка
-        self.data_changed.emit() # Сигналим об изменении данных
\ No newline at end of file
+        if 0 < item.column() <= len(self._column_keys):
+            column_key = self._column_keys[item.column() - 1]
+            before = self._row_values(item.row())[column_key]
+            if before != item.text(): self._emit_operation(SetCells(self._current_table_id, [(item.row(), column_key, before, item.text())]))
\ No newline at end of file